@@ -0,0 +1,227 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a benchmark for shelltag.  It generates a synthetic library (see
+library.py), or uses an existing one, and times shelltag.py on it for each
+scenario, printing the results as JSON.
+
+For each scenario...
+throughput: shelltag.py is run once over the library, on a fresh copy for
+scenarios which change files, giving files/sec and MB/sec.
+latency: shelltag.processfile is called for each file of a sample in this
+process, giving p50 and p99 per-file latency in milliseconds.
+
+If shelltag.py exits with an error or a file fails, nothing is printed and
+the benchmark exits with 1.
+
+$ python benchmark.py -n 2000 --depth 2 --output results.json
+$ python benchmark.py --library /tmp/library --scenarios info,add -r 3
+"""
+
+from optparse import OptionParser
+import os
+import os.path
+import sys
+import time
+import shutil
+import tempfile
+import platform
+import subprocess
+
+try: import json
+except ImportError: import simplejson as json
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+
+import library
+import shelltag
+import shelltag_src.directory as directory
+
+script = os.path.join(here, '..', 'shelltag.py')
+
+#name -> (shelltag arguments, True if files are changed)
+scenarios = {
+    'info': (['-i'], False),
+    'add': (['-a', 'COMMENT=benchmark'], True),
+    'remove': (['-r', 'GENRE'], True),
+    'save': (['--save'], True),
+    'removeart': (['--removeart'], True),
+}
+#every scenario runs over the top directory and then recursively
+defaultscenarios = 'info,add,remove,save,removeart'
+
+class BenchmarkError(Exception):
+    pass
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of a sorted list of numbers.
+    """
+    if not values: return None
+    rank = int(round(percent / 100.0 * len(values) + 0.5))
+    return values[min(len(values), max(1, rank)) - 1]
+
+def filelist(path, recursive):
+    """
+    Returns the mp3 files shelltag would process under path.
+    """
+    return list(directory.walk(path, recursive))
+
+def freshcopy(source, workdir):
+    """
+    Returns the path of a new copy of the library in workdir.
+    """
+    target = os.path.join(workdir, 'library')
+    if os.path.exists(target): shutil.rmtree(target)
+    shutil.copytree(source, target)
+    return target
+
+def throughput(arguments, path, recursive, extra):
+    """
+    Runs shelltag.py once over path and returns the seconds taken.
+
+    Exceptions:
+    BenchmarkError - shelltag.py exited with an error
+    """
+    command = [sys.executable, script, '-q'] + arguments + extra
+    if recursive: command.append('-s')
+    command.append(path)
+    start = time.time()
+    status = subprocess.call(command)
+    seconds = time.time() - start
+    if status != 0:
+        raise BenchmarkError, "%s exited with %d" % (' '.join(command), status)
+    return seconds
+
+def latency(arguments, files):
+    """
+    Returns a sorted list of the milliseconds shelltag.processfile took for
+    each of files.
+
+    Exceptions:
+    BenchmarkError - a file failed
+    """
+    (options, args) = shelltag.makeparser().parse_args(arguments)
+    if options.addfield != None:
+        options.addfield = shelltag.parsefields(options.addfield)
+    timings = []
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        for eachfile in files:
+            start = time.time()
+            try: shelltag.processfile(options, eachfile, None)
+            except Exception, err:
+                raise BenchmarkError, "%s: %s" % (eachfile, err)
+            timings.append((time.time() - start) * 1000.0)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    timings.sort()
+    return timings
+
+def runscenario(name, recursive, source, workdir, options):
+    """
+    Returns the results of one scenario as a dict.
+    """
+    arguments, changes = scenarios[name]
+    extra = options.shelltagargs.split()
+
+    runs = []
+    for i in range(options.repeat):
+        path = source
+        if changes: path = freshcopy(source, workdir)
+        runs.append(throughput(arguments, path, recursive, extra))
+    runs.sort()
+    seconds = runs[len(runs) // 2]
+
+    files = filelist(source, recursive)
+    size = sum([os.path.getsize(eachfile) for eachfile in files])
+    path = source
+    if changes: path = freshcopy(source, workdir)
+    sample = filelist(path, recursive)[:options.latencyfiles]
+    timings = latency(arguments, sample)
+
+    return {
+        'arguments': arguments + extra + (recursive and ['-s'] or []),
+        'files': len(files),
+        'bytes': size,
+        'seconds': seconds,
+        'files_per_sec': seconds and len(files) / seconds,
+        'mb_per_sec': seconds and size / 1048576.0 / seconds,
+        'latency_files': len(timings),
+        'p50_ms': percentile(timings, 50),
+        'p99_ms': percentile(timings, 99),
+    }
+
+def main():
+    parser = OptionParser(usage="Usage: %prog [options]")
+    library.addoptions(parser)
+    parser.add_option("--library", dest="library",
+            help="benchmarks DIRECTORY instead of generating a library",
+            metavar="DIRECTORY")
+    parser.add_option("--scenarios", dest="scenarios", default=defaultscenarios,
+            help="comma separated scenarios (default %s)" % defaultscenarios,
+            metavar="LIST")
+    parser.add_option("-r","--repeat", type='int', dest="repeat", default=1,
+            help="runs each throughput test NUM times, keeping the median",
+            metavar="NUM")
+    parser.add_option("--latency_files", type='int', dest="latencyfiles",
+            default=200, help="files timed for latency (default 200)",
+            metavar="NUM")
+    parser.add_option("--shelltag_args", dest="shelltagargs", default='',
+            help="extra arguments for every shelltag.py run, ex. '-j 4'",
+            metavar="ARGS")
+    parser.add_option("-o","--output", dest="output",
+            help="writes the results to FILE instead of stdout", metavar="FILE")
+    (options, args) = parser.parse_args()
+
+    names = options.scenarios.split(',')
+    for name in names:
+        if name not in scenarios: parser.error("unknown scenario: " + name)
+
+    workdir = tempfile.mkdtemp(prefix='shelltag-benchmark-')
+    try:
+        if options.library != None:
+            source = options.library
+            info = {'path': os.path.abspath(source)}
+        else:
+            source = os.path.join(workdir, 'pristine')
+            info = library.generatefrom(source, options)
+
+        results = {}
+        try:
+            for name in names:
+                results[name] = runscenario(name, False, source, workdir,
+                        options)
+                results[name + '_recursive'] = runscenario(name, True, source,
+                        workdir, options)
+        except BenchmarkError, err:    #timings of failed runs mean nothing
+            print >> sys.stderr, "benchmark.py: " + str(err)
+            return 1
+    finally:
+        shutil.rmtree(workdir)
+
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'library': info,
+        'scenarios': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if options.output != None:
+        f = open(options.output, 'w')
+        try: f.write(text + '\n')
+        finally: f.close()
+    else: print text
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
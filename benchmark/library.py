@@ -0,0 +1,205 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module generates synthetic mp3 libraries for benchmarking shelltag.
+
+Each file is a run of silent MPEG-1 layer III frames with a tag picked from
+a mix of ID3v1, ID3v2.3 and ID3v2.4 (with or without an ID3v1 tag), an
+optional picture and a given amount of padding.  Files are spread over a
+tree of directories of a given depth.  The same seed gives the same library.
+
+$ python library.py -n 1000 --depth 2 --art_kb 64 /tmp/library
+"""
+
+from optparse import OptionParser
+import os
+import os.path
+import sys
+import random
+import binascii
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mutagen.id3 import TIT2, TPE1, TALB, TRCK, TCON, TDRC, COMM, TXXX, APIC
+from shelltag_src.compatid3 import CompatID3
+
+#MPEG-1 layer III, 128 kbps, 44.1 kHz: 417 byte frames
+frameheader = '\xff\xfb\x90\x64'
+framesize = 417
+
+#tag version -> share of the library
+defaultmix = 'v1:1,v23:3,v24:4,v123:1,v124:1'
+
+def parsemix(mix):
+    """
+    Returns a list of (version, weight) from a string like 'v23:3,v24:1'.
+    """
+    weights = []
+    for part in mix.split(','):
+        version, weight = part.split(':')
+        if version not in ('v1', 'v23', 'v24', 'v123', 'v124'):
+            raise ValueError, "unknown tag version: " + version
+        weights.append((version, int(weight)))
+    return weights
+
+def pickversion(weights, rand):
+    """
+    Returns a version picked at random from a list made by parsemix.
+    """
+    point = rand.randint(1, sum([weight for version, weight in weights]))
+    for version, weight in weights:
+        point -= weight
+        if point <= 0: return version
+
+def audio(kilobytes):
+    """
+    Returns about kilobytes KB of silent mp3 frames.
+    """
+    frame = frameheader + '\x00' * (framesize - len(frameheader))
+    return frame * max(1, kilobytes * 1024 // framesize)
+
+def picture(kilobytes, rand):
+    """
+    Returns kilobytes KB of random data starting like a JPEG file.
+    """
+    size = kilobytes * 1024
+    if size == 0: return ''
+    data = binascii.unhexlify('%0*x' % (size * 2, rand.getrandbits(size * 8)))
+    return '\xff\xd8\xff\xe0' + data[4:]
+
+def maketag(number, artdata, rand):
+    """
+    Returns a CompatID3 with the usual fields of a ripped track.
+    """
+    tag = CompatID3()
+    tag.add(TIT2(encoding=3, text=[u'Track %d' % number]))
+    tag.add(TPE1(encoding=3, text=[u'Artist %d' % (number // 100)]))
+    tag.add(TALB(encoding=3, text=[u'Album %d' % (number // 10)]))
+    tag.add(TRCK(encoding=3, text=[u'%d/10' % (number % 10 + 1)]))
+    tag.add(TCON(encoding=3, text=[rand.choice([u'Rock', u'Jazz', u'Pop'])]))
+    tag.add(TDRC(encoding=3, text=[u'%d' % rand.randint(1960, 2010)]))
+    tag.add(COMM(encoding=3, lang='eng', desc=u'', text=[u'Synthetic']))
+    tag.add(TXXX(encoding=3, desc=u'replaygain_track_gain', text=[u'-6.00 dB']))
+    if artdata:
+        tag.add(APIC(encoding=3, mime=u'image/jpeg', type=3,
+                desc=u'front', data=artdata))
+    return tag
+
+def writefile(filename, version, audiodata, artdata, padding, number, rand):
+    """
+    Writes one mp3 file with a tag of version.
+    """
+    f = open(filename, 'wb')
+    try: f.write(audiodata)
+    finally: f.close()
+    tag = maketag(number, artdata, rand)
+    tag.MINPADDING = padding
+    tag.PADDINGPERCENT = 0
+    tag.MAXPADDING = padding
+    if version == 'v1':
+        tag.save(filename, v1=2, v2=0)
+    elif version in ('v23', 'v123'):
+        tag.update_to_v23()
+        tag.save(filename, v1=(version == 'v123') and 2 or 0, v2=3)
+    else:
+        tag.save(filename, v1=(version == 'v124') and 2 or 0, v2=4)
+
+def directories(root, depth, fanout):
+    """
+    Returns the list of directories of a tree under root, root included.
+    """
+    level = [root]
+    tree = [root]
+    for i in range(depth):
+        level = [os.path.join(parent, 'dir%02d' % child)
+                for parent in level for child in range(fanout)]
+        tree.extend(level)
+    return tree
+
+def generate(root, count=100, mix=defaultmix, audiokb=256, artkb=32,
+        artshare=50, padding=1024, depth=1, fanout=4, seed=0):
+    """
+    Generates a library of count files under root.  Returns a dict of the
+    settings used plus the number of files and bytes written.
+
+    Attributes:
+    mix - tag versions and their weights, see parsemix
+    audiokb - KB of audio per file
+    artkb - KB of the picture given to files with artwork
+    artshare - percentage of files with artwork
+    padding - bytes of padding after each ID3v2 tag
+    depth - levels of subdirectories
+    fanout - subdirectories per directory
+    seed - random seed
+    """
+    rand = random.Random(seed)
+    weights = parsemix(mix)
+    tree = directories(root, depth, fanout)
+    for directory in tree:
+        if not os.path.isdir(directory): os.makedirs(directory)
+    audiodata = audio(audiokb)
+    artdata = picture(artkb, rand)
+    total = 0
+    for number in range(count):
+        directory = tree[number % len(tree)]
+        filename = os.path.join(directory, 'track%06d.mp3' % number)
+        art = ''
+        if rand.randint(1, 100) <= artshare: art = artdata
+        writefile(filename, pickversion(weights, rand), audiodata, art,
+                padding, number, rand)
+        total += os.path.getsize(filename)
+    return {'files': count, 'bytes': total, 'mix': mix, 'audio_kb': audiokb,
+            'art_kb': artkb, 'art_percent': artshare, 'padding': padding,
+            'depth': depth, 'fanout': fanout, 'seed': seed}
+
+def addoptions(parser):
+    """
+    Adds the library options to an OptionParser.
+    """
+    parser.add_option("-n","--files", type='int', dest="files", default=100,
+            help="number of files (default 100)", metavar="NUM")
+    parser.add_option("--mix", dest="mix", default=defaultmix,
+            help="tag versions and weights (default %s)" % defaultmix,
+            metavar="MIX")
+    parser.add_option("--audio_kb", type='int', dest="audiokb", default=256,
+            help="KB of audio per file (default 256)", metavar="KB")
+    parser.add_option("--art_kb", type='int', dest="artkb", default=32,
+            help="KB of artwork (default 32)", metavar="KB")
+    parser.add_option("--art_percent", type='int', dest="artshare", default=50,
+            help="percentage of files with artwork (default 50)",
+            metavar="PERCENT")
+    parser.add_option("--padding", type='int', dest="padding", default=1024,
+            help="bytes of padding per tag (default 1024)", metavar="BYTES")
+    parser.add_option("--depth", type='int', dest="depth", default=1,
+            help="levels of subdirectories (default 1)", metavar="NUM")
+    parser.add_option("--fanout", type='int', dest="fanout", default=4,
+            help="subdirectories per directory (default 4)", metavar="NUM")
+    parser.add_option("--seed", type='int', dest="seed", default=0,
+            help="random seed (default 0)", metavar="NUM")
+
+def generatefrom(root, options):
+    """
+    Generates a library under root from parsed library options.
+    """
+    return generate(root, options.files, options.mix, options.audiokb,
+            options.artkb, options.artshare, options.padding, options.depth,
+            options.fanout, options.seed)
+
+def main():
+    parser = OptionParser(usage="Usage: %prog [options] DIRECTORY")
+    addoptions(parser)
+    (options, args) = parser.parse_args()
+    if len(args) != 1:
+        parser.print_usage()
+        return 2
+    info = generatefrom(args[0], options)
+    print "%d files, %d bytes written to %s" % (info['files'], info['bytes'], args[0])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
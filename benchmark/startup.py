@@ -0,0 +1,143 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a startup benchmark for shelltag.  It times short shelltag.py runs,
+the kind shell scripts make thousands of times, in new processes and
+prints the median and fastest milliseconds of each as JSON.
+
+python -- the interpreter alone, for reference
+import -- importing shelltag and building its option parser
+help -- shelltag.py --help
+info -- shelltag.py -i on one file
+
+Given the results of an earlier run with --baseline, it exits with 1 if
+any median got slower by more than --tolerance percent.
+
+$ python startup.py -r 50 -o startup.json
+$ python startup.py --baseline startup.json
+"""
+
+from optparse import OptionParser
+import os
+import os.path
+import sys
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+
+try: import json
+except ImportError: import simplejson as json
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+
+import library
+
+root = os.path.join(here, '..')
+script = os.path.join(root, 'shelltag.py')
+
+def commands(filename):
+    """
+    Returns a dict of scenario -> command line.
+    """
+    importing = ("import sys; sys.path.insert(0, %r); import shelltag; "
+            "shelltag.makeparser()" % root)
+    return {
+        'python': [sys.executable, '-c', 'pass'],
+        'import': [sys.executable, '-c', importing],
+        'help': [sys.executable, script, '--help'],
+        'info': [sys.executable, script, '-i', filename],
+    }
+
+def timecommand(command, repeat):
+    """
+    Returns a sorted list of the milliseconds each of repeat runs of
+    command took.
+    """
+    devnull = open(os.devnull, 'w')
+    timings = []
+    try:
+        for i in range(repeat):
+            start = time.time()
+            subprocess.call(command, stdout=devnull, stderr=devnull)
+            timings.append((time.time() - start) * 1000.0)
+    finally:
+        devnull.close()
+    timings.sort()
+    return timings
+
+def regressions(results, baseline, tolerance):
+    """
+    Returns a list of lines describing the scenarios whose median is more
+    than tolerance percent slower than in baseline.
+    """
+    lines = []
+    for name, result in sorted(results.items()):
+        before = baseline.get('scenarios', {}).get(name)
+        if before == None: continue
+        limit = before['median_ms'] * (1 + tolerance / 100.0)
+        if result['median_ms'] > limit:
+            lines.append("%s: %.1f ms, was %.1f ms" % (name,
+                    result['median_ms'], before['median_ms']))
+    return lines
+
+def main():
+    parser = OptionParser(usage="Usage: %prog [options]")
+    parser.add_option("-r","--repeat", type='int', dest="repeat", default=20,
+            help="runs each scenario NUM times (default 20)", metavar="NUM")
+    parser.add_option("--baseline", dest="baseline",
+            help="compares the medians with an earlier run's FILE",
+            metavar="FILE")
+    parser.add_option("--tolerance", type='int', dest="tolerance", default=20,
+            help="percentage a median may grow over the baseline "
+            "(default 20)", metavar="PERCENT")
+    parser.add_option("-o","--output", dest="output",
+            help="writes the results to FILE instead of stdout", metavar="FILE")
+    (options, args) = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='shelltag-startup-')
+    try:
+        library.generate(workdir, count=1, depth=0, artshare=0, seed=0)
+        filename = os.path.join(workdir, 'track000000.mp3')
+        results = {}
+        for name, command in commands(filename).items():
+            timings = timecommand(command, options.repeat)
+            results[name] = {
+                'runs': len(timings),
+                'median_ms': timings[len(timings) // 2],
+                'min_ms': timings[0],
+            }
+    finally:
+        shutil.rmtree(workdir)
+
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if options.output != None:
+        f = open(options.output, 'w')
+        try: f.write(text + '\n')
+        finally: f.close()
+    else: print text
+
+    if options.baseline != None:
+        f = open(options.baseline)
+        try: baseline = json.load(f)
+        finally: f.close()
+        slower = regressions(results, baseline, options.tolerance)
+        for line in slower: print >> sys.stderr, "startup.py: slower " + line
+        if slower: return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
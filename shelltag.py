@@ -15,45 +15,261 @@ import os
 import os.path
 import time
 import sys
+import itertools
 
-import shelltag_src.id3tag as id3tag
+#modules which load mutagen, sqlite3, csv or json are imported by the
+#functions which need them, so --help and simple runs start quickly
 import shelltag_src.directory as directory
+import shelltag_src.parallel as parallel
+import shelltag_src.stats as stats
+
+#bytes of output buffered before writing to a file or pipe
+outputbuffer = 64 * 1024
+#the keys of export.writers, given here so parsing options doesn't load mutagen
+exportformats = ['csv', 'ndjson']
+
+def parsefields(fields, value=None):
+    """
+    Splits each -a argument into a (FIELDNAME, VALUE) pair.  An argument
+    given as FIELDNAME=VALUE carries its own value, otherwise the VALUE
+    argument from the command line is used.
+    """
+    pairs = []
+    for field in fields:
+        if '=' in field:
+            field, fieldvalue = field.split('=',1)
+        elif value == None:
+            raise Exception, "No value given."
+        else:
+            fieldvalue = value
+        pairs.append((field,fieldvalue))
+    return pairs
+
+def readonly(options):
+    """
+    Returns True if options only read tags, ex. --info alone.
+    """
+    return not (options.deletetag or options.createtag or options.removefield
+            or options.removeart or options.removepriv or options.addfield
+            or options.save or options.convert or pictures(options, None))
+
+def pictures(options, filename):
+    """
+    Returns the APIC frames --art-front, --art-back and --art-folder add to
+    filename, or with a filename of None whether any would be added.  An
+    image given on the command line wins over the directory's folder.jpg.
+    """
+    if filename == None:
+        return options.artfront != None or options.artback != None \
+                or options.artfolder == True
+    import shelltag_src.artwork as artwork
+    frames = []
+    if options.artfront != None:
+        frames.append(artwork.picture(options.artfront, artwork.FRONT))
+    elif options.artfolder == True:
+        front = artwork.folderpicture(os.path.dirname(filename))
+        if front != None: frames.append(front)
+    if options.artback != None:
+        frames.append(artwork.picture(options.artback, artwork.BACK))
+    return frames
+
+#CompatID3's own padding policy, read by the first setsaving
+savingdefaults = None
+
+def setsaving(options):
+    """
+    Applies --padding, --padding_percent, --max_padding and --safe_save to
+    every tag saved by this process, or the defaults where they're not
+    given (a shelltagd process runs many command lines).
+    """
+    import shelltag_src.compatid3 as compatid3
+    global savingdefaults
+    if savingdefaults == None:
+        savingdefaults = (compatid3.CompatID3.MINPADDING,
+                compatid3.CompatID3.PADDINGPERCENT,
+                compatid3.CompatID3.MAXPADDING)
+    minpadding, paddingpercent, maxpadding = savingdefaults
+    if options.padding != None: minpadding = options.padding
+    if options.paddingpercent != None: paddingpercent = options.paddingpercent
+    if options.maxpadding != None: maxpadding = options.maxpadding
+    compatid3.CompatID3.MINPADDING = minpadding
+    compatid3.CompatID3.PADDINGPERCENT = paddingpercent
+    compatid3.CompatID3.MAXPADDING = maxpadding
+    compatid3.CompatID3.SAFESAVE = options.safesave == True
 
 def processfile(options, filename='', value=None):
-    try: filetag = id3tag.ID3Tag(filename)
-    except: return
-    
+    import shelltag_src.id3tag as id3tag
+    setsaving(options)
+    #--index -> unchanged files are answered from the index
+    useindex = options.index != None and readonly(options)
+    if useindex:
+        import shelltag_src.tagindex as tagindex
+        if options.rebuild != True:
+            cached = tagindex.getindex(options.index).lookup(filename)
+            if cached != None:
+                stats.add('unchanged')
+                if options.info == True:
+                    print id3tag.namedinfo(filename, cached[0]).encode('UTF-8')
+                return None
+        stamp = tagindex.filestamp(filename)
+
+    #reading only or --removeart -> frames are decoded as they are needed
+    lazy = readonly(options) or options.removeart == True
+    filetag = id3tag.ID3Tag(filename, lazy, options.dryrun == True)
+    reclaimed = None
+
     #--delete
     if options.deletetag == True:
         filetag.removetag()
     #--create
     if options.createtag == True:
-        filetag = tag.ID3v24(filename)
+        filetag.createtag()
+    #--removeart -> pictures are stripped before anything is decoded
+    if options.removeart == True:
+        reclaimed = filetag.removeart(options.compact == True)
+    #all edits below are saved with a single write
+    filetag.begin()
     #--remove
     if options.removefield != None:
-        filetag.removefield(options.removefield)   
-    #--removeart
-    if options.removeart == True:
-        filetag.removefield("PICTURE")
+        for field in options.removefield:
+            filetag.removefield(field)
     #--removepriv
     if options.removepriv == True:
         filetag.removefield("PRIVATE")
     #--add
     if options.addfield != None:
-        if value == None:
-            raise Exception, "No value given."
-        filetag.addfield(options.addfield,value)
-    #--save
-    if options.save == True:
-        filetag.savetag()
+        for field, fieldvalue in options.addfield:
+            filetag.addfield(field,fieldvalue)
+    #--art-front, --art-back, --art-folder -> frames shared by the album
+    for picture in pictures(options, filename):
+        filetag.addpicture(picture)
+    #--convert -> the edits are written with the converted tag
+    if options.convert != None:
+        filetag.convert(int(options.convert[-1]), options.v1 or 'keep')
+    #--save -> written even if nothing changed, otherwise only changes are
+    else: filetag.commit(options.save == True)
     #--delay
     if options.delay != None:
         time.sleep(int(options.delay))
     #--info
     if options.info == True:
         filetag.printtag()
+    #--index -> the parsed tag is stored by the main process
+    if useindex:
+        return tagindex.makerecord(filetag, stamp)
+    #--removeart -> the bytes reclaimed are added up by the main process
+    return reclaimed
 
-def main():
+def exportfile(options, filename='', value=None):
+    """
+    Returns the --export record of filename.  Only the frames the record
+    needs are decoded.
+    """
+    import shelltag_src.id3tag as id3tag
+    import shelltag_src.export as export
+    return export.makerecord(id3tag.ID3Tag(filename, True))
+
+def applyfile(options, filename=None, edits=()):
+    """
+    Applies a group of --apply edits to filename with one load and one save.
+    Returns a list of (row number, error) of the edits which failed.
+
+    Attributes:
+    edits - list of (row number, field, value) where a value of None
+        removes the field, or (row number, None, error) for a row which
+        couldn't be read
+    """
+    if filename == None:
+        return [(number, str(error)) for number, field, error in edits]
+    import shelltag_src.id3tag as id3tag
+    setsaving(options)
+    failures = []
+    filetag = id3tag.ID3Tag(filename, False, options.dryrun == True)
+    filetag.begin()
+    for number, field, value in edits:
+        try:
+            if value == None: filetag.removefield(field)
+            else: filetag.addfield(field, value)
+        except Exception, err:
+            failures.append((number, parallel.describe(err)))
+    filetag.commit(options.save == True)
+    return failures
+
+def applymanifest(options):
+    """
+    Applies every row of the --apply manifest, reading it as it goes.
+    Returns the number of rows which failed.
+    """
+    import shelltag_src.manifest as manifest
+    failed = 0
+    #--bytes_per_sec, --files_per_sec -> files are let through by the budget
+    limiter = makethrottle(options)
+    #a file is only handed out once no worker is changing it; groups go one
+    #at a time so a held back group can't sit in a chunk being filled
+    inflight = manifest.InFlight(2 * max(options.jobs, 1))
+    f = open(options.apply, 'rb')
+    try:
+        groups = manifest.groups(manifest.rows(f, options.apply))
+        tasks = ((options, path, edits) for path, edits
+                in inflight.admitted(groups))
+        if limiter != None: tasks = limiter.admitted(tasks)
+        results = parallel.run(applyfile, tasks, options.jobs,
+                options.ordered, 1)
+        for task, result, output, errors, error in results:
+            inflight.done(task[1])
+            if limiter != None: limiter.account()
+            sys.stdout.write(output)
+            sys.stderr.write(errors)
+            stats.add('files')
+            #the whole file failed -> so did each of its rows
+            if error != None:
+                stats.add('failed')
+                result = [(number, error) for number, field, value in task[2]]
+            for number, rowerror in result:
+                failed += 1
+                if task[1] != None: rowerror = task[1] + ": " + rowerror
+                print >> sys.stderr, "shelltag: %s:%d: %s" % (options.apply,
+                        number, rowerror)
+    finally:
+        inflight.close()
+        if limiter != None: limiter.close()
+        f.close()
+    if failed > 0:
+        print >> sys.stderr, "shelltag: " + str(failed) + " row(s) failed."
+    return failed
+
+def makethrottle(options):
+    """
+    Returns the Throttle of --bytes_per_sec, --files_per_sec and
+    --throttle_file, or None if none is given.
+    """
+    if options.bytespersec == None and options.filespersec == None \
+            and options.throttlefile == None:
+        return None
+    import shelltag_src.throttle as throttle
+    try:
+        rates = [None, None]
+        if options.bytespersec != None:
+            rates[0] = throttle.parserate(options.bytespersec)
+        if options.filespersec != None:
+            rates[1] = throttle.parserate(options.filespersec)
+    except ValueError:
+        raise Exception, "Invalid rate given."
+    return throttle.Throttle(rates[0], rates[1], options.throttlefile,
+            options.jobs)
+
+def printstats(options, start):
+    """
+    Prints the --stats summary of the run to stderr.
+    """
+    if options.stats != True: return
+    for line in stats.summary(time.time() - start):
+        print >> sys.stderr, line
+
+def makeparser():
+    """
+    Returns the OptionParser for shelltag's command line.
+    """
     usage = "Usage: %prog [options] FILENAME VALUE\n\t%prog [options] DIRECTORY VALUE"
     parser = OptionParser(usage=usage)
     #--ORDER OF OPERATIONS
@@ -61,67 +277,348 @@ def main():
             help="deletes tag from FILENAME")
     parser.add_option("-c","--create", action='store_true', dest="createtag",
             help="creates blank tag in FILENAME")
-    parser.add_option("-r","--remove", dest="removefield",
-            help="removes FIELDNAME from tag", metavar="FIELDNAME")
+    parser.add_option("-r","--remove", action='append', dest="removefield",
+            help="removes FIELDNAME from tag, can be repeated", metavar="FIELDNAME")
     #TODO add option for removing id3v1 only
-    parser.add_option("-a","--add", dest="addfield",
-            help="adds VALUE onto tag under FIELDNAME", metavar="FIELDNAME")
+    parser.add_option("-a","--add", action='append', dest="addfield",
+            help="adds VALUE onto tag under FIELDNAME, can be repeated as "
+            "FIELDNAME=VALUE", metavar="FIELDNAME")
     parser.add_option("-i","--info", action='store_true', dest="info",
             help="displays information about file's, directory's tag")   
     #--SPECIALITY FEATURES
     parser.add_option("--removeart", action='store_true', dest="removeart",
-            help="removes artwork from tag")
+            help="removes artwork from tag, leaving the space it took as "
+            "padding")
+    parser.add_option("--compact", action='store_true', dest="compact",
+            help="with --removeart, shrinks the tag to its frames plus "
+            "--padding bytes instead")
     parser.add_option("--removepriv", action='store_true', dest="removepriv",
             help="removes private fields from tag")
+    parser.add_option("--art-front", dest="artfront",
+            help="embeds IMAGE as the front cover, reading it only once",
+            metavar="IMAGE")
+    parser.add_option("--art-back", dest="artback",
+            help="embeds IMAGE as the back cover, reading it only once",
+            metavar="IMAGE")
+    parser.add_option("--art-folder", action='store_true', dest="artfolder",
+            help="embeds the folder.jpg of each file's directory as the "
+            "front cover, unless --art-front is given")
     parser.add_option("--save", action='store_true', dest="save",
             help="rewrites tag so that date last modified is updated")
+    parser.add_option("--dry-run", action='store_true', dest="dryrun",
+            help="prints the changes each file would get without saving them")
+    parser.add_option("--padding", type='int', dest="padding",
+            help="reserves BYTES of padding, plus --padding_percent, when a "
+            "tag has to grow (default 1024)", metavar="BYTES")
+    parser.add_option("--padding_percent", type='int', dest="paddingpercent",
+            help="reserves PERCENT of the frames' size as padding on top of "
+            "--padding when a tag has to grow (default 1)", metavar="PERCENT")
+    parser.add_option("--max_padding", type='int', dest="maxpadding",
+            help="shrinks tags with more than BYTES of padding (default: "
+            "never shrink)", metavar="BYTES")
+    parser.add_option("--safe_save", action='store_true', dest="safesave",
+            help="when a tag no longer fits, writes a new copy of the file "
+            "and renames it over the old one instead of editing in place")
     parser.add_option("--delay", dest="delay",
             help="delays number of seconds after each action", metavar="NUM_OF_SECONDS")
+    parser.add_option("--bytes_per_sec", dest="bytespersec",
+            help="limits the bytes read and written by all workers to RATE "
+            "per second, ex. 20M", metavar="RATE")
+    parser.add_option("--files_per_sec", dest="filespersec",
+            help="limits the files started by all workers to RATE per "
+            "second", metavar="RATE")
+    parser.add_option("--throttle_file", dest="throttlefile",
+            help="reads bytes_per_sec=RATE and files_per_sec=RATE lines from "
+            "FILE whenever it changes, so the limits can be changed while "
+            "running", metavar="FILE")
     
     #--DIRECTORY FEATURES
     parser.add_option("-s","--include_subdirectories", action='store_true', dest="subdirectory",
             help="include subdirectories")
     parser.add_option("--reverse_directory", action='store_true', dest="reversedirectory",
             help="reverse directory order")
+    parser.add_option("--follow_symlinks", action='store_true', dest="followlinks",
+            help="include symlinked subdirectories")
+    parser.add_option("-j","--jobs", type='int', dest="jobs", default=1,
+            help="process files with NUM worker processes", metavar="NUM")
+    parser.add_option("--ordered", action='store_true', dest="ordered",
+            help="with --jobs, print results in directory order")
     
+    #--INDEX FEATURES
+    parser.add_option("--index", dest="index",
+            help="answers --info from INDEXFILE for unchanged files, adding "
+            "new and changed files to it", metavar="INDEXFILE")
+    parser.add_option("--rebuild", action='store_true', dest="rebuild",
+            help="with --index, rereads every file and drops entries of "
+            "deleted files")
+    parser.add_option("--verify", action='store_true', dest="verify",
+            help="with --index, lists files whose entries are missing or "
+            "out of date")
+
+    #--MANIFEST FEATURES
+    parser.add_option("--apply", dest="apply",
+            help="applies the edits in MANIFEST, a CSV or NDJSON file of "
+            "path,field,value rows or of a path and one column per field",
+            metavar="MANIFEST")
+
+    #--EXPORT FEATURES
+    parser.add_option("--export", dest="export", choices=exportformats,
+            help="writes one record per file with every field, the tag's "
+            "version, size, padding and artwork, as FORMAT (ndjson or csv)",
+            metavar="FORMAT")
+
+    #--CONVERT FEATURES
+    parser.add_option("--convert", dest="convert", choices=['2.3','2.4'],
+            help="converts the tag to ID3v2.3 or ID3v2.4 (VERSION 2.3 or "
+            "2.4) with the other edits in a single write, leaving tags "
+            "already converted alone", metavar="VERSION")
+    parser.add_option("--v1", dest="v1", choices=['strip','keep','sync'],
+            help="with --convert, removes the ID3v1 tag (strip), leaves it "
+            "as it is (keep, the default) or writes it from the converted "
+            "tag (sync)", metavar="MODE")
+
+    #--JOURNAL FEATURES
+    parser.add_option("--journal", dest="journal",
+            help="appends each file finished to JOURNAL with its size and "
+            "date modified", metavar="JOURNAL")
+    parser.add_option("--resume", dest="resume",
+            help="skips the files JOURNAL lists as finished which haven't "
+            "changed since, recording the rest to it", metavar="JOURNAL")
+
     #--CONVENIENCE FEATURES 
     parser.add_option("-l","--hold", action='store_true', dest="hold",
             help="at end of execution, user has to press enter to exit")
     parser.add_option("-q","--quiet", action='store_true', dest="quiet",
             help="no output")
+    parser.add_option("--stats", action='store_true', dest="stats",
+            help="at end of execution, prints the time spent in each phase "
+            "and the files, saves and bytes read and written to stderr")
+    return parser
+
+def checkoptions(parser, options):
+    """
+    Exits through parser.error if options can't be used together.
+    """
+    if options.resume != None and options.journal != None:
+        parser.error("--resume records to its own journal; "
+                "--journal can't be given with it")
+
+def walkpaths(options, paths):
+    """
+    Returns an iterator over the mp3s of paths, each a file or a directory.
+    Every path is checked before any is walked.
+    """
+    #--reversedirectory is enabled -> reverse directory reading order
+    if options.reversedirectory: reverse = True
+    else: reverse = False
+
+    lists = []
+    for path in paths:
+        if os.path.isdir(path): #Directory processing
+            lists.append(directory.walk(path, options.subdirectory == True,
+                    reverse, options.followlinks == True))
+        elif os.path.isfile(path) and directory.ismp3(path):  #File processing
+            lists.append([path])
+        else:
+            raise Exception, "Invalid path given."
+    return itertools.chain(*lists)
+
+def processpaths(options, paths, value=None):
+    """
+    Processes every mp3 of paths, each a file or a directory, printing the
+    results as each file finishes.  Returns the number of files which
+    failed.
+    """
+    #--add -> pair each field with its value
+    if options.addfield != None:
+        options.addfield = parsefields(options.addfield, value)
+
+    pathlist = walkpaths(options, paths)
+
+    failed = 0
+    reclaimed = [0, 0]  #bytes and files of --removeart
+    index = None
+    if options.index != None:
+        import shelltag_src.tagindex as tagindex
+        index = tagindex.getindex(options.index)
+    elif options.rebuild or options.verify:
+        raise Exception, "--rebuild and --verify need --index."
+    if options.v1 != None and options.convert == None:
+        raise Exception, "--v1 needs --convert."
+
+    if options.verify == True: #--verify
+        for eachfile, status in index.verify(pathlist):
+            failed += 1
+            print "[VERIFY]" + eachfile + ": " + status
+        for path in paths:
+            for entry in index.entries(path):
+                if not os.path.isfile(entry):
+                    failed += 1
+                    print ("[VERIFY]" + entry + ": missing").encode('UTF-8')
+        pathlist = []
+
+    #--export -> records are written as each file finishes
+    function = processfile
+    writer = None
+    if options.export != None:
+        import shelltag_src.export as export
+        function = exportfile
+        writer = export.writers[options.export](sys.stdout)
+
+    #--journal, --resume -> finished files are recorded, --resume skips them
+    journalfile = None
+    if options.resume != None or options.journal != None:
+        import shelltag_src.journal as journal
+    if options.resume != None:
+        journalfile = journal.Journal(options.resume, True)
+        pathlist = journalfile.pending(pathlist)
+    elif options.journal != None:
+        journalfile = journal.Journal(options.journal)
+    if options.dryrun == True: record = False #nothing is finished
+    else: record = journalfile != None
+
+    #--jobs -> files are spread over worker processes
+    tasks = ((options,eachfile,value)
+            for eachfile in stats.timed('walk', pathlist))
+    #--bytes_per_sec, --files_per_sec -> files are let through by the budget
+    limiter = makethrottle(options)
+    chunksize = 16
+    if limiter != None:
+        tasks = limiter.admitted(tasks)
+        chunksize = 1
+    #held until the finally below has closed limiter, so stopping the
+    #workers can't wait on it
+    results = parallel.run(function, tasks, options.jobs, options.ordered,
+            chunksize)
+    try:
+        for task, result, output, errors, error in results:
+            if limiter != None: limiter.account()
+            sys.stderr.write(errors)
+            stats.add('files')
+            if error != None:
+                failed += 1
+                stats.add('failed')
+                print >> sys.stderr, "shelltag: " + task[1] + ": " + error
+                continue
+            elif writer != None:
+                writer.write(result)
+            else:
+                sys.stdout.write(output)
+                if options.removeart == True:
+                    if result: reclaimed = [reclaimed[0] + result, reclaimed[1] + 1]
+                elif result != None: index.store(result)
+            if record: journalfile.record(task[1])
+    finally:
+        if limiter != None: limiter.close()
+        if journalfile != None: journalfile.close()
+    if journalfile != None and journalfile.skipped > 0:
+        stats.add('files', journalfile.skipped)
+        stats.add('unchanged', journalfile.skipped)
+        print "[RESUME]%d file(s) already done, skipped." % journalfile.skipped
+    if options.removeart == True:
+        if options.dryrun == True: status = "would be reclaimed"
+        else: status = "reclaimed"
+        print "[REMOVEART]%d bytes %s from %d file(s)." % (reclaimed[0],
+                status, reclaimed[1])
+    if failed > 0:
+        print >> sys.stderr, "shelltag: " + str(failed) + " file(s) failed."
+
+    if index != None:
+        #--rebuild -> entries of deleted files are dropped
+        if options.rebuild == True and options.verify != True:
+            for path in paths:
+                for entry in index.prune(path):
+                    print ("[PRUNE]" + entry + ": removed from index").encode('UTF-8')
+        index.close()
+
+    return failed
+
+def runrequest(argv):
+    """
+    Runs one shelltagd request, a command line whose positional arguments
+    are all paths (values are given as -a FIELDNAME=VALUE), printing to
+    sys.stdout and sys.stderr.  Returns the exit status.
+    """
+    parser = makeparser()
+    parser.prog = 'shelltagc.py'
+    try:
+        (options, args) = parser.parse_args(argv)
+        checkoptions(parser, options)
+    except SystemExit, err: return err.code #bad options or --help
+    start = time.time()
+    stats.reset()
+    stats.enable(options.stats == True)
+    #images may have changed since the last request
+    artwork = sys.modules.get('shelltag_src.artwork')
+    if artwork != None:
+        artwork.images.clear()
+        artwork.folders.clear()
+
+    #--quiet is enabled -> write to null until the request is done
+    stdout = sys.stdout
+    if options.quiet == True:
+        sys.stdout = open(os.devnull,'w')
+
+    try:
+        if options.apply != None:
+            failed = applymanifest(options)
+        elif len(args) == 0:
+            parser.print_usage(sys.stderr)
+            return 2
+        else:
+            failed = processpaths(options, args)
+        sys.stdout.flush()
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+    printstats(options, start)
+    if failed > 0: return 1
+    return 0
+
+def main():
+    parser = makeparser()
     (options, args) = parser.parse_args()
+    checkoptions(parser, options)
+    start = time.time()
+
+    #--stats is enabled -> record before any worker is started
+    if options.stats == True: stats.enable()
    
     #--quiet is enabled -> write to null
     if options.quiet == True:
         sys.stdout = open(os.devnull,'w')
+    #output to a file or pipe -> written through a large buffer
+    elif not sys.stdout.isatty():
+        sys.stdout = os.fdopen(os.dup(sys.stdout.fileno()), 'w', outputbuffer)
+
+    #--apply -> edits come from the manifest instead of the command line
+    if options.apply != None:
+        failed = applymanifest(options)
+        sys.stdout.flush()
+        printstats(options, start)
+        if failed > 0: return 1
+        return 0
 
-    #--reversedirectory is enabled -> reverse directory reading order
-    if options.reversedirectory: reverse = True
-    else: reverse = False
-    
     try: path = args[0] #file/directory
     except IndexError:
         parser.print_usage()
         return
     try: value = args[1] #value
     except IndexError: value = None
-    
-    if os.path.isdir(path): #Directory processing
-        if options.subdirectory == True:
-            pathlist = directory.getlistwithsubdirectory(path, reverse)
-        else:
-            pathlist = directory.getlist(path, reverse)
-        for eachfile in pathlist:
-            processfile(options,eachfile,value)
-    elif os.path.isfile(path) and path[-4:] == ".mp3":  #File processing
-        processfile(options,path,value)
-    else:
-        raise Exception, "Invalid path given."
+
+    failed = processpaths(options, [path], value)
+
+    sys.stdout.flush()
+    printstats(options, start)
 
     #--hold is enabled -> Press any key to exit.
     if options.hold == True:
         raw_input("Press any key to exit.")
 
+    if failed > 0: return 1
+    return 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
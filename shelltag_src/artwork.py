@@ -0,0 +1,177 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module builds the APIC frames of pictures embedded from image files.
+Each image is read once per process, and its data and encoded frame body
+are shared by the frames of every tag it's added to, so tagging an album
+reads the cover once rather than once per track, and encodes it once
+rather than once per save.  Each tag still gets a frame of its own.  Only
+the images used most recently are kept, so memory doesn't grow with the
+number of albums.
+
+frame = artwork.picture("D:\\Music\\OK Computer\\front.jpg", artwork.FRONT)
+frame = artwork.folderpicture("D:\\Music\\OK Computer")
+"""
+
+import os
+import os.path
+
+from mutagen.id3 import APIC
+
+import stats
+
+#ID3 picture types
+FRONT = 3
+BACK = 4
+
+descriptions = {FRONT: u'Front Cover', BACK: u'Back Cover'}
+
+#names of a directory's own picture, used as its front cover
+foldernames = ('folder.jpg', 'Folder.jpg', 'folder.png', 'Folder.png')
+
+class Recent(object):
+    """
+    Dict of at most size entries, dropping the least recently used one when
+    another is added, so a walk over a whole library only keeps the
+    pictures of the last few directories.
+
+    Attributes:
+    size - most entries kept
+    entries - key -> value
+    order - keys from the least to the most recently used
+    """
+    def __init__(self, size):
+        self.size = size
+        self.entries = {}
+        self.order = []
+
+    def get(self, key, default=None):
+        if key not in self.entries: return default
+        self.order.remove(key)
+        self.order.append(key)
+        return self.entries[key]
+
+    def __getitem__(self, key):
+        if key not in self.entries: raise KeyError, key
+        return self.get(key)
+
+    def __setitem__(self, key, value):
+        if key in self.entries: self.order.remove(key)
+        elif len(self.order) >= self.size: del self.entries[self.order.pop(0)]
+        self.entries[key] = value
+        self.order.append(key)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        del self.order[:]
+
+#images and directories kept; a front and a back cover given for every file
+#plus the folder pictures of the directories being worked on
+cachesize = 8
+
+#real path -> Image
+images = Recent(cachesize)
+#directory -> path of its picture, or None if it has none
+folders = Recent(cachesize)
+
+class Image(object):
+    """
+    Image file read for pictures.
+
+    Attributes:
+    mime - MIME type of the image
+    data - bytes of the image
+    encoded - (encoding, MIME type, picture type, description) -> frame
+        body already encoded for them
+    """
+
+    def __init__(self, mime, data):
+        self.mime = mime
+        self.data = data
+        self.encoded = {}
+
+class SharedAPIC(APIC):
+    """
+    APIC frame of an Image.  Its body is encoded once per set of attributes
+    for every frame of the image, as long as the frame's data is the
+    image's.
+    """
+    image = None
+
+    def _writeData(self):
+        if self.image == None or self.data is not self.image.data:
+            return APIC._writeData(self)
+        key = (self.encoding, self.mime, self.type, self.desc)
+        if key not in self.image.encoded:
+            self.image.encoded[key] = APIC._writeData(self)
+        return self.image.encoded[key]
+
+#frame classes must keep their ID3 names, since FrameID is the class name
+SharedAPIC.__name__ = 'APIC'
+
+def mimetype(data, filename):
+    """
+    Returns the MIME type of image data, by its first bytes or else by the
+    extension of filename.
+    """
+    if data.startswith('\xff\xd8'): return u'image/jpeg'
+    if data.startswith('\x89PNG'): return u'image/png'
+    if data.startswith('GIF8'): return u'image/gif'
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.png': return u'image/png'
+    return u'image/jpeg'
+
+def picture(path, pictype=FRONT):
+    """
+    Returns a new APIC frame of the image at path.  The image is read
+    once and kept while it's among the cachesize used most recently.
+
+    Attributes:
+    path - filename of a JPEG or PNG image
+    pictype - FRONT, BACK or another ID3 picture type
+
+    Exceptions:
+    IOError - image can't be read
+    """
+    key = os.path.realpath(path)
+    image = images.get(key)
+    if image == None:
+        f = open(path, 'rb')
+        try: data = f.read()
+        finally: f.close()
+        stats.add('read', len(data))
+        image = Image(mimetype(data, path), data)
+        images[key] = image
+    #latin-1 is valid in ID3v2.3 and 2.4, so the frame is never converted
+    frame = SharedAPIC(encoding=0, mime=image.mime, type=pictype,
+            desc=descriptions.get(pictype, u''), data=image.data)
+    frame.image = image
+    return frame
+
+def folderpicture(directory):
+    """
+    Returns a new APIC frame of the front cover kept in directory as
+    folder.jpg (or folder.png), or None if there is none.  A directory
+    is only looked in again once it's no longer among those kept.
+    """
+    directory = os.path.abspath(directory)
+    if directory not in folders:
+        folders[directory] = None
+        for name in foldernames:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                folders[directory] = path
+                break
+    if folders[directory] == None: return None
+    return picture(folders[directory], FRONT)
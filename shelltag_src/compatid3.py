@@ -20,10 +20,14 @@
 
 import struct
 from struct import pack, unpack
+import os
 import mutagen
-from mutagen._util import insert_bytes
+from mutagen._util import insert_bytes, delete_bytes
 from mutagen.id3 import ID3, Frame, Frames, Frames_2_2, TextFrame, TORY, \
-                        TYER, TIME, APIC, IPLS, TDAT, BitPaddedInt, MakeID3v1
+                        TYER, TIME, APIC, IPLS, TDAT, BitPaddedInt
+
+import fileutil
+import stats
 
 class TCMP(TextFrame):
     pass
@@ -34,14 +38,36 @@ class XDOR(TextFrame):
 class XSOP(TextFrame):
     pass
 
+#number of saves done in place and with the audio moved, see CompatID3.save
+savecounts = {'inplace': 0, 'rewrite': 0}
+
 class CompatID3(ID3):
     """
     Additional features over mutagen.id3.ID3:
      * ID3v2.3 writing
      * iTunes' TCMP frame
+     * padding policy for in place saving
+
+    Padding policy (class attributes, can be set per instance):
+    MINPADDING -- bytes of padding reserved when the tag has to grow
+    PADDINGPERCENT -- padding reserved on top of MINPADDING, as a percentage
+        of the frames
+    MAXPADDING -- padding kept before the tag is shrunk, None never shrinks
+
+    SAFESAVE -- if True, a save which has to move the audio writes a new
+    file next to the old one and renames it over the old one, so a crash
+    never leaves a half written file.
+
+    After a save, lastsave is 'inplace' if only the tag was written or
+    'rewrite' if the audio had to be moved.
     """
 
     PEDANTIC = False
+    MINPADDING = 1024
+    PADDINGPERCENT = 1
+    MAXPADDING = None
+    SAFESAVE = False
+    lastsave = None
 
     def __init__(self, *args, **kwargs):
         self.unknown_frames = []
@@ -66,6 +92,7 @@ class CompatID3(ID3):
         v2 -- version of ID3v2 tags (3 or 4). By default Mutagen saves ID3v2.4
               tags. If you want to save ID3v2.3 tags, you must call method
               update_to_v23 before saving the file.
+              if 0, only the ID3v1 tag is written and an ID3v2 tag is removed
 
         The lack of a way to update only an ID3v1 tag is intentional.
         """
@@ -78,9 +105,10 @@ class CompatID3(ID3):
         frames.sort(lambda a, b: cmp(order.get(a[0][:4], last),
                                      order.get(b[0][:4], last)))
 
-        framedata = [self.__save_frame(frame, v2) for (key, frame) in frames]
-        framedata.extend([data for data in self.unknown_frames
-                if len(data) > 10])
+        with stats.phase('encode'):
+            framedata = [self.__save_frame(frame, v2) for (key, frame) in frames]
+            framedata.extend([data for data in self.unknown_frames
+                    if len(data) > 10])
         if not framedata:
             try:
                 self.delete(filename)
@@ -89,7 +117,19 @@ class CompatID3(ID3):
                 if err.errno != ENOENT: raise
             return
 
-        framedata = ''.join(framedata)
+        self.writetag(''.join(framedata), filename, v1, v2)
+
+    def writetag(self, framedata, filename=None, v1=1, v2=4, flags=0):
+        """Write framedata, the encoded frames of an ID3v2 tag, to a file
+        with padding chosen by the padding policy.  save() calls this once
+        the frames are encoded; it can also be given frames copied from a
+        file as they are.
+
+        Keyword arguments:
+        v1 -- as for save(), or None to leave an ID3v1 tag as it is
+        v2 -- as for save()
+        flags -- flags byte of the ID3v2 header
+        """
         framesize = len(framedata)
 
         if filename is None: filename = self.filename
@@ -101,43 +141,127 @@ class CompatID3(ID3):
             f = open(filename, 'rb+')
         try:
             idata = f.read(10)
-            try: id3, vmaj, vrev, flags, insize = unpack('>3sBBB4s', idata)
+            try: id3, vmaj, vrev, inflags, insize = unpack('>3sBBB4s', idata)
             except struct.error: id3, insize = '', 0
             insize = BitPaddedInt(insize)
             if id3 != 'ID3': insize = -10
 
-            if insize >= framesize: outsize = insize
-            else: outsize = (framesize + 1023) & ~0x3FF
+            if v2 == 0:
+                self.__save_nov2(f, filename, insize, v1)
+                return
+
+            outsize = self.__tagsize(insize, framesize)
             framedata += '\x00' * (outsize - framesize)
 
             framesize = BitPaddedInt.to_str(outsize, width=4)
-            flags = 0
             header = pack('>3sBBB4s', 'ID3', v2, 0, flags, framesize)
             data = header + framedata
 
-            if (insize < outsize):
-                insert_bytes(f, outsize-insize, insize+10)
-            f.seek(0)
-            f.write(data)
-
-            try:
-                f.seek(-128, 2)
-            except IOError, err:
-                from errno import EINVAL
-                if err.errno != EINVAL: raise
-                f.seek(0, 2) # ensure read won't get "TAG"
-
-            if f.read(3) == "TAG":
-                f.seek(-128, 2)
-                if v1 > 0: f.write(MakeID3v1(self))
-                else: f.truncate()
-            elif v1 == 2:
-                f.seek(0, 2)
-                f.write(MakeID3v1(self))
+            if insize == outsize: self.lastsave = 'inplace'
+            else: self.lastsave = 'rewrite'
+            savecounts[self.lastsave] += 1
+            stats.add(self.lastsave)
+
+            if insize != outsize and self.SAFESAVE:
+                self.__safesave(f, filename, data, insize + 10, v1)
+                return
+            if insize != outsize:
+                self.__move(f, outsize - insize, min(insize, outsize) + 10)
+            with stats.phase('write'):
+                f.seek(0)
+                f.write(data)
+                stats.add('written', len(data))
+                self.__save_v1(f, v1)
 
         finally:
             f.close()
 
+    def __save_v1(self, f, v1):
+        if v1 == None: return
+        import id3v1    #id3v1 imports this module
+        try:
+            f.seek(-128, 2)
+        except IOError, err:
+            from errno import EINVAL
+            if err.errno != EINVAL: raise
+            f.seek(0, 2) # ensure read won't get "TAG"
+
+        if f.read(3) == "TAG":
+            f.seek(-128, 2)
+            if v1 > 0:
+                f.write(id3v1.render(self))
+                stats.add('written', 128)
+            else: f.truncate()
+        elif v1 == 2:
+            f.seek(0, 2)
+            f.write(id3v1.render(self))
+            stats.add('written', 128)
+
+    def __save_nov2(self, f, filename, insize, v1):
+        """Remove the ID3v2 tag of f (insize bytes, -10 if there is none)
+        and write the ID3v1 tag.
+        """
+        if insize < 0: self.lastsave = 'inplace'
+        else: self.lastsave = 'rewrite'
+        savecounts[self.lastsave] += 1
+        stats.add(self.lastsave)
+        if insize < 0:
+            with stats.phase('write'): self.__save_v1(f, v1)
+        elif self.SAFESAVE:
+            self.__safesave(f, filename, '', insize + 10, v1)
+        else:
+            self.__move(f, -(insize + 10), 0)
+            with stats.phase('write'): self.__save_v1(f, v1)
+
+    def __move(self, f, size, offset):
+        """Insert size bytes at offset of f, or delete -size bytes if size is
+        negative, moving everything after them.
+        """
+        with stats.phase('move'):
+            if stats.counting():    #everything after offset is read and rewritten
+                moved = os.fstat(f.fileno()).st_size - offset
+                stats.add('read', moved)
+                stats.add('written', moved)
+            if size > 0: insert_bytes(f, size, offset)
+            else: delete_bytes(f, -size, offset)
+
+    def __safesave(self, f, filename, data, audiooffset, v1):
+        """Write data followed by the audio of f (from audiooffset on) to a
+        temporary file, then rename it over filename.
+        """
+        out, tempname = fileutil.tempfor(filename)
+        try:
+            with stats.phase('copy'):
+                out.write(data)
+                copied = fileutil.copyrange(f, out, audiooffset)
+                stats.add('read', copied)
+                stats.add('written', len(data) + copied)
+                self.__save_v1(out, v1)
+            f.close()
+            with stats.phase('fsync'):
+                fileutil.replacefile(out, tempname, filename)
+        except:
+            out.close()
+            if os.path.exists(tempname): os.remove(tempname)
+            raise
+
+    def __tagsize(self, insize, framesize):
+        """Return the size of the tag to write, excluding its header.
+
+        The existing tag (insize bytes, -10 if there is none) is reused if
+        the frames fit and it wastes at most MAXPADDING bytes.  Otherwise
+        the frames get MINPADDING plus PADDINGPERCENT of their size as
+        padding, rounded up to a whole kilobyte.
+        """
+        if insize >= framesize:
+            if self.MAXPADDING is None or insize - framesize <= self.MAXPADDING:
+                return insize
+        padding = self.MINPADDING + framesize * self.PADDINGPERCENT // 100
+        outsize = (framesize + padding + 1023) & ~0x3FF
+        if self.MAXPADDING is not None:
+            outsize = max(framesize, min(outsize, framesize + self.MAXPADDING))
+        return outsize
+
     def __save_frame(self, frame, v2):
         flags = 0
         if self.PEDANTIC and isinstance(frame, TextFrame):
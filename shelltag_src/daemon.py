@@ -0,0 +1,284 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module holds the server and the client of shelltagd, a process which
+keeps shelltag loaded and runs command lines sent to it over a Unix domain
+socket, so a command line doesn't pay for starting python and importing
+mutagen.
+
+Each request and reply is a line of JSON.  A request carries a command line
+and the directory it's relative to...
+
+{"cwd": "/music", "argv": ["-a", "COMMENT=Ripped", "a.mp3", "b.mp3"]}
+
+and is answered by what it prints, in pieces, then its exit status...
+
+{"stdout": "[ADD]/music/a.mp3: COMMENT=Ripped\n..."}
+{"stderr": "shelltag: /music/b.mp3: ..."}
+{"status": 1}
+
+A line which isn't a request is answered with a status of 2 and an error,
+ex. {"status": 2, "error": "bad request: ..."}.
+
+Strings are sent as bytes, each byte a character, so paths and output in
+any encoding go through unchanged.  {"stop": true} stops the server.
+"""
+
+import os
+import os.path
+import sys
+import errno
+import fcntl
+import socket
+import traceback
+
+try: import json
+except ImportError: import simplejson as json
+
+#bytes of stdout collected before they're sent to the client
+buffersize = 64 * 1024
+#connections waiting to be served
+backlog = 16
+
+def defaultsocket():
+    """
+    Returns the socket path used when none is given: $SHELLTAGD_SOCKET, or
+    shelltagd-UID.sock in the temporary directory.
+    """
+    path = os.environ.get('SHELLTAGD_SOCKET')
+    if path: return path
+    return os.path.join(os.environ.get('TMPDIR', '/tmp'),
+            'shelltagd-%d.sock' % os.getuid())
+
+def wire(value):
+    """
+    Returns value with its byte strings as unicode, one character per byte,
+    so it can be written as JSON.
+    """
+    if isinstance(value, str): return value.decode('latin-1')
+    if isinstance(value, list): return [wire(item) for item in value]
+    if isinstance(value, dict):
+        return dict([(key, wire(item)) for key, item in value.items()])
+    return value
+
+def unwire(value):
+    """
+    Returns value with its unicode strings back as the bytes given to wire.
+    """
+    if isinstance(value, unicode): return value.encode('latin-1')
+    if isinstance(value, list): return [unwire(item) for item in value]
+    if isinstance(value, dict):
+        return dict([(str(key), unwire(item)) for key, item in value.items()])
+    return value
+
+def send(connection, message):
+    """
+    Sends a message, a dict, as one line of JSON.
+    """
+    connection.sendall(json.dumps(wire(message)) + '\n')
+
+def receive(lines):
+    """
+    Returns the next message from lines, a file object of the connection,
+    or None if the connection was closed.
+    """
+    line = lines.readline()
+    if not line: return None
+    return unwire(json.loads(line))
+
+class Stream(object):
+    """
+    File object sending what is written to it to the client.
+
+    Attributes:
+    connection - socket of the client
+    name - 'stdout' or 'stderr'
+    before - Stream flushed before anything is written to this one, so
+        errors come after the output printed before them
+    size - bytes held until the next flush, 0 sends every write at once
+    pieces - strings written since the last flush
+    """
+    softspace = 0
+
+    def __init__(self, connection, name, before=None, size=buffersize):
+        self.connection = connection
+        self.name = name
+        self.before = before
+        self.size = size
+        self.pieces = []
+        self.held = 0
+
+    def write(self, data):
+        if isinstance(data, unicode): data = data.encode('UTF-8')
+        if self.before != None: self.before.flush()
+        self.pieces.append(data)
+        self.held += len(data)
+        if self.held >= self.size: self.flush()
+
+    def writelines(self, lines):
+        for line in lines: self.write(line)
+
+    def flush(self):
+        if self.pieces:
+            data = ''.join(self.pieces)
+            self.pieces = []
+            self.held = 0
+            send(self.connection, {self.name: data})
+
+    def isatty(self):
+        return False
+
+def handle(connection, function):
+    """
+    Serves one request on connection.  Returns False if it asked the server
+    to stop.
+    """
+    try:
+        request = receive(connection.makefile('rb'))
+        if request == None: return True
+        if not isinstance(request, dict):
+            raise ValueError, "request isn't a JSON object"
+        stopping = request.get('stop')
+    except (ValueError, AttributeError), error:  #not a request, keep serving
+        send(connection, {'status': 2, 'error': "bad request: " + str(error)})
+        return True
+    if stopping:
+        send(connection, {'status': 0})
+        return False
+
+    out = Stream(connection, 'stdout')
+    err = Stream(connection, 'stderr', out, 0)
+    cwd = os.getcwd()
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = out, err
+    try:
+        try:
+            os.chdir(request['cwd'])
+            status = function(request['argv'])
+        except Exception, error:
+            description = traceback.format_exception_only(type(error), error)
+            print >> err, "shelltag: " + ''.join(description).strip()
+            status = 1
+        out.flush()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        os.chdir(cwd)
+    send(connection, {'status': status})
+    return True
+
+def listen(socketpath):
+    """
+    Returns a server socket listening at socketpath.  The socket is bound
+    under a temporary name and renamed to socketpath once it's listened on,
+    while socketpath.lock is held, so a socket found at socketpath either
+    answers or was left by a dead server.
+
+    Exceptions:
+    socket.error - another server is using socketpath
+    """
+    umask = os.umask(0077)
+    try: lock = open(socketpath + '.lock', 'a')
+    finally: os.umask(umask)
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        if os.path.exists(socketpath):
+            try: request(socketpath, None)
+            except socket.error, error:
+                if error.errno not in (errno.ECONNREFUSED, errno.ENOENT): raise
+                os.remove(socketpath)   #left by a dead server
+            else:
+                raise socket.error, "shelltagd is already running on " + socketpath
+        temppath = "%s.%d" % (socketpath, os.getpid())
+        if os.path.exists(temppath): os.remove(temppath)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            umask = os.umask(0077)
+            try: server.bind(temppath)
+            finally: os.umask(umask)
+            server.listen(backlog)
+            os.rename(temppath, socketpath)
+        except:
+            server.close()
+            if os.path.exists(temppath): os.remove(temppath)
+            raise
+        return server
+    finally:
+        lock.close()    #releases the lock
+
+def serve(socketpath, function):
+    """
+    Serves requests on a Unix domain socket at socketpath, one at a time,
+    until a stop request.  Each request's command line is run by
+    function(argv), which returns the exit status, with sys.stdout and
+    sys.stderr sent to the client.  The socket can only be used by this
+    user.
+
+    Exceptions:
+    socket.error - another server is using socketpath
+    """
+    server = listen(socketpath)
+    try:
+        serving = True
+        while serving:
+            connection, address = server.accept()
+            try:
+                serving = handle(connection, function)
+            except socket.error, error: #the client went away
+                print >> sys.stderr, "shelltagd: " + str(error)
+            finally:
+                connection.close()
+    finally:
+        server.close()
+        os.remove(socketpath)
+
+def request(socketpath, argv, cwd=None, stdout=None, stderr=None):
+    """
+    Has the server at socketpath run a command line, writing what it
+    prints to stdout and stderr.  Returns the exit status.  An argv of None
+    only checks that the server is there.
+
+    Attributes:
+    argv - list of arguments, whose positional arguments are all paths
+    cwd - directory the paths are relative to, the current one by default
+
+    Exceptions:
+    socket.error - the server can't be reached or went away
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socketpath)
+        if argv == None: return 0
+        if cwd == None: cwd = os.getcwd()
+        send(connection, {'cwd': cwd, 'argv': argv})
+        lines = connection.makefile('rb')
+        while True:
+            message = receive(lines)
+            if message == None:
+                raise socket.error, "shelltagd closed the connection"
+            if 'stdout' in message and stdout != None:
+                stdout.write(message['stdout'])
+            elif 'stderr' in message and stderr != None:
+                stderr.write(message['stderr'])
+            elif 'status' in message:
+                if 'error' in message and stderr != None:
+                    stderr.write("shelltagd: " + message['error'] + "\n")
+                return message['status']
+    finally:
+        connection.close()
+
+def stop(socketpath):
+    """
+    Stops the server at socketpath.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socketpath)
+        send(connection, {'stop': True})
+        receive(connection.makefile('rb'))
+    finally:
+        connection.close()
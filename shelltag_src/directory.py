@@ -13,6 +13,90 @@ import os
 import os.path
 import sys
 
+try: from os import scandir
+except ImportError:
+    try: from scandir import scandir    #scandir package for older pythons
+    except ImportError: scandir = None
+
+extensions = ('.mp3',)
+
+def ismp3(filename):
+    """
+    Returns True if filename has an mp3 extension, in any case.
+
+    Attributes:
+    filename - string of filename or pathname
+    """
+    return os.path.splitext(filename)[1].lower() in extensions
+
+def entries(path, followlinks = False):
+    """
+    Returns a tuple of (files, directories), the absolute paths of the mp3s
+    and of the subdirectories directly inside of path, in listing order.
+
+    Attributes:
+    path - string of absolute pathname
+    followlinks - True = symlinked directories are included
+    """
+    files = []
+    directories = []
+    if scandir != None:
+        for entry in scandir(path):
+            if entry.is_dir(follow_symlinks=followlinks):
+                directories.append(entry.path)
+            elif ismp3(entry.name) and entry.is_file():
+                files.append(entry.path)
+    else:
+        for name in os.listdir(path):
+            fullpath = os.path.join(path,name)
+            if os.path.isdir(fullpath):
+                if followlinks or not os.path.islink(fullpath):
+                    directories.append(fullpath)
+            elif ismp3(name) and os.path.isfile(fullpath):
+                files.append(fullpath)
+    return (files, directories)
+
+def walk(path, subdirectory = False, reversal = False, followlinks = False,
+        visited = None):
+    """
+    Yields absolute filenames of mp3s of a given directory as soon as
+    each directory is read.  Only one directory listing is held in memory
+    at a time, and the working directory is never changed.
+
+    The order is the listing order of each directory, with a directory's
+    files coming before its subdirectories.  Reversal yields exactly the
+    opposite order without building the whole list first.
+
+    Attributes:
+    path - string of pathname in absolute or relative
+    subdirectory - True = include subdirectories
+    reversal - True = reverse order, False = do not reverse
+    followlinks - True = descend into symlinked directories
+    visited - set of real paths already walked, guards against symlink loops
+    """
+    path = os.path.abspath(path)
+    if followlinks == True:
+        if visited == None: visited = set()
+        realpath = os.path.realpath(path)
+        if realpath in visited: return
+        visited.add(realpath)
+
+    files, directories = entries(path, followlinks)
+    if subdirectory == False: directories = []
+
+    if reversal == True:
+        for directory in reversed(directories):
+            for filename in walk(directory, True, True, followlinks, visited):
+                yield filename
+        for filename in reversed(files):
+            yield filename
+    else:
+        for filename in files:
+            yield filename
+        for directory in directories:
+            for filename in walk(directory, True, False, followlinks, visited):
+                yield filename
+
 def getlist(path, reversal = False):
     """
     Returns a list of filenames of mp3s of absolute path of given directory
@@ -22,18 +106,7 @@ def getlist(path, reversal = False):
     path - string of pathname in absolute or relative
     reversal - True = reverse order, False = do not reverse
     """
-    rootdir = os.getcwd()   #TODO getcwdu - unicode version
-    os.chdir(path)
-    filelist = os.listdir(path)
-    
-    if reversal == True:
-        filelist.reverse()
-    absfilelist = []
-    for file in filelist:
-        if file[-4:] == ".mp3": absfilelist.append(os.path.abspath(file))
-
-    os.chdir(rootdir)
-    return absfilelist
+    return list(walk(path, False, reversal))
 
 def getlistwithsubdirectory(path, reversal = False):
     """
@@ -44,12 +117,4 @@ def getlistwithsubdirectory(path, reversal = False):
     path - string of pathname in absolute or relative
     reversal - True = reverse order, False = do not reverse
     """
-    filelist = []
-    for root, dirs, files in os.walk(os.path.abspath(path)):
-        for name in files:
-            if name[-4:] == ".mp3":
-                filelist.append(os.path.join(root,name))
-                print os.path.join(root,name)
-    if reversal == True: filelist.reverse()
-    return filelist
-            
+    return list(walk(path, True, reversal))
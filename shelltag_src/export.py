@@ -0,0 +1,111 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module contains functions for exporting the tags of a library as one
+record per file, written as NDJSON (one JSON object per line) or CSV.
+
+A record holds the file's path, tag version, tag size, padding, a list of
+its artwork and every shelltag field, with None (an empty CSV cell) for
+fields the tag doesn't have.  Custom fields which aren't shelltag fields
+are kept together under CUSTOM.
+"""
+
+import os.path
+import csv
+
+try: import json
+except ImportError: import simplejson as json
+
+import frame as Frame
+from tagindex import indexkey
+
+#fields written before the tag's fields
+infocolumns = ['PATH', 'VERSION', 'TAGSIZE', 'PADDING', 'ARTWORK', 'CUSTOM']
+#every field which can be read as a string
+fieldcolumns = sorted([field for field, entry in Frame.fields.items()
+        if entry[Frame.kind] != Frame.BINARYKIND and field != 'CUSTOM'])
+columns = infocolumns + fieldcolumns
+
+def artwork(tag):
+    """
+    Returns a list of dicts describing the pictures of tag, without reading
+    the picture data of lazily loaded tags.
+    """
+    pictures = []
+    for picture in tag.getall('APIC'):
+        if hasattr(picture, 'datasize'): size = picture.datasize()
+        else: size = len(picture.data)
+        pictures.append({'type': picture.type, 'mime': picture.mime,
+                'desc': picture.desc, 'size': size})
+    return pictures
+
+def makerecord(filetag):
+    """
+    Returns the record of an ID3Tag as a picklable dict of column -> value.
+
+    Attributes:
+    filetag - ID3Tag, with or without a tag
+    """
+    record = dict.fromkeys(columns)
+    record['PATH'] = indexkey(os.path.abspath(filetag.filename))
+    record['ARTWORK'] = []
+    record['CUSTOM'] = {}
+    tag = filetag.tag
+    if tag == None: return record
+
+    record['VERSION'] = u'.'.join([str(number) for number in tag.version])
+    record['TAGSIZE'] = getattr(tag, 'size', 0)
+    record['PADDING'] = getattr(tag, 'padding', None)
+    record['ARTWORK'] = artwork(tag)
+    for field, value in filetag.getfields().items():
+        if field in Frame.fields: record[field] = value
+        else: record['CUSTOM'][field] = value
+    return record
+
+class NDJSONWriter(object):
+    """
+    Writes records to a file as one JSON object per line.
+
+    Attributes:
+    out - file object
+    """
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, record):
+        self.out.write(json.dumps(record, sort_keys=True) + '\n')
+
+class CSVWriter(object):
+    """
+    Writes records to a file as CSV in UTF-8, with a header row of the
+    column names.  ARTWORK and CUSTOM are written as JSON.
+
+    Attributes:
+    out - file object
+    writer - csv writer
+    """
+    def __init__(self, out):
+        self.out = out
+        self.writer = csv.writer(out)
+        self.writer.writerow(columns)
+
+    def write(self, record):
+        row = []
+        for column in columns:
+            value = record.get(column)
+            if value == None: value = ''
+            elif isinstance(value, (list, dict)): value = json.dumps(value, sort_keys=True)
+            elif isinstance(value, unicode): value = value.encode('UTF-8')
+            row.append(value)
+        self.writer.writerow(row)
+
+#--export FORMAT -> writer class
+writers = {
+    'ndjson': NDJSONWriter,
+    'csv': CSVWriter
+}
@@ -0,0 +1,104 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module contains functions for copying and replacing files safely.
+"""
+
+import os
+import os.path
+
+#buffer size used when the kernel can't copy for us
+buffersize = 1024 * 1024
+
+def copyrange(infile, outfile, offset, count=None):
+    """
+    Copies count bytes of infile starting at offset to the current position
+    of outfile, or everything after offset if count is None.  The copy is
+    done by the kernel with os.copy_file_range or os.sendfile where these
+    exist, otherwise through a large buffer.  Returns the bytes copied.
+
+    Attributes:
+    infile - file object opened for reading
+    outfile - file object opened for writing
+    offset - position in infile to copy from
+    count - number of bytes, None copies to the end
+    """
+    if count == None:
+        count = os.fstat(infile.fileno()).st_size - offset
+    outfile.flush()
+    infd, outfd = infile.fileno(), outfile.fileno()
+    copied = 0
+
+    for name in ('copy_file_range', 'sendfile'):
+        kernelcopy = getattr(os, name, None)
+        if kernelcopy == None: continue
+        outfile.seek(0, 1)  #sync the descriptor's position
+        try:
+            while copied < count:
+                if name == 'copy_file_range':
+                    done = kernelcopy(infd, outfd, count - copied, offset + copied)
+                else:
+                    done = kernelcopy(outfd, infd, offset + copied, count - copied)
+                if done == 0: break
+                copied += done
+        except OSError:
+            if copied > 0: raise    #partly copied, can't fall back
+            continue
+        outfile.seek(0, 2)
+        return copied
+
+    infile.seek(offset)
+    while copied < count:
+        data = infile.read(min(buffersize, count - copied))
+        if not data: break
+        outfile.write(data)
+        copied += len(data)
+    return copied
+
+def tempfor(filename):
+    """
+    Returns a tuple of (file object, name) of a new temporary file in the
+    same directory as filename, so it can be renamed over filename.  A
+    symbolic link's file is the one renamed over, so the temporary file is
+    made next to it.
+    """
+    import tempfile
+    directory = os.path.dirname(os.path.realpath(filename))
+    fd, tempname = tempfile.mkstemp(prefix='.shelltag-', suffix='.tmp',
+            dir=directory)
+    return (os.fdopen(fd, 'wb+'), tempname)
+
+def replacefile(tempobj, tempname, filename):
+    """
+    Flushes and fsyncs tempobj, closes it and renames it over filename,
+    keeping filename's permissions, and its owner and group where this user
+    may set them.  If filename is a symbolic link, the file it points to is
+    replaced and the link kept.  The rename is atomic, so filename is
+    either the old or the new file even after a crash.
+    """
+    tempobj.flush()
+    os.fsync(tempobj.fileno())
+    tempobj.close()
+    filename = os.path.realpath(filename)
+    import shutil
+    shutil.copymode(filename, tempname)
+    chown = getattr(os, 'chown', None)
+    if chown != None:
+        st = os.stat(filename)
+        try: chown(tempname, st.st_uid, st.st_gid)
+        except OSError: pass    #not permitted -> the file becomes this user's
+    replace = getattr(os, 'replace', None)
+    if replace != None: replace(tempname, filename)
+    elif os.name == 'nt':   #rename can't overwrite on windows
+        os.remove(filename)
+        os.rename(tempname, filename)
+    else: os.rename(tempname, filename)
+    if hasattr(os, 'O_DIRECTORY'):  #make the rename itself durable
+        fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_DIRECTORY)
+        try: os.fsync(fd)
+        finally: os.close(fd)
@@ -20,6 +20,8 @@ text (list of unicode): [u'28 Days Later Soundtrack']
 url (text of unicode): u'blah'
 """
 
+import copy
+
 from mutagen.id3 import TALB,TBPM,TCMP,TCOM,TCON,TCOP,TDEN,TDLY,TDOR,TDRC,TDRL,TDTG,TENC
 from mutagen.id3 import TEXT,TFLT,TIPL,TIT1,TIT2,TIT3,TKEY,TLAN,TLEN,TMCL,TMED,TMOO,TOAL
 from mutagen.id3 import TOFN,TOLY,TOPE,TOWN,TPE1,TPE2,TPE3,TPE4,TPOS,TPRO,TPUB,TRCK,TRSN
@@ -29,7 +31,11 @@ from mutagen.id3 import WCOM,WCOP,WOAF,WOAR,WOAS,WORS,WPAY,WPUB,WXXX
 
 from mutagen.id3 import APIC,COMM,PRIV
 
-frame,constructor = range(0,2)
+#kinds of fields
+TIMEKIND, URLKIND, TEXTKIND, BINARYKIND = range(0,4)
+
+#indexes into a field's entry in fields
+frame, frameclass, encoding, kind, attributes = range(0,5)
 
 v1frames = (
     'TITLE',
@@ -41,92 +47,151 @@ v1frames = (
     'GENRE'
 )
 
-timeframes = {
-    #encoding = 0, text = list of ID3TimeStamp
-    'ENCODINGTIME': ['TDEN',TDEN()],
-    'ORIGYEAR':     ['TDOR',TDOR()],
-    'YEAR':         ['TDRC',TDRC()],
-    'RELEASETIME':  ['TDRL',TDRL()],
-    'TAGGINGTIME':  ['TDTG',TDTG()]
-}
+#field -> (frame, frameclass, encoding, kind, attributes)
+#frame is the key of the frame in a tag, encoding is None for frames without
+#one and attributes are fixed constructor arguments, ex. a TXXX's desc
+fields = {
+    #time: encoding = 0, text = list of ID3TimeStamp
+    'ENCODINGTIME': ('TDEN',TDEN,0,TIMEKIND,{}),
+    'ORIGYEAR':     ('TDOR',TDOR,0,TIMEKIND,{}),
+    'YEAR':         ('TDRC',TDRC,0,TIMEKIND,{}),
+    'RELEASETIME':  ('TDRL',TDRL,0,TIMEKIND,{}),
+    'TAGGINGTIME':  ('TDTG',TDTG,0,TIMEKIND,{}),
 
-urlframes = {
     #url
-    'WWWCOMMERCIALINFO':['WCOM',WCOM()],
-    'WWWCOPYRIGHT':     ['WCOP',WCOP()],
-    'WWWAUDIOFILE':     ['WOAF',WOAF()],
-    'WWWARTIST':        ['WOAR',WOAR()],
-    'WWWAUDIOSOURCE':   ['WOAS',WOAS()],
-    'WWWRADIOPAGE':     ['WORS',WORS()],
-    'WWWPAYMENT':       ['WPAY',WPAY()],
-    'WWWPUBLISHER':     ['WPUB',WPUB()]
-}
+    'WWWCOMMERCIALINFO':('WCOM',WCOM,None,URLKIND,{}),
+    'WWWCOPYRIGHT':     ('WCOP',WCOP,None,URLKIND,{}),
+    'WWWAUDIOFILE':     ('WOAF',WOAF,None,URLKIND,{}),
+    'WWWARTIST':        ('WOAR',WOAR,None,URLKIND,{}),
+    'WWWAUDIOSOURCE':   ('WOAS',WOAS,None,URLKIND,{}),
+    'WWWRADIOPAGE':     ('WORS',WORS,None,URLKIND,{}),
+    'WWWPAYMENT':       ('WPAY',WPAY,None,URLKIND,{}),
+    'WWWPUBLISHER':     ('WPUB',WPUB,None,URLKIND,{}),
 
-textframes = {
-    #encoding = 3 or 0, text
-    'ALBUM':        ['TALB',TALB()],
-    'BPM':          ['TBPM',TBPM(encoding=0)],
-    #'TCMP':         ['TCMP',TCMP(encoding=0)],  #not in standard
-    'COMPOSER':     ['TCOM',TCOM()],
-    'GENRE':        ['TCON',TCON()],
-    'COPYRIGHT':    ['TCOP',TCOP()],
-    #'TDLY':         ['TDLY',TDLY()],    #TDLY playlist delay
-    'ENCODEDBY':    ['TENC',TENC()],
-    'LYRICIST':     ['TEXT',TEXT()],
-    'FILETYPE':     ['TFLT',TFLT()],
-    'INVOLVEDPEOPLE':   ['TIPL',TIPL(people=[])],
-    'CONTENTGROUP': ['TIT1',TIT1()],
-    'TITLE':        ['TIT2',TIT2()],
-    'SUBTITLE':     ['TIT3',TIT3()],
-    'INITIALKEY':   ['TKEY',TKEY()],
-    'LANGUAGE':     ['TLAN',TLAN()],
-    'LENGTH':       ['TLEN',TLEN(encoding=0)],
-    'MUSICIANCREDITS':      ['TMCL',TMCL(people=[])],
-    'MEDIATYPE':    ['TMED',TMED()],
-    'MOOD':         ['TMOO',TMOO()],
-    'ORIGALBUM':    ['TOAL',TOAL()],
-    'ORIGFILENAME': ['TOFN',TOFN()],
-    'ORIGLYRICIST': ['TOLY',TOLY()],
-    'ORIGARTIST':   ['TOPE',TOPE()],
-    'FILEOWNER':    ['TOWN',TOWN()],
-    'ARTIST':       ['TPE1',TPE1()],
-    'BAND':         ['TPE2',TPE2()],
-    'CONDUCTOR':    ['TPE3',TPE3()],
-    'MIXARTIST':    ['TPE4',TPE4()],
-    'DISCNUMBER':   ['TPOS',TPOS(encoding=0)],
-    #'TPRO':         ['TPRO',TPRO()],        #TPRO Produced notice
-    'PUBLISHER':    ['TPUB',TPUB()],
-    'TRACK':        ['TRCK',TRCK(encoding=0)],
-    'NETRADIOSTATION':  ['TRSN',TRSN()],
-    'NETRADIOOWNER':    ['TRSO',TRSO()],
-    'BANDSORTORDER':    ['TSO2',TSO2()],
-    'ALBUMSORTORDER':   ['TSOA',TSOA()],
-    'COMPOSERSORTORDER':['TSOC',TSOC()],
-    'ARTISTSORTORDER':   ['TSOP',TSOP()],
-    'TITLESORTORDER':   ['TSOT',TSOT()],
-    'ISRC':         ['TSRC',TSRC()],
-    'ENCODERSETTINGS':  ['TSSE',TSSE()],
-    'SETSUBTITLE':  ['TSST',TSST()],
+    #text: encoding = 3, text
+    'ALBUM':        ('TALB',TALB,3,TEXTKIND,{}),
+    'BPM':          ('TBPM',TBPM,0,TEXTKIND,{}),
+    #'TCMP':         ('TCMP',TCMP,0,TEXTKIND,{}),  #not in standard
+    'COMPOSER':     ('TCOM',TCOM,3,TEXTKIND,{}),
+    'GENRE':        ('TCON',TCON,3,TEXTKIND,{}),
+    'COPYRIGHT':    ('TCOP',TCOP,3,TEXTKIND,{}),
+    #'TDLY':         ('TDLY',TDLY,3,TEXTKIND,{}),    #TDLY playlist delay
+    'ENCODEDBY':    ('TENC',TENC,3,TEXTKIND,{}),
+    'LYRICIST':     ('TEXT',TEXT,3,TEXTKIND,{}),
+    'FILETYPE':     ('TFLT',TFLT,3,TEXTKIND,{}),
+    'INVOLVEDPEOPLE':   ('TIPL',TIPL,3,TEXTKIND,{'people':[]}),
+    'CONTENTGROUP': ('TIT1',TIT1,3,TEXTKIND,{}),
+    'TITLE':        ('TIT2',TIT2,3,TEXTKIND,{}),
+    'SUBTITLE':     ('TIT3',TIT3,3,TEXTKIND,{}),
+    'INITIALKEY':   ('TKEY',TKEY,3,TEXTKIND,{}),
+    'LANGUAGE':     ('TLAN',TLAN,3,TEXTKIND,{}),
+    'LENGTH':       ('TLEN',TLEN,0,TEXTKIND,{}),
+    'MUSICIANCREDITS':      ('TMCL',TMCL,3,TEXTKIND,{'people':[]}),
+    'MEDIATYPE':    ('TMED',TMED,3,TEXTKIND,{}),
+    'MOOD':         ('TMOO',TMOO,3,TEXTKIND,{}),
+    'ORIGALBUM':    ('TOAL',TOAL,3,TEXTKIND,{}),
+    'ORIGFILENAME': ('TOFN',TOFN,3,TEXTKIND,{}),
+    'ORIGLYRICIST': ('TOLY',TOLY,3,TEXTKIND,{}),
+    'ORIGARTIST':   ('TOPE',TOPE,3,TEXTKIND,{}),
+    'FILEOWNER':    ('TOWN',TOWN,3,TEXTKIND,{}),
+    'ARTIST':       ('TPE1',TPE1,3,TEXTKIND,{}),
+    'BAND':         ('TPE2',TPE2,3,TEXTKIND,{}),
+    'CONDUCTOR':    ('TPE3',TPE3,3,TEXTKIND,{}),
+    'MIXARTIST':    ('TPE4',TPE4,3,TEXTKIND,{}),
+    'DISCNUMBER':   ('TPOS',TPOS,0,TEXTKIND,{}),
+    #'TPRO':         ('TPRO',TPRO,3,TEXTKIND,{}),        #TPRO Produced notice
+    'PUBLISHER':    ('TPUB',TPUB,3,TEXTKIND,{}),
+    'TRACK':        ('TRCK',TRCK,0,TEXTKIND,{}),
+    'NETRADIOSTATION':  ('TRSN',TRSN,3,TEXTKIND,{}),
+    'NETRADIOOWNER':    ('TRSO',TRSO,3,TEXTKIND,{}),
+    'BANDSORTORDER':    ('TSO2',TSO2,3,TEXTKIND,{}),
+    'ALBUMSORTORDER':   ('TSOA',TSOA,3,TEXTKIND,{}),
+    'COMPOSERSORTORDER':('TSOC',TSOC,3,TEXTKIND,{}),
+    'ARTISTSORTORDER':   ('TSOP',TSOP,3,TEXTKIND,{}),
+    'TITLESORTORDER':   ('TSOT',TSOT,3,TEXTKIND,{}),
+    'ISRC':         ('TSRC',TSRC,3,TEXTKIND,{}),
+    'ENCODERSETTINGS':  ('TSSE',TSSE,3,TEXTKIND,{}),
+    'SETSUBTITLE':  ('TSST',TSST,3,TEXTKIND,{}),
     #encoding, desc, text
-    'ALBUM ARTIST': [u'TXXX:ALBUM ARTIST',TXXX(desc=u'ALBUM ARTIST')],
-    'PERFORMER': [u'TXXX:PERFORMER',TXXX(desc=u'PERFORMER')],
-    'REPLAYGAIN_ALBUM_GAIN': [u'TXXX:replaygain_album_gain',TXXX(desc=u'replaygain_album_gain')],
-    'REPLAYGAIN_ALBUM_PEAK': [u'TXXX:replaygain_album_peak',TXXX(desc=u'replaygain_album_peak')],
-    'REPLAYGAIN_TRACK_GAIN': [u'TXXX:replaygain_track_gain',TXXX(desc=u'replaygain_track_gain')],
-    'REPLAYGAIN_TRACK_PEAK': [u'TXXX:replaygain_track_peak',TXXX(desc=u'replaygain_track_peak')],
+    'ALBUM ARTIST': (u'TXXX:ALBUM ARTIST',TXXX,3,TEXTKIND,{'desc':u'ALBUM ARTIST'}),
+    'PERFORMER': (u'TXXX:PERFORMER',TXXX,3,TEXTKIND,{'desc':u'PERFORMER'}),
+    'REPLAYGAIN_ALBUM_GAIN': (u'TXXX:replaygain_album_gain',TXXX,3,TEXTKIND,{'desc':u'replaygain_album_gain'}),
+    'REPLAYGAIN_ALBUM_PEAK': (u'TXXX:replaygain_album_peak',TXXX,3,TEXTKIND,{'desc':u'replaygain_album_peak'}),
+    'REPLAYGAIN_TRACK_GAIN': (u'TXXX:replaygain_track_gain',TXXX,3,TEXTKIND,{'desc':u'replaygain_track_gain'}),
+    'REPLAYGAIN_TRACK_PEAK': (u'TXXX:replaygain_track_peak',TXXX,3,TEXTKIND,{'desc':u'replaygain_track_peak'}),
     #encoding, lang, desc, text
-    'COMMENT': ['COMM',COMM(lang=u'eng', desc=u'')],
-    #encoding, mime, type, desc, data
-    'CUSTOM':   ['TXXX',TXXX()],
-    'PICTURE':  ['APIC',APIC()],
-    'PRIVATE':  ['PRIV',PRIV()]
+    'COMMENT': ('COMM',COMM,3,TEXTKIND,{'lang':u'eng','desc':u''}),
+    'CUSTOM':   ('TXXX',TXXX,3,TEXTKIND,{}),
+
+    #binary: encoding, mime, type, desc, data / owner, data
+    'PICTURE':  ('APIC',APIC,3,BINARYKIND,{}),
+    'PRIVATE':  ('PRIV',PRIV,None,BINARYKIND,{})
 }
 
-#encoding, desc, text
-custom = ['TXXX',TXXX()]
-#encoding, mime, type, desc, data
-private = ['PRIV',PRIV()]
-picture = ['APIC',APIC()]
+#field names by kind
+timeframes = dict([(name, entry[frame]) for name, entry in fields.items()
+        if entry[kind] == TIMEKIND])
+urlframes = dict([(name, entry[frame]) for name, entry in fields.items()
+        if entry[kind] == URLKIND])
+textframes = dict([(name, entry[frame]) for name, entry in fields.items()
+        if entry[kind] in (TEXTKIND, BINARYKIND)])
+
+#fields in the order --info prints them: text, url, then time fields
+infoorder = [
+    'TITLE', 'INITIALKEY', 'PRIVATE', 'DISCNUMBER', 'INVOLVEDPEOPLE',
+    'ORIGLYRICIST', 'CONDUCTOR', 'ARTIST', 'CUSTOM', 'ALBUM', 'LYRICIST',
+    'SUBTITLE', 'ALBUMSORTORDER', 'REPLAYGAIN_TRACK_PEAK', 'ORIGFILENAME',
+    'ENCODERSETTINGS', 'REPLAYGAIN_TRACK_GAIN', 'GENRE', 'NETRADIOSTATION',
+    'FILEOWNER', 'ARTISTSORTORDER', 'COMPOSERSORTORDER', 'SETSUBTITLE',
+    'MEDIATYPE', 'LENGTH', 'ORIGARTIST', 'MUSICIANCREDITS',
+    'REPLAYGAIN_ALBUM_GAIN', 'COPYRIGHT', 'MIXARTIST', 'BPM', 'COMPOSER',
+    'TITLESORTORDER', 'ORIGALBUM', 'PERFORMER', 'LANGUAGE', 'ALBUM ARTIST',
+    'ENCODEDBY', 'REPLAYGAIN_ALBUM_PEAK', 'PUBLISHER', 'PICTURE', 'FILETYPE',
+    'BAND', 'ISRC', 'BANDSORTORDER', 'MOOD', 'NETRADIOOWNER', 'COMMENT',
+    'TRACK', 'CONTENTGROUP',
+    'WWWAUDIOSOURCE', 'WWWCOMMERCIALINFO', 'WWWRADIOPAGE', 'WWWCOPYRIGHT',
+    'WWWPUBLISHER', 'WWWAUDIOFILE', 'WWWPAYMENT', 'WWWARTIST',
+    'ENCODINGTIME', 'ORIGYEAR', 'RELEASETIME', 'TAGGINGTIME', 'YEAR'
+]
+#frame key -> (position, field) of the fields printed by --info, where
+#position is the field's place in the printed line
+infofields = dict([(fields[name][frame], (position, name))
+        for position, name in enumerate(infoorder)])
+#frame IDs of every frame printed by --info
+infoframes = set([key[:4] for key in infofields.keys()] + ['TXXX','PRIV','APIC'])
+
+def newframe(field, **values):
+    """
+    Returns a new frame for a field, ex. newframe('ARTIST', text=[u'Blur']).
+    A new frame is made on every call, so frames are never shared between
+    tags.
+
+    Attributes:
+    field - field name from fields
+    values - attributes of the frame, ex. text or url
+    """
+    entry = fields[field]
+    for name, value in entry[attributes].items():
+        values[name] = copy.copy(value)
+    if entry[encoding] != None: values['encoding'] = entry[encoding]
+    return entry[frameclass](**values)
+
+def newcustom(desc, **values):
+    """
+    Returns a new TXXX frame for a custom field.
+    """
+    return TXXX(encoding=3, desc=unicode(desc), **values)
 
-#TODO add support for new TXXX and WXXX frames
+def frametext(fieldkind, frame):
+    """
+    Returns the value of a frame as a unicode string, with the items of
+    multiline fields delimited by '\\'.
 
+    Attributes:
+    fieldkind - kind of the frame's field, ex. TEXTKIND
+    frame - mutagen frame
+    """
+    if fieldkind == URLKIND: return frame.url
+    if fieldkind == TIMEKIND:
+        return u'\\'.join([stamp.text for stamp in frame.text])
+    return u'\\'.join(frame.text)
@@ -12,12 +12,15 @@ representing the tag.
 
 import os
 import sys
+import copy
 import frame as Frame
 
-from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, ID3NoHeaderError, ID3TimeStamp, TPE1
 
 from compatid3 import CompatID3
+from lazyid3 import LazyID3
+import id3v1
+import stats
 
 class ID3TagInvalidFrame(Exception):
     pass
@@ -25,6 +28,23 @@ class ID3TagInvalidFrame(Exception):
 class ID3TagNoHeaderError(ID3NoHeaderError):
     pass
 
+def namedinfo(filename, info):
+    """
+    Returns the line printed by printtag for filename, given the rest of
+    the line as returned by ID3Tag.taginfo(named=False).
+    """
+    return u"[INFO] FILENAME=" + unicode(filename,errors='ignore') + u"; " + info  #TODO hackish
+
+def loadtag(filename):
+    """
+    Returns the fully loaded tag of filename: an id3v1.ID3v1, which only
+    reads and writes the last 128 bytes, if the file has no ID3v2 tag,
+    otherwise a CompatID3.
+    """
+    tag = id3v1.load(filename)
+    if tag == None: tag = CompatID3(filename)
+    return tag
+
 class ID3Tag(object):
     """
     Tag represents the tag and filename of a mp3 file.
@@ -33,17 +53,42 @@ class ID3Tag(object):
     filename - name of file the tag's from
     tag - ID3 object defined by the mutagen library
     version - tuple representing id3 version, ex. (2,3,0)->2.3
+    batch - True while edits are being collected by begin()/commit()
+    pending - True if a batch holds edits which have not been saved
+    lazy - True if frames are decoded only when they are read
+    dryrun - True prints the changes a save would make instead of saving
+    lastsave - 'inplace' or 'rewrite' for the last save, see CompatID3.save,
+        or 'unchanged' if the save was skipped because nothing changed
+    snapshot - dict of frame key -> (frame, frame data) of the tag as it is
+        on disk, taken before the first change, or None
+    compact - True shrinks the tag to its frames plus MINPADDING at the
+        next save, see removeart
 
     Exceptions:
     IOError - invalid or dne filename
     """
-    def __init__(self, filename=""):
+    def __init__(self, filename="", lazy=False, dryrun=False):
         """
         Constructs object representing tag of filename given.
+
+        Attributes:
+        lazy - True only indexes the frames, decoding each frame when it's
+            first read.  The full tag is loaded before any change is made.
+        dryrun - True never writes to the file, see dryrun above
         """
+        self.batch = False
+        self.pending = False
+        self.lazy = lazy
+        self.dryrun = dryrun
+        self.lastsave = None
+        self.snapshot = None
+        self.compact = False
         try:
             self.filename = filename
-            self.tag = CompatID3(filename)
+            with stats.phase('parse'):
+                if lazy: self.tag = LazyID3(filename)
+                else: self.tag = loadtag(filename)
+            if not lazy: stats.add('read', self.tag.size + 128)
         except IOError:
             #bad filename error
             raise IOError
@@ -67,8 +112,21 @@ class ID3Tag(object):
         ID3TagNoHeaderError - if no id3 tag exists
         """
         if self.tag == None: raise ID3TagNoHeaderError #check for header
+        self.__loadall()
         output = ["[DELETE]"]
         
+        if self.dryrun:    #only the tags the file has
+            removing = []
+            if versions in (0, 1) and id3v1.trailer(self.filename) != None:
+                removing.append("ID3v1")
+            if versions in (0, 2) and self.tag.version[0] == 2:
+                removing.append("ID3v2")
+            if removing:
+                print "[DRYRUN]" + self.filename + ": " + \
+                        " and ".join(removing) + " tag(s) would be removed."
+            else:
+                print "[DRYRUN]" + self.filename + ": no ID3 tag would be removed."
+            return
         if versions == 0:   #remove all tags
             self.tag.delete(delete_v1=True,delete_v2=True)
             self.tag = None
@@ -85,8 +143,10 @@ class ID3Tag(object):
     #TODO output
     def createtag(self,v1=False,v2=4):
         """
-        Creates a "blank" tag onto a file.
-        The blank tag consists of TITLE = one blank space.
+        Creates a "blank" tag onto a file, replacing any tag it has.
+        The blank tag consists of ARTIST = one blank space.
+        The tag is built in memory and written with a single save, with
+        at most CompatID3.MINPADDING bytes of padding.
         
         Attributes:
         v1
@@ -97,29 +157,40 @@ class ID3Tag(object):
             3 id3v2.3
             4 id3v2.4        
         """
-        #if tag is not empty, delete it
-        if self.tag != None: self.tag.delete()
+        if self.dryrun:
+            print "[DRYRUN]" + self.filename + ": blank tag would be created."
+            return
+        if isinstance(self.tag, LazyID3): self.tag.close()
 
         #tag creation
-        self.tag = MP3(self.filename)
-        self.tag.add_tags()
-        self.tag['TPE1'] = TPE1(encoding=3,text=' ') #adding blank artist
-        self.tag.save()
-
-        self.tag = CompatID3(self.filename) #reconstructing
-        
-        #v1 conditions
-        if v1 == True: self.tag.save(v1=2)
-        else: self.tag.save(v1=0)
-
-        #v2 conditions
-        if v2 == 0: #delete v_2
-            self.tag.delete(delete_v1=False,delete_v2=True)
-        elif v2 == 3: #convert to v2.3
-            self.tag.update_to_v23()
-            self.tag.save(v2=3)
-            self.tag = CompatID3(self.filename)    #reload tag
-
+        tag = CompatID3()
+        tag.filename = self.filename
+        tag.add(TPE1(encoding=3,text=u' ')) #adding blank artist
+        #a blank tag doesn't keep the old tag's padding
+        shrink = tag.MAXPADDING == None
+        if shrink: tag.MAXPADDING = tag.MINPADDING
+
+        if v1 == True: v1 = 2
+        else: v1 = 0
+        if v2 == 3: #convert to v2.3
+            tag.update_to_v23()
+            tag.save(v1=v1,v2=3)
+            tag.version = (2,3,0)
+            tag.update_to_v24()
+        elif v2 == 0:   #v1 only
+            tag.save(v1=v1,v2=0)
+        else:
+            tag.save(v1=v1)
+        if shrink: del tag.MAXPADDING   #later saves use the usual policy
+        self.lastsave = tag.lastsave
+        if v2 == 0 and v1 == 0: tag = None  #no tag is left
+        elif v2 == 0:   #v1 only -> later saves only write the trailer
+            v1tag = id3v1.ID3v1()
+            v1tag.filename = self.filename
+            for eachframe in tag.values(): v1tag.add(eachframe)
+            tag = v1tag
+        self.tag = tag
+        self.snapshot = None
 
     def savetag(self):
         """
@@ -128,18 +199,139 @@ class ID3Tag(object):
         Exception - undefined errors
         """
         if self.tag == None: raise ID3TagNoHeaderError #no header
+        self.__loadall()
+        self.snapshot = None
         
-        if self.tag.version[0] == 1: #by default, 2.4 is added, so remove 2.4
+        if self.tag.version[0] == 1: #an id3v1.ID3v1, only the trailer is written
             self.tag.save()
-            self.tag.delete(delete_v1=False,delete_v2=True)
         elif self.tag.version[0] == 2 and self.tag.version[1] < 4: #below 2.4
             self.tag.update_to_v23()
             self.tag.save(v2=3)
-            self.tag = CompatID3(self.filename) #reload tag
+            #convert back in memory, giving the same tag as reloading the file
+            self.tag.version = (2,3,0)
+            self.tag.update_to_v24()
         elif self.tag.version[0] == 2 and self.tag.version[1] == 4:   #2.4
             self.tag.save()
         else:   #undefined
             raise Exception
+        self.lastsave = self.tag.lastsave
+
+    def begin(self):
+        """
+        Starts a batch of edits.  Until commit() is called, addfield,
+        removefield and clearfield only change the tag in memory.
+        The object can also be used as a context manager:
+
+        with ID3Tag(filename) as filetag:
+            filetag.addfield("ARTIST","Radiohead")
+            filetag.addfield("ALBUM","OK Computer")
+        """
+        self.batch = True
+        self.pending = False
+
+    def commit(self,save=False):
+        """
+        Ends a batch of edits and saves the tag once if anything changed.
+        Edits which leave the tag as it was on disk don't save it.
+
+        Attributes:
+        save - True saves the tag even if nothing changed
+
+        Exceptions:
+        ID3TagNoHeaderError - if no id3 tag exists and a save is needed
+        """
+        pending = self.pending
+        self.batch = False
+        self.pending = False
+        if pending or save: self.__save(save)
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type == None: self.commit()
+        else:   #error -> unsaved edits are dropped
+            self.batch = False
+            self.pending = False
+        return False
+
+    def __loadall(self):
+        """
+        Replaces a lazily loaded tag with a fully loaded one before it is
+        changed.
+        """
+        if isinstance(self.tag, LazyID3):
+            self.tag.close()    #the file can't be written while mapped on windows
+            with stats.phase('parse'):
+                self.tag = loadtag(self.filename)
+            stats.add('read', self.tag.size + 128)
+        if self.snapshot == None and self.tag != None:
+            self.snapshot = self.__frames()
+
+    def __frames(self):
+        """
+        Returns a dict of frame key -> (frame, frame data) of the tag.  The
+        data is written in UTF-8 whatever the frame's encoding, so the same
+        text in another encoding compares equal.
+        """
+        frames = {}
+        for key, frame in self.tag.items():
+            data = frame
+            if getattr(frame, 'encoding', 3) != 3:
+                data = copy.copy(frame)
+                data.encoding = 3
+            frames[key] = (frame, data._writeData())
+        return frames
+
+    def __changed(self):
+        """
+        Saves the tag, or marks it as pending if a batch is open.
+        """
+        if self.batch: self.pending = True
+        else: self.__save()
+
+    def __save(self, force=False):
+        """
+        Saves the tag if it differs from the snapshot, or if force is True.
+        With dryrun, prints the differences instead.
+        """
+        if self.tag == None: raise ID3TagNoHeaderError
+        changes = self.changes()
+        if not changes and not force:
+            self.lastsave = 'unchanged'
+            stats.add('unchanged')
+            return
+        if self.dryrun:
+            if not changes:
+                print "[DRYRUN]" + self.filename + ": tag would be rewritten."
+            for line in changes:
+                print "[DRYRUN]" + self.filename + ": " + line.encode('UTF-8')
+            return
+        if self.compact: self.__loadall()   #the tag saved is the loaded one
+        shrink = self.compact and (self.tag.MAXPADDING == None
+                or self.tag.MAXPADDING > self.tag.MINPADDING)
+        if shrink: self.tag.MAXPADDING = self.tag.MINPADDING
+        try: self.savetag()
+        finally:
+            if shrink: del self.tag.MAXPADDING  #later saves use the usual policy
+            self.compact = False
+
+    def changes(self):
+        """
+        Returns a list of unicode lines describing how the tag differs from
+        the file, ex. [u'- TIT2=Prowler', u'+ TIT2=Lucky'].
+        """
+        if self.snapshot == None or self.tag == None: return []
+        frames = self.__frames()
+        lines = []
+        for key in sorted(set(self.snapshot.keys()) | set(frames.keys())):
+            old = self.snapshot.get(key)
+            new = frames.get(key)
+            if old != None and new != None and old[1] == new[1]: continue
+            if old != None: lines.append(u"- " + unicode(old[0].pprint()))
+            if new != None: lines.append(u"+ " + unicode(new[0].pprint()))
+        return lines
 
     def addfield(self,field,string):
         """
@@ -153,6 +345,7 @@ class ID3Tag(object):
         ID3TagInvalidFrame - if field is invalid
         """
         if self.tag == None: raise ID3TagNoHeaderError
+        self.__loadall()
         field = field.upper()    #capitalize
 
         #if v1, reject invalid frames
@@ -163,41 +356,61 @@ class ID3Tag(object):
         #check for different type of frames
         #note: items delimited by '\\' are divided into muliple-line fields
 
+        #values given as bytes are UTF-8
+        if isinstance(string, str): value = string.decode('UTF-8')
+        else: value = unicode(string)
+
         output = ["[ADD]"]
-        if field in Frame.timeframes.keys():
-            listofstrings = unicode(string).split('\\')
+        entry = Frame.fields.get(field)
+        if entry == None: #custom frames
+            frame = Frame.newcustom(field, text=value.split('\\'))
+        elif entry[Frame.kind] == Frame.TIMEKIND:
             ts = []
-            for onestring in listofstrings: #must use ID3TimeStamp in mutagen
+            for onestring in value.split('\\'): #must use ID3TimeStamp in mutagen
                 ts.append(ID3TimeStamp(onestring))
-            frame = Frame.timeframes[field][Frame.constructor]
-            frame.encoding = 0
-            frame.text = ts
-            self.tag.add(frame)
-            output.append(self.filename + ": " + field + "=" + string)
-            self.savetag()
-        elif field in Frame.urlframes.keys():   #note: mutagen can't support multiline for url
-            frame = Frame.urlframes[field][Frame.constructor]
-            frame.url = unicode(string)
-            self.tag.add(frame)
-            output.append(self.filename + ": " + field + "=" + string)
-            self.savetag()
-        elif field in Frame.textframes.keys():
-            frame = Frame.textframes[field][Frame.constructor]
-            if frame.encoding != 0: frame.encoding = 3
-            frame.text = unicode(string).split('\\')
-            self.tag.add(frame)
-            output.append(self.filename + ": " + field + "=" + string)
-            self.savetag()
-        else: #custom frames
-            frame = Frame.custom[Frame.constructor]
-            frame.encoding = 3
-            frame.desc = unicode(field)
-            frame.text = unicode(string).split('\\')
-            self.tag.add(frame)
-            output.append(self.filename + ": " + field + "=" + string)
-            self.savetag()
+            frame = Frame.newframe(field, text=ts)
+        elif entry[Frame.kind] == Frame.URLKIND:   #note: mutagen can't support multiline for url
+            frame = Frame.newframe(field, url=value)
+        elif entry[Frame.kind] == Frame.TEXTKIND:
+            frame = Frame.newframe(field, text=value.split('\\'))
+        else:   #binary frames can't be given as a string
+            raise ID3TagInvalidFrame
+        self.tag.add(frame)
+        output.append(self.filename + ": " + field + "=" + string)
+        self.__changed()
         print ''.join(output)
     
+    def addpicture(self,picture):
+        """
+        Adds a picture, replacing any picture of the same type.  A picture
+        of another type with the same description is kept, the new one's
+        description getting a number, ex. "Front Cover (2)".
+
+        Attributes:
+        picture - APIC frame, ex. from artwork.picture, which is left as is
+
+        Exceptions:
+        ID3TagInvalidFrame - if the tag is ID3v1
+        """
+        if self.tag == None: raise ID3TagNoHeaderError
+        self.__loadall()
+        if self.tag.version[0] == 1: raise ID3TagInvalidFrame
+
+        for old in self.tag.getall('APIC'):
+            if old.type == picture.type: del self.tag[old.HashKey]
+        #APIC frames are keyed by description -> keep the descriptions apart
+        desc = picture.desc
+        number = 1
+        while 'APIC:' + desc in self.tag:
+            number += 1
+            desc = u"%s (%d)" % (picture.desc, number)
+        if desc != picture.desc:
+            picture = copy.copy(picture)
+            picture.desc = desc
+        self.tag.add(picture)
+        self.__changed()
+        print "[ADD]" + self.filename + ": " + picture.pprint().encode('UTF-8')
+
     def getfield(self,field):
         """
         Returns unicode string.
@@ -212,39 +425,13 @@ class ID3Tag(object):
         if self.tag == None: raise ID3TagNoHeaderError
         field = field.upper()    #capitalize
 
-        #urlframes - multiline support does not exist
-        if field in Frame.urlframes.keys():
-            return self.tag[Frame.urlframes[field][Frame.frame]].url
-        #timeframes
-        elif field in Frame.timeframes.keys():
-            index = Frame.timeframes[field][Frame.frame]
-            try:
-                returnstring = ''
-                id3timestamplist = self.tag[index].text
-            except KeyError: raise KeyError
-            else:
-                if len(id3timestamplist) == 0: return u''
-                else:
-                    for id3timestamp in id3timestamplist:
-                        returnstring = returnstring + id3timestamp.text + '\\'
-                    return returnstring[:-1]
-        #textframes
-        elif field in Frame.textframes.keys():
-            index = Frame.textframes[field][Frame.frame]
-            try: textlist = self.tag[index].text
-            except KeyError: raise KeyError
-            else:
-                if len(textlist) == 0: return u''
-                else: return '\\'.join(textlist)
+        entry = Frame.fields.get(field)
         #customframes
-        elif self.tag.getall('TXXX:' + field) != []:
-            try: textlist = self.tag['TXXX:' + field].text
-            except KeyError: raise KeyError
-            else:
-                if len(textlist) == 0: return u''
-                else: return '\\'.join(textlist)
-        else:   #error
-            raise ID3TagInvalidFrame
+        if entry == None:
+            if self.tag.getall('TXXX:' + field) == []: raise ID3TagInvalidFrame
+            return Frame.frametext(Frame.TEXTKIND, self.tag['TXXX:' + field])
+        #url, time and text frames
+        return Frame.frametext(entry[Frame.kind], self.tag[entry[Frame.frame]])
         
     def clearfield(self,field):
         """
@@ -258,7 +445,6 @@ class ID3Tag(object):
         field = field.upper()
 
         self.addfield(field,u'')
-        self.savetag()
 
     def removefield(self,field):
         """
@@ -273,65 +459,192 @@ class ID3Tag(object):
         output = ["[REMOVE]"]
 
         if self.tag == None: raise ID3TagNoHeaderError
+        self.__loadall()
         field = field.upper()
 
-        if field in Frame.urlframes.keys(): #url
-            self.tag.delall(Frame.urlframes[field][Frame.frame])
-        elif field in Frame.timeframes.keys(): #time
-            self.tag.delall(Frame.timeframes[field][Frame.frame])
-        elif field in Frame.textframes.keys(): #text
-            self.tag.delall(Frame.textframes[field][Frame.frame])
+        entry = Frame.fields.get(field)
+        if entry != None:
+            self.tag.delall(entry[Frame.frame])
         elif self.tag.getall('TXXX:' + field) != []: #custom
             self.tag.delall('TXXX:' + field)
         else:
             print >> sys.stderr, "shelltag: " + self.filename + ": " + field + "does not exist"
             return
          
-        self.savetag()
+        self.__changed()
         output.append(self.filename + ": " + field + " removed.")
         print ''.join(output)
 
-    def printtag(self):
+    def removeart(self,compact=False):
+        """
+        Removes every picture from the tag.  Returns the bytes the pictures
+        took up in the tag.
+
+        A lazily loaded tag is stripped without decoding any picture, the
+        other frames being copied as they are, and written at once.  The
+        tag keeps its size, the pictures becoming padding, unless compact is
+        True.  A fully loaded tag has its pictures removed like
+        removefield("PICTURE").
+
+        Attributes:
+        compact - True shrinks the tag to its frames plus MINPADDING
+
+        Exceptions:
+        ID3TagNoHeaderError - if no id3 tag exists
+        """
+        if self.tag == None: raise ID3TagNoHeaderError
+        removed = None
+        if isinstance(self.tag, LazyID3):
+            removed = self.tag.strip(['APIC'], compact, self.dryrun)
+        if removed != None: #stripped in the file
+            count, size = removed
+            if count > 0 and not self.dryrun:
+                self.lastsave = self.tag.lastsave
+                with stats.phase('parse'):
+                    self.tag = LazyID3(self.filename)
+                self.snapshot = None
+        else:
+            self.__loadall()
+            pictures = self.tag.getall('APIC')
+            count = len(pictures)
+            size = sum([len(picture._writeData()) + 10 for picture in pictures])
+            if count > 0:
+                if compact: self.compact = True
+                self.tag.delall('APIC')
+                self.__changed()
+        if count == 0: return 0
+
+        if self.dryrun: output = ["[DRYRUN]", self.filename, ": %d picture(s), "
+                "%d bytes would be reclaimed." % (count, size)]
+        else: output = ["[REMOVEART]", self.filename, ": %d picture(s), "
+                "%d bytes reclaimed." % (count, size)]
+        print ''.join(output)
+        return size
+
+    def convert(self,version,v1='keep'):
+        """
+        Converts the tag to ID3v2.3 or ID3v2.4 in memory and writes it,
+        with the edits of an open batch, in a single save, ending the
+        batch.  A tag which is already of that version, with an ID3v1 tag
+        as asked and no edits, isn't written.  Frames mutagen can't read
+        are dropped when the version changes, since they can't be
+        converted.  Returns True if the tag was (or with dryrun would be)
+        written.
+
+        Attributes:
+        version - 3 for ID3v2.3, 4 for ID3v2.4
+        v1
+            'strip' removes the ID3v1 tag
+            'keep' leaves the ID3v1 tag as it is
+            'sync' creates or updates the ID3v1 tag from the converted tag
+
+        Exceptions:
+        ID3TagNoHeaderError - if no id3 tag exists
+        """
+        if self.tag == None: raise ID3TagNoHeaderError
+        self.__loadall()
+        changed = self.changes() != []
+        self.batch = False
+        self.pending = False
+
+        before = self.tag.version
+        target = (2, version, 0)
+        trailer = id3v1.trailer(self.filename)
+        if isinstance(self.tag, id3v1.ID3v1):   #the trailer's frames start an ID3v2 tag
+            tag = CompatID3()
+            tag.filename = self.filename
+            for frame in self.tag.values(): tag.add(frame)
+            self.tag = tag
+        if v1 == 'strip': same = trailer == None
+        elif v1 == 'sync': same = trailer == id3v1.render(self.tag)
+        else: same = True
+        if before == target and same and not changed:
+            self.lastsave = 'unchanged'
+            stats.add('unchanged')
+            return False
+
+        output = [self.filename, ": ID3v%d.%d -> ID3v2.%d" % (before[0],
+                before[1], version)]
+        if v1 == 'strip' and trailer != None: output.append(", ID3v1 removed")
+        elif v1 == 'sync' and not same: output.append(", ID3v1 updated")
+        if self.dryrun:
+            print "[DRYRUN]" + ''.join(output) + " would be written."
+            return True
+
+        if before != target: del self.tag.unknown_frames[:]
+        savev1 = {'strip': 0, 'keep': None, 'sync': 2}[v1]
+        if version == 3:
+            self.tag.update_to_v23()
+            self.tag.save(v1=savev1,v2=3)
+            #convert back in memory, giving the same tag as reloading the file
+            self.tag.version = target
+            self.tag.update_to_v24()
+        else:
+            self.tag.save(v1=savev1,v2=4)
+            self.tag.version = target
+        self.lastsave = self.tag.lastsave
+        self.snapshot = None
+        print "[CONVERT]" + ''.join(output)
+        return True
+
+    def getfields(self):
+        """
+        Returns a dict of every field in the tag -> unicode string, including
+        custom fields.
+        """
+        if self.tag == None: raise ID3TagNoHeaderError
+        fields = {}
+        for field in Frame.fields:
+            try: fields[field] = self.getfield(field)
+            except KeyError: pass
+        for custom in self.tag.getall('TXXX'):
+            fields.setdefault(custom.desc.upper(), u'\\'.join(custom.text))
+        return fields
+
+    def printtag(self, out=None):
         """
         Prints contents of a tag
+
+        Attributes:
+        out - file to write to, sys.stdout by default
+        """
+        if out == None: out = sys.stdout
+        out.write(self.taginfo().encode('UTF-8') + '\n')
+
+    def taginfo(self,named=True):
+        """
+        Returns contents of a tag as the unicode line printed by printtag.
+        The tag's frames are read in one pass, each mapped back to its field
+        through Frame.infofields.
+
+        Attributes:
+        named - False leaves out the start of the line naming the file, see
+            namedinfo
         """
         output = []
-        output.append(u"[INFO]")
-        #filename
-        output.append(u" FILENAME=")
-        output.append(unicode(self.filename,errors='ignore'))   #TODO hackish
-        output.append(u"; ")
         #version
-        if self.tag != None:
-            output.append(u"VERSION=" + unicode(str(self.tag.version)) + u" ")
-        #textframes
-        for field in Frame.textframes.keys():
-            try: text = self.getfield(field)
-            except KeyError: pass
-            else: output.append(unicode(field) + u"=" + unicode(text) + u"; ")
-        #urlframes
-        for field in Frame.urlframes.keys():
-            try: url = self.getfield(field)
-            except KeyError: pass
-            else: output.append(unicode(field) + u"=" + unicode(url) + u"; ")
-        #timeframes
-        for field in Frame.timeframes.keys():
-            try: time = self.getfield(field)
-            except KeyError: pass
-            else: output.append(unicode(field) + u"=" + unicode(time) + u"; ")
-        #customframes
-        if len(self.tag.getall('TXXX')) > 0:
-            for custom in self.tag.getall('TXXX'): 
-                output.append(unicode(custom.pprint()) + u" ")
-        #private frames
-        if len(self.tag.getall('PRIV')) > 0:
-            for private in self.tag.getall('PRIV'): 
-                output.append(unicode(private.pprint()) + u" ")
-        #picture frames
-        if len(self.tag.getall('APIC')) > 0:
-            for picture in self.tag.getall('APIC'): 
-                output.append(unicode(picture.pprint()) + u" ")
-        print (''.join(output)).encode('UTF-8')
+        if self.tag == None: raise ID3TagNoHeaderError
+        output.append(u"VERSION=" + unicode(str(self.tag.version)) + u" ")
+
+        #lazy tags only decode the frames which are printed
+        if isinstance(self.tag, LazyID3):
+            keys = self.tag.decodedkeys(Frame.infoframes)
+        else: keys = self.tag.keys()
+        fields = []
+        binary = {'TXXX': [], 'PRIV': [], 'APIC': []}
+        for key in keys:
+            if key in Frame.infofields:    #text, url and time frames
+                position, field = Frame.infofields[key]
+                text = Frame.frametext(Frame.fields[field][Frame.kind], self.tag[key])
+                fields.append((position, unicode(field) + u"=" + unicode(text) + u"; "))
+            if key[:4] in binary:   #custom, private and picture frames
+                binary[key[:4]].append(unicode(self.tag[key].pprint()) + u" ")
+        fields.sort()
+        output.extend([text for position, text in fields])
+        for frameid in ('TXXX', 'PRIV', 'APIC'):
+            output.extend(binary[frameid])
+        if named: return namedinfo(self.filename, u''.join(output))
+        return u''.join(output)
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,204 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module holds an ID3v1 class for mp3 files whose only tag is an ID3v1
+trailer, the last 128 bytes of the file...
+
+TAG title(30) artist(30) album(30) year(4) comment(28) 0 track genre
+
+The trailer's fields, those of frame.v1frames, are held as ID3v2.4 frames
+like any other tag, but the tag is read and saved by seeking to the
+trailer alone, so the rest of the file is never touched.
+"""
+
+from mutagen.id3 import ID3NoHeaderError, ID3TimeStamp, TCON
+
+import frame as Frame
+from compatid3 import CompatID3, savecounts
+import stats
+
+#field -> (offset, size) of the text fields of the trailer
+layout = {
+    'TITLE': (3, 30),
+    'ARTIST': (33, 30),
+    'ALBUM': (63, 30),
+    'YEAR': (93, 4),
+    'COMMENT': (97, 28),
+}
+#offsets of the byte fields of the trailer
+TRACK, GENRE = 126, 127
+#genre byte of a trailer without a genre
+NOGENRE = 255
+
+def text(data, offset, size):
+    """
+    Returns the text field of size bytes at offset of a trailer as unicode.
+    """
+    return data[offset:offset + size].split('\x00')[0].strip().decode('latin-1')
+
+def parse(data):
+    """
+    Returns a list of the ID3v2.4 frames of a 128 byte trailer, or None if
+    data isn't a trailer.
+    """
+    if len(data) != 128 or data[:3] != 'TAG': return None
+    frames = []
+    for field in Frame.v1frames:
+        if field not in layout: continue
+        offset, size = layout[field]
+        if field == 'COMMENT': size += 1    #an ID3v1.0 comment has no track
+        value = text(data, offset, size)
+        if not value: continue
+        if field == 'YEAR': value = ID3TimeStamp(value)
+        frames.append(Frame.newframe(field, text=[value]))
+    #a track of 32 after a comment padded with spaces is part of the comment
+    track = ord(data[TRACK])
+    if track and (track != 32 or data[TRACK - 1] == '\x00'):
+        frames.append(Frame.newframe('TRACK', text=[unicode(track)]))
+    genre = ord(data[GENRE])
+    if genre != NOGENRE:   #stored by name, as mutagen's update_to_v24 does
+        genreframe = Frame.newframe('GENRE', text=[unicode(genre)])
+        genreframe.genres = genreframe.genres
+        frames.append(genreframe)
+    return frames
+
+def render(tag):
+    """
+    Returns the 128 byte trailer of the frames of tag, a dict of frame key
+    -> frame, ex. a CompatID3.  Fields the trailer can't hold are left out
+    and text too long for its field is cut.
+    """
+    data = ['\x00'] * 128
+    data[0:3] = 'TAG'
+    for field in Frame.v1frames:
+        if field not in layout: continue
+        offset, size = layout[field]
+        value = ''
+        if field == 'COMMENT':  #any language, the one without a description first
+            comments = tag.getall('COMM')
+            comments.sort(key=lambda comment: comment.desc != u'')
+            if comments and comments[0].text: value = comments[0].text[0]
+        else:
+            key = Frame.fields[field][Frame.frame]
+            if field == 'YEAR' and key not in tag: key = 'TYER'  #an ID3v2.3 tag
+            if key in tag and tag[key].text: value = tag[key].text[0]
+        if field == 'YEAR': value = getattr(value, 'text', value)
+        value = value.encode('latin-1', 'replace')[:size]
+        data[offset:offset + len(value)] = value
+    if 'TRCK' in tag:
+        try: track = +tag['TRCK']
+        except ValueError: track = 0
+        if 0 < track < 256: data[TRACK] = chr(track)
+    data[GENRE] = chr(NOGENRE)
+    if 'TCON' in tag:
+        genres = tag['TCON'].genres
+        if genres and genres[0] in TCON.GENRES:
+            data[GENRE] = chr(TCON.GENRES.index(genres[0]))
+    return ''.join(data)
+
+def trailer(filename):
+    """
+    Returns the last 128 bytes of filename if they're an ID3v1 tag,
+    otherwise None.
+    """
+    f = open(filename, 'rb')
+    try:
+        try: f.seek(-128, 2)
+        except IOError: return None #shorter than a trailer
+        data = f.read(128)
+    finally:
+        f.close()
+    if data[:3] != 'TAG': return None
+    return data
+
+def load(filename):
+    """
+    Returns the ID3v1 of filename, or None if the file starts with an ID3v2
+    tag.
+
+    Exceptions:
+    ID3NoHeaderError - the file has no tag
+    """
+    f = open(filename, 'rb')
+    try:
+        if f.read(3) == 'ID3': return None
+        tag = ID3v1()
+        tag.filename = filename
+        tag.readfrom(f)
+        return tag
+    finally:
+        f.close()
+
+class ID3v1(CompatID3):
+    """
+    ID3v1 represents the trailer of a file without an ID3v2 tag.  Its frames
+    are changed like any tag's, and save() writes the trailer back over the
+    old one.
+    """
+
+    def __init__(self, filename=None):
+        super(ID3v1, self).__init__()
+        self.version = (1, 1)
+        self.size = 0
+        if filename != None: self.load(filename)
+
+    def load(self, filename):
+        """
+        Loads the trailer of filename.
+
+        Exceptions:
+        ID3NoHeaderError - the file has no trailer
+        """
+        self.filename = filename
+        f = open(filename, 'rb')
+        try: self.readfrom(f)
+        finally: f.close()
+
+    def readfrom(self, f):
+        """
+        Loads the trailer of the open file f.
+
+        Exceptions:
+        ID3NoHeaderError - the file has no trailer
+        """
+        self.clear()
+        try: f.seek(-128, 2)
+        except IOError: frames = None   #shorter than a trailer
+        else: frames = parse(f.read(128))
+        if frames == None:
+            raise ID3NoHeaderError("'%s' doesn't have an ID3 tag" % self.filename)
+        for frame in frames: self.add(frame)
+
+    def save(self, filename=None, v1=1, v2=0):
+        """
+        Writes the trailer over the old one with a single write, or removes
+        it if no frame is left.  v1 and v2 are taken for CompatID3.save()'s
+        callers and ignored.
+
+        Exceptions:
+        ID3NoHeaderError - the file's trailer is gone
+        """
+        if filename == None: filename = self.filename
+        if not self.keys():
+            self.delete(filename)
+            return
+        data = render(self)
+        f = open(filename, 'rb+')
+        try:
+            with stats.phase('write'):
+                try: f.seek(-128, 2)
+                except IOError: raise ID3NoHeaderError(filename)
+                if f.read(3) != 'TAG': raise ID3NoHeaderError(filename)
+                f.seek(-3, 1)
+                f.write(data)
+        finally:
+            f.close()
+        self.lastsave = 'inplace'
+        savecounts['inplace'] += 1
+        stats.add('inplace')
+        stats.add('written', len(data))
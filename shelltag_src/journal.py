@@ -0,0 +1,130 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module holds a Journal class, an append-only record of the files a run
+has finished.  Each line is a JSON object with the path, size and
+modification time of a file just after it was processed...
+
+{"path": "/music/a.mp3", "size": 72139, "mtime": 1286000000000000000}
+
+A resumed run skips every file whose size and modification time still
+match its line, so a run which died part way only redoes what it hadn't
+finished.  Lines are synced to disk in batches; lines lost or torn by a
+crash only make their files be processed again.
+"""
+
+import os
+import os.path
+import time
+
+try: import json
+except ImportError: import simplejson as json
+
+import tagindex
+
+def journalkey(path):
+    """
+    Returns the absolute path of path as the unicode string used as its key.
+    """
+    return tagindex.indexkey(os.path.abspath(path))
+
+class Journal(object):
+    """
+    Journal represents a journal file.
+
+    Attributes:
+    journalpath - name of the journal file
+    done - dict of path key -> (size, mtime) of the files read from the
+        journal when resuming
+    skipped - number of files pending() skipped
+    unsynced - number of lines written since the last sync
+    lastsync - time of the last sync
+    """
+    syncevery = 256
+    syncseconds = 5.0
+
+    def __init__(self, journalpath, resume=False):
+        """
+        Opens journalpath for appending, creating it if needed.
+
+        Attributes:
+        resume - True reads the files already done from the journal
+        """
+        self.journalpath = journalpath
+        self.done = {}
+        self.skipped = 0
+        if resume and os.path.exists(journalpath): self.read()
+        self.f = open(journalpath, 'ab')
+        if os.path.getsize(journalpath) > 0:    #a line torn by a crash is ended
+            last = open(journalpath, 'rb')
+            try:
+                last.seek(-1, 2)
+                if last.read(1) != '\n': self.f.write('\n')
+            finally:
+                last.close()
+        self.unsynced = 0
+        self.lastsync = time.time()
+
+    def read(self):
+        """
+        Reads the files done from the journal, ignoring lines which can't
+        be read.
+        """
+        f = open(self.journalpath, 'rb')
+        try:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self.done[entry['path']] = (entry['size'], entry['mtime'])
+                except (ValueError, KeyError, TypeError):
+                    continue    #torn by a crash
+        finally:
+            f.close()
+
+    def isdone(self, path):
+        """
+        Returns True if path was done and hasn't changed since.
+        """
+        stamp = self.done.get(journalkey(path))
+        if stamp == None: return False
+        try: return tuple(stamp) == tagindex.filestamp(path)
+        except OSError: return False
+
+    def pending(self, pathlist):
+        """
+        Yields the paths of pathlist which aren't done yet.
+        """
+        for path in pathlist:
+            if self.done and self.isdone(path): self.skipped += 1
+            else: yield path
+
+    def record(self, path):
+        """
+        Appends path with its current size and modification time, syncing
+        the journal every syncevery lines or syncseconds seconds.
+        """
+        size, mtime = tagindex.filestamp(path)
+        entry = {'path': journalkey(path), 'size': size, 'mtime': mtime}
+        self.f.write(json.dumps(entry) + '\n')
+        self.unsynced += 1
+        if self.unsynced >= self.syncevery \
+                or time.time() - self.lastsync >= self.syncseconds:
+            self.sync()
+
+    def sync(self):
+        """
+        Writes the lines recorded so far to disk.
+        """
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.unsynced = 0
+        self.lastsync = time.time()
+
+    def close(self):
+        self.sync()
+        self.f.close()
@@ -0,0 +1,387 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module holds a LazyID3 class, a read-only CompatID3 which only indexes
+the frame headers of a tag when it is loaded.  A frame's body is read and
+decoded the first time the frame is asked for, and the data of binary
+frames (APIC, GEOB, PRIV) stays in the file until it is used.
+
+The file is read through an mmap, so the header, the frame index, frame
+bodies and an ID3v1 trailer are all sliced from one mapping without read
+calls, and only the bytes of a frame being decoded are copied.
+
+Tags which can't be indexed safely (ID3v2.2, unsynchronised ID3v2.3,
+extended headers, or frame sizes which don't add up) are loaded in full
+instead.  Binary frames which are compressed or unsynchronised are decoded
+in full when they are read.
+"""
+
+import os
+import mmap
+import struct
+from struct import unpack
+
+from mutagen._util import DictProxy
+from mutagen.id3 import Frames, APIC, GEOB, PRIV, BitPaddedInt, \
+                        ID3JunkFrameError, ID3NoHeaderError, is_valid_frame_id
+
+from compatid3 import CompatID3
+import id3v1
+import stats
+
+class LazyData(object):
+    """
+    Mixin for frames whose last part is binary data.  The data is read from
+    the tag's file the first time it is used.
+
+    Attributes:
+    _source - LazyID3 the frame came from
+    _offset - offset of the data in the file
+    _size - length of the data in bytes
+    """
+    _data = None
+
+    def __getdata(self):
+        if self._data == None:
+            self._data = self._source.readat(self._offset, self._size)
+        return self._data
+
+    def __setdata(self, value):
+        self._data = value
+
+    data = property(__getdata, __setdata)
+
+    def datasize(self):
+        """
+        Returns the length of the data without reading it.
+        """
+        if self._data == None: return self._size
+        return len(self._data)
+
+class LazyAPIC(LazyData, APIC):
+    def _pprint(self):
+        return "%s (%s, %d bytes)" % (self.desc, self.mime, self.datasize())
+
+class LazyGEOB(LazyData, GEOB):
+    pass
+
+class LazyPRIV(LazyData, PRIV):
+    #the real HashKey contains the data itself
+    HashKey = property(lambda s: '%s:%s:@%d' % (s.FrameID, s.owner, s._offset))
+    def _pprint(self):
+        if self._data == None and self._size > 1024:
+            return "%s (%d bytes)" % (self.owner, self._size)
+        return PRIV._pprint(self)
+
+#frame classes must keep their ID3 names, since FrameID is the class name
+LazyAPIC.__name__ = 'APIC'
+LazyGEOB.__name__ = 'GEOB'
+LazyPRIV.__name__ = 'PRIV'
+
+lazyframes = {
+    'APIC': LazyAPIC,
+    'GEOB': LazyGEOB,
+    'PRIV': LazyPRIV
+}
+
+#frames read together before converting a tag to ID3v2.4 in memory
+translated = ('TYER', 'TDAT', 'TIME', 'TDRC', 'TORY', 'TDOR', 'IPLS', 'TIPL',
+        'TCON', 'RVAD', 'EQUA', 'TRDA', 'TSIZ', 'CRM')
+
+#bytes read ahead for the text parts of a binary frame
+prefixsize = 1024
+
+def mapfile(f):
+    """
+    Returns a read-only mmap of the file object f, or None if it can't be
+    mapped (ex. it's empty).
+    """
+    try: return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError): return None
+
+class LazyID3(CompatID3):
+    """
+    Read-only ID3 tag which decodes frames on demand.
+
+    Attributes:
+    index - dict of frame ID -> list of (offset, size, flags) of the frame
+        bodies not decoded yet, or None if the whole tag was loaded
+    headerflags - flags byte of the ID3v2 header
+    source - read-only mmap of the file, or None if it couldn't be mapped
+    padding - bytes of padding after the frames, or None if the tag was
+        loaded in full
+    layout - list of (frame ID, offset, size) of every frame in the order
+        they are stored, including frames decoded since, or None if the
+        whole tag was loaded
+    """
+
+    index = None
+    headerflags = 0
+    source = None
+    padding = None
+    layout = None
+
+    f_unsynch = property(lambda s: bool(s.headerflags & 0x80))
+    f_extended = property(lambda s: bool(s.headerflags & 0x40))
+
+    def load(self, filename, known_frames=None, translate=True):
+        """
+        Indexes the frame headers of filename's tag.  Falls back to a full
+        load when the tag can't be indexed.
+        """
+        self.filename = filename
+        self.known_frames = known_frames or Frames
+        self.translate = translate
+        self.index = None
+        self.padding = None
+        self.layout = None
+        f = open(filename, 'rb')
+        try:
+            self.source = mapfile(f)
+            read = self.reader(f)
+            if read(0, 3) != 'ID3':
+                self.readv1(read, os.fstat(f.fileno()).st_size)
+                return
+            index = self.readindex(read)
+        finally:
+            f.close()
+        if index == None:
+            super(LazyID3, self).load(filename, known_frames, translate)
+        else:
+            self.index = index
+
+    def reader(self, f):
+        """
+        Returns a function read(offset, size) which slices the mapping of
+        the file, or reads from f if the file isn't mapped.
+        """
+        if self.source != None:
+            source = self.source
+            read = lambda offset, size: source[offset:offset + size]
+        else:
+            def read(offset, size):
+                f.seek(offset)
+                return f.read(size)
+        if not stats.counting(): return read
+        def countedread(offset, size):
+            data = read(offset, size)
+            stats.add('read', len(data))
+            return data
+        return countedread
+
+    def readv1(self, read, filesize):
+        """
+        Loads an ID3v1 tag from the last 128 bytes of the file.
+        """
+        self.size = 0
+        frames = None
+        if filesize >= 128: frames = id3v1.parse(read(filesize - 128, 128))
+        if frames == None:
+            raise ID3NoHeaderError("'%s' doesn't start with an ID3 tag"
+                    % self.filename)
+        self.version = (1, 1)
+        for frame in frames: self.add(frame)
+
+    def readindex(self, read):
+        """
+        Returns a dict of frame ID -> list of (offset, size, flags) read
+        from the frame headers of the file, or None if the tag has to be
+        loaded in full.
+        """
+        header = read(0, 10)
+        try: id3, vmaj, vrev, flags, size = unpack('>3sBBB4s', header)
+        except struct.error: return None
+        if id3 != 'ID3' or vmaj not in (3, 4) or flags & 0x40: return None
+        #ID3v2.3 unsynchronisation changes the frame offsets
+        if vmaj == 3 and flags & 0x80: return None
+        self.version = (2, vmaj, vrev)
+        self.headerflags = flags
+        self.size = BitPaddedInt(size) + 10
+
+        index = {}
+        layout = []
+        offset = 10
+        while offset + 10 <= self.size:
+            framehead = read(offset, 10)
+            try: name, framesize, frameflags = unpack('>4sLH', framehead)
+            except struct.error: return None
+            if name.strip('\x00') == '': break #padding
+            if not is_valid_frame_id(name): return None
+            if vmaj == 4:
+                if framesize & 0x80808080: return None #not syncsafe
+                framesize = BitPaddedInt(framesize)
+            offset += 10
+            if offset + framesize > self.size: return None
+            if framesize > 0:
+                index.setdefault(name, []).append(
+                        (offset, framesize, frameflags))
+                layout.append((name, offset - 10, framesize + 10))
+            offset += framesize
+        self.padding = self.size - offset
+        self.layout = layout
+        return index
+
+    def readat(self, offset, size):
+        """
+        Returns size bytes of the file starting at offset.
+        """
+        if self.source != None: return self.source[offset:offset + size]
+        f = open(self.filename, 'rb')
+        try:
+            f.seek(offset)
+            return f.read(size)
+        finally:
+            f.close()
+
+    def strip(self, frameids, compact=False, dryrun=False):
+        """
+        Removes every frame with one of the given frame IDs from the file
+        without decoding any frame, copying the other frames as they are
+        stored.  By the padding policy the tag keeps its size, the removed
+        frames becoming padding; compact shrinks it to the frames left plus
+        MINPADDING instead.  The ID3v1 tag is left as it is.
+
+        Returns a tuple of (frames removed, bytes removed), or None if the
+        tag wasn't indexed (or has a footer) and has to be changed through
+        a full load.  Nothing is written if no frame was removed or dryrun
+        is True.  The object shouldn't be used after the file is written.
+        """
+        if self.layout == None or self.headerflags & 0x10: return None
+        kept = []
+        removed = [0, 0]
+        for name, offset, size in self.layout:
+            if name in frameids:
+                removed[0] += 1
+                removed[1] += size
+            else: kept.append(self.readat(offset, size))
+        if removed[0] == 0 or dryrun: return tuple(removed)
+
+        self.close()
+        shrink = compact and (self.MAXPADDING == None
+                or self.MAXPADDING > self.MINPADDING)
+        if shrink: self.MAXPADDING = self.MINPADDING
+        try:
+            self.writetag(''.join(kept), self.filename, None, self.version[1],
+                    self.headerflags)
+        finally:
+            if shrink: del self.MAXPADDING  #later saves use the usual policy
+        return tuple(removed)
+
+    def close(self):
+        """
+        Releases the mapping of the file.  Frames still to be read are read
+        through the file afterwards.
+        """
+        if self.source != None:
+            self.source.close()
+            self.source = None
+
+    def decode(self, frameids):
+        """
+        Decodes all frames with the given frame IDs which haven't been
+        decoded yet and adds them to the tag.
+        """
+        if self.index == None: return
+        frameids = [name for name in frameids if name in self.index]
+        if not frameids: return
+        f = None
+        if self.source == None: f = open(self.filename, 'rb')
+        try:
+            read = self.reader(f)
+            for name in frameids:
+                for offset, size, flags in self.index.pop(name):
+                    frame = self.readframe(read, name, offset, size, flags)
+                    if frame != None: self.add(frame)
+        finally:
+            if f != None: f.close()
+
+    def readframe(self, read, name, offset, size, flags):
+        """
+        Returns the frame stored at offset, or None if it can't be decoded.
+        Binary frames only have their text parts read.
+        """
+        if name not in self.known_frames:
+            self.unknown_frames.append(read(offset - 10, size + 10))
+            return None
+        if name in lazyframes and not flags & 0xFF and not self.f_unsynch:
+            cls = lazyframes[name]
+            data = read(offset, min(size, prefixsize))
+            try:
+                frame = cls()
+                rest = data
+                for reader in cls._framespec[:-1]:
+                    value, rest = reader.read(frame, rest)
+                    setattr(frame, reader.name, value)
+            except (UnicodeDecodeError, IndexError, ValueError):
+                return None
+            if rest or len(data) == size:
+                frame._source = self
+                frame._offset = offset + len(data) - len(rest)
+                frame._size = size - len(data) + len(rest)
+                frame._data = None
+                return frame
+            #text parts are longer than the prefix -> decode in full
+        data = read(offset, size)
+        try: return self.known_frames[name].fromData(self, flags, data)
+        except (ID3JunkFrameError, NotImplementedError): return None
+
+    def translatetag(self):
+        """
+        Converts the decoded frames to ID3v2.4 once, like a full load does.
+        """
+        if self.translate:
+            self.translate = False
+            self.decode(translated)
+            self.update_to_v24()
+
+    def __getitem__(self, key):
+        if self.index != None:
+            self.translatetag()
+            self.decode([key[:4]])
+        return DictProxy.__getitem__(self, key)
+
+    def keys(self):
+        if self.index != None:
+            self.translatetag()
+            self.decode(self.index.keys())
+        return DictProxy.keys(self)
+
+    def decodedkeys(self, frameids):
+        """
+        Decodes the frames with the given frame IDs and returns the keys of
+        every frame decoded so far, without decoding the rest of the tag.
+        """
+        if self.index != None:
+            self.translatetag()
+            self.decode(frameids)
+        return DictProxy.keys(self)
+
+    def getall(self, key):
+        """
+        Returns all frames with a given name, decoding only those frames.
+        """
+        if self.index != None:
+            self.translatetag()
+            self.decode([key[:4]])
+        keys = DictProxy.keys(self)
+        if key in keys: return [DictProxy.__getitem__(self, key)]
+        key = key + ":"
+        return [DictProxy.__getitem__(self, s) for s in keys
+                if s.startswith(key)]
+
+    def has_key(self, key):
+        try: self[key]
+        except KeyError: return False
+        else: return True
+    __contains__ = has_key
+
+    def clear(self):
+        self.index = None
+        self.translate = False
+        for key in DictProxy.keys(self):
+            DictProxy.__delitem__(self, key)
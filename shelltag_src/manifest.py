@@ -0,0 +1,214 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module contains functions for reading a manifest of tag edits, as CSV
+or NDJSON (one JSON object per line).
+
+A manifest is read one row at a time, in one of two layouts...
+
+long: one edit per row, with path, field and value columns.  A null value
+(NDJSON only) removes the field.
+wide: a path column and one column per field.  Empty cells and nulls leave
+the field alone, and the columns written by --export which aren't fields
+(VERSION, TAGSIZE, ...) are skipped, so an export can be applied back.
+
+Column names are case-insensitive.  Relative paths are relative to the
+current directory.  Values are UTF-8.
+"""
+
+import os
+import sys
+import csv
+import threading
+from itertools import groupby, chain
+
+try: import json
+except ImportError: import simplejson as json
+
+from export import infocolumns
+
+class ManifestError(Exception):
+    pass
+
+def manifestformat(filename, firstline):
+    """
+    Returns 'ndjson' or 'csv' for a manifest, from its extension or else
+    from its first line.
+    """
+    extension = filename.lower().rsplit('.', 1)[-1]
+    if extension in ('ndjson', 'jsonl', 'json'): return 'ndjson'
+    if extension == 'csv': return 'csv'
+    if firstline.lstrip().startswith('{'): return 'ndjson'
+    return 'csv'
+
+def cell(value, encoding='UTF-8'):
+    """
+    Returns a cell of a manifest as a string in encoding, or None for nulls.
+    """
+    if value == None or isinstance(value, str): return value
+    return unicode(value).encode(encoding)
+
+def rowedits(row):
+    """
+    Returns a tuple of (path, list of (field, value)) for a row given as a
+    dict of column -> value.
+    """
+    columns = dict([(column.upper(), column) for column in row.keys()])
+    if 'PATH' not in columns: raise ManifestError, "row has no path"
+    path = cell(row[columns['PATH']], sys.getfilesystemencoding() or 'UTF-8')
+    if not path: raise ManifestError, "row has no path"
+    #long -> one edit
+    if 'FIELD' in columns and 'VALUE' in columns:
+        field = cell(row[columns['FIELD']])
+        if not field: raise ManifestError, "row has no field"
+        return (path, [(field.upper(), cell(row[columns['VALUE']]))])
+    #wide -> one edit per non-empty field
+    edits = []
+    for upper, column in sorted(columns.items()):
+        value = row[column]
+        if upper == 'CUSTOM':
+            if isinstance(value, basestring) and value: value = json.loads(value)
+            for field, text in sorted((value or {}).items()):
+                edits.append((cell(field).upper(), cell(text)))
+        elif upper in infocolumns or upper in ('FIELD', 'VALUE'): continue
+        elif value != None and value != '':
+            edits.append((cell(upper), cell(value)))
+    return (path, edits)
+
+def rows(f, filename):
+    """
+    Yields (row number, path, list of (field, value)) for each row of the
+    manifest file f.  Rows which can't be read are yielded with the
+    ManifestError in place of the list of edits.
+
+    Attributes:
+    f - manifest file opened for reading
+    filename - name of the manifest, used to guess its format
+    """
+    firstline = f.readline()
+    if manifestformat(filename, firstline) == 'ndjson':
+        lines = enumerate(chain([firstline], f), 1)
+        records = ((number, line) for number, line in lines if line.strip())
+        for number, line in records:
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ManifestError, "row isn't a JSON object"
+                path, edits = rowedits(record)
+            except (ValueError, ManifestError), err:
+                yield (number, None, ManifestError(str(err)))
+            else: yield (number, path, edits)
+    else:
+        reader = csv.reader(chain([firstline], f))
+        header = reader.next()
+        for number, values in enumerate(reader, 2):
+            if not values: continue
+            try:
+                if len(values) != len(header):
+                    raise ManifestError, "row has %d columns, header has %d" \
+                            % (len(values), len(header))
+                path, edits = rowedits(dict(zip(header, values)))
+            except (ValueError, ManifestError), err:
+                yield (number, None, ManifestError(str(err)))
+            else: yield (number, path, edits)
+
+def filekey(path):
+    """
+    Returns the key of a file of the manifest, the same for every way of
+    naming it, or None for rows which couldn't be read.
+    """
+    if path == None: return None
+    return os.path.abspath(path)
+
+def groups(manifestrows):
+    """
+    Yields (path, list of (row number, field, value)) for each run of rows
+    for the same file, as soon as the run ends, so each file is loaded and
+    saved once per run and the manifest is never held in memory.  Rows
+    which couldn't be read are yielded on their own with a path of None
+    and (row number, None, error) as their only edit.  A file named again
+    further on gets a run of its own; see InFlight.
+    """
+    for key, run in groupby(manifestrows, lambda row: filekey(row[1])):
+        if key == None:
+            for number, path, error in run:
+                yield (None, [(number, None, error)])
+            continue
+        edits = []
+        first = None    #the run is named by its first row
+        for number, path, fieldvalues in run:
+            if first == None: first = path
+            for field, value in fieldvalues:
+                edits.append((number, field, value))
+        yield (first, edits)
+
+class InFlight(object):
+    """
+    InFlight lets groups through to the workers, holding back a group whose
+    file is still being changed by an earlier group, so no file is saved
+    by two workers at once and a file's runs are applied in order.  It also
+    keeps the groups handed out and not yet done to limit, so the manifest
+    is read only as fast as it's applied.  admitted() is run by the thread
+    handing groups to the workers, done() by the one reading their results.
+
+    Attributes:
+    limit - most groups handed out and not yet done
+    files - file key -> groups of the file handed out and not yet done
+    count - groups handed out and not yet done
+    closed - True once close() is called, admitted() then waits no more
+    """
+    def __init__(self, limit=1):
+        self.limit = max(limit, 1)
+        self.files = {}
+        self.count = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def admitted(self, manifestgroups):
+        """
+        Yields the groups of manifestgroups, each once its file is free.
+        """
+        for group in manifestgroups:
+            key = filekey(group[0])
+            self.condition.acquire()
+            try:
+                while not self.closed and (self.count >= self.limit
+                        or (key != None and key in self.files)):
+                    self.condition.wait(1.0)
+                if self.closed: return
+                self.count += 1
+                if key != None: self.files[key] = self.files.get(key, 0) + 1
+            finally:
+                self.condition.release()
+            yield group
+
+    def done(self, path):
+        """
+        Frees the file of a group admitted() let through.
+        """
+        key = filekey(path)
+        self.condition.acquire()
+        try:
+            self.count -= 1
+            if key in self.files:
+                self.files[key] -= 1
+                if self.files[key] == 0: del self.files[key]
+            self.condition.notifyAll()
+        finally:
+            self.condition.release()
+
+    def close(self):
+        """
+        Lets a waiting admitted() return, so the workers can be stopped.
+        """
+        self.condition.acquire()
+        try:
+            self.closed = True
+            self.condition.notifyAll()
+        finally:
+            self.condition.release()
@@ -0,0 +1,100 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module contains functions for running per-file work in a pool of
+processes.
+"""
+
+import sys
+import traceback
+from StringIO import StringIO
+
+import stats
+
+def describe(error):
+    """
+    Returns a one line description of an exception, ex. "IOError: blah".
+
+    Attributes:
+    error - exception instance
+    """
+    return ''.join(traceback.format_exception_only(type(error), error)).strip()
+
+def call(task):
+    """
+    Calls function(*arguments) while capturing everything it prints.
+    Returns a tuple of (arguments, result, output, errors, error, recorded,
+    transferred) where result is what function returned, output and errors
+    are the captured stdout and stderr, error is a description of the
+    exception raised or None, recorded is the call's stats snapshot and
+    transferred the bytes it read and wrote while metered.
+
+    Attributes:
+    task - tuple of (function, arguments)
+    """
+    function, arguments = task
+    stats.reset()
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StringIO(), StringIO()
+    try:
+        result = error = None
+        try:
+            result = function(*arguments)
+        except Exception, err:
+            error = describe(err)
+        output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    return (arguments, result, output, errors, error, stats.snapshot(),
+            stats.transferred)
+
+def run(function, tasks, jobs=1, ordered=False, chunksize=16):
+    """
+    Calls function(*arguments) for each tuple of arguments in tasks and
+    yields (arguments, result, output, errors, error) as each call
+    finishes.  The results must be picklable.
+
+    With jobs > 1 the calls are spread over a pool of processes and the
+    output of each call is captured so it can be printed in one piece.
+    With jobs = 1 the calls run in this process and print as they go,
+    so output and errors are always ''.
+
+    Attributes:
+    function - picklable function to call
+    tasks - iterable of argument tuples, consumed lazily
+    jobs - number of worker processes
+    ordered - True yields results in the order of tasks, False yields
+        them as soon as they finish
+    chunksize - number of tasks handed to a worker at a time
+    """
+    if jobs <= 1:
+        for arguments in tasks:
+            result = error = None
+            try:
+                result = function(*arguments)
+            except Exception, err:
+                error = describe(err)
+            yield (arguments, result, '', '', error)
+        return
+
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    try:
+        work = ((function, arguments) for arguments in tasks)
+        if ordered: results = pool.imap(call, work, chunksize)
+        else: results = pool.imap_unordered(call, work, chunksize)
+        for result in results:
+            stats.merge(result[5])  #the worker's stats
+            stats.transferred += result[6]
+            yield result[:5]
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
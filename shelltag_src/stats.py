@@ -0,0 +1,155 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module records where a run spends its time: wall time per phase and
+counters such as bytes read and written or saves done in place.  Nothing is
+recorded until enable() is called, so the hooks cost a function call when
+disabled.  meter() only totals the bytes read and written, for throttle.
+
+Recording a phase...
+
+with stats.phase('parse'):
+    tag = CompatID3(filename)
+stats.add('read', tag.size)
+
+Phases: walk, parse, encode, move, write, copy, fsync
+Counters: files, failed, unchanged, inplace, rewrite, read, written
+"""
+
+import time
+
+enabled = False
+#phase -> seconds
+times = {}
+#counter -> number
+counts = {}
+metered = False
+#bytes read and written while metered
+transferred = 0
+
+class Phase(object):
+    """
+    Context manager adding the time spent inside it to a phase.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        times[self.name] = times.get(self.name, 0.0) + time.time() - self.start
+        return False
+
+class NoPhase(object):
+    """
+    Context manager used while recording is disabled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        return False
+
+nophase = NoPhase()
+
+def enable(on=True):
+    """
+    Starts (or with on=False stops) recording.
+    """
+    global enabled
+    enabled = on
+
+def meter(on=True):
+    """
+    Starts (or with on=False stops) totalling the bytes read and written in
+    transferred, whether or not anything else is recorded.
+    """
+    global metered
+    metered = on
+
+def counting():
+    """
+    Returns True if bytes read and written are counted, so callers can skip
+    working them out otherwise.
+    """
+    return enabled or metered
+
+def reset():
+    """
+    Forgets everything recorded and metered so far.
+    """
+    global transferred
+    times.clear()
+    counts.clear()
+    transferred = 0
+
+def phase(name):
+    """
+    Returns a context manager which records the time spent in it under name.
+    """
+    if enabled: return Phase(name)
+    return nophase
+
+def add(name, amount=1):
+    """
+    Adds amount to the counter name.
+    """
+    global transferred
+    if enabled: counts[name] = counts.get(name, 0) + amount
+    if metered and name in ('read', 'written'): transferred += amount
+
+def timed(name, iterable):
+    """
+    Yields the items of iterable, recording the time spent getting each one
+    under the phase name, ex. walking a directory.
+    """
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try: item = iterator.next()
+            except StopIteration: return
+        yield item
+
+def snapshot():
+    """
+    Returns what has been recorded as a picklable tuple of (times, counts),
+    or None while disabled.
+    """
+    if not enabled: return None
+    return (dict(times), dict(counts))
+
+def merge(recorded):
+    """
+    Adds a snapshot, ex. from a worker process, to what has been recorded.
+    """
+    if recorded == None: return
+    for name, seconds in recorded[0].items():
+        times[name] = times.get(name, 0.0) + seconds
+    for name, amount in recorded[1].items():
+        counts[name] = counts.get(name, 0) + amount
+
+def summary(elapsed):
+    """
+    Returns the lines of the --stats summary.
+
+    Attributes:
+    elapsed - wall time of the whole run in seconds
+    """
+    count = lambda name: counts.get(name, 0)
+    lines = []
+    lines.append("[STATS]files: %d processed, %d unchanged, %d failed"
+            % (count('files'), count('unchanged'), count('failed')))
+    lines.append("[STATS]saves: %d in place, %d rewritten"
+            % (count('inplace'), count('rewrite')))
+    lines.append("[STATS]bytes: %d read, %d written"
+            % (count('read'), count('written')))
+    phases = ["%s %.3fs" % (name, times[name]) for name in sorted(times.keys())]
+    lines.append("[STATS]time: %.3fs total; %s" % (elapsed, ', '.join(phases)))
+    return lines
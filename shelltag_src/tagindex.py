@@ -0,0 +1,183 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module holds a TagIndex class, an on-disk SQLite cache of the fields of
+tags keyed by path, size and modification time.  A file whose size and
+modification time still match its entry is answered from the index without
+being opened.
+"""
+
+import os
+import os.path
+import sys
+
+try: import json
+except ImportError: import simplejson as json
+
+schema = """
+CREATE TABLE IF NOT EXISTS tags (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    info TEXT NOT NULL,
+    fields TEXT NOT NULL
+)
+"""
+
+#open indexes of this process, see getindex
+indexes = {}
+
+def indexkey(path):
+    """
+    Returns path as the unicode string used as its key.
+    """
+    if isinstance(path, unicode): return path
+    return path.decode(sys.getfilesystemencoding() or 'UTF-8', 'replace')
+
+def filestamp(path):
+    """
+    Returns a tuple of (size, mtime) of path, with mtime in nanoseconds.
+    """
+    st = os.stat(path)
+    mtime = getattr(st, 'st_mtime_ns', None)
+    if mtime == None: mtime = int(round(st.st_mtime * 1000000000))
+    return (st.st_size, mtime)
+
+def getindex(indexpath):
+    """
+    Returns the TagIndex for indexpath opened by this process, opening it
+    on first use.  Worker processes each get their own connection.
+    """
+    key = (os.path.abspath(indexpath), os.getpid())
+    if key not in indexes: indexes[key] = TagIndex(indexpath)
+    return indexes[key]
+
+class TagIndex(object):
+    """
+    TagIndex represents an index file.
+
+    Attributes:
+    indexpath - name of the SQLite file
+    connection - sqlite3 connection
+    writes - number of entries stored since the last commit
+    """
+    commitevery = 500
+
+    def __init__(self, indexpath):
+        """
+        Opens or creates the index in indexpath.
+        """
+        import sqlite3
+        self.indexpath = indexpath
+        self.connection = sqlite3.connect(indexpath, timeout=60)
+        self.connection.execute(schema)
+        self.connection.commit()
+        self.writes = 0
+
+    def lookup(self, path):
+        """
+        Returns a tuple of (info, fields) for path if its entry is up to date,
+        otherwise None.  info is the --info line without the filename, see
+        id3tag.namedinfo.
+
+        Attributes:
+        path - pathname, relative to the current directory or absolute
+        """
+        try: size, mtime = filestamp(path)
+        except OSError: return None
+        row = self.connection.execute(
+                "SELECT info, fields FROM tags WHERE path=? AND size=? AND mtime=?",
+                (indexkey(os.path.abspath(path)), size, mtime)).fetchone()
+        if row == None: return None
+        if row[0].startswith(u"[INFO]"): return None    #stored with its filename
+        return (row[0], json.loads(row[1]))
+
+    def store(self, record):
+        """
+        Stores an entry made by makerecord.
+        """
+        self.connection.execute(
+                "INSERT OR REPLACE INTO tags VALUES (?,?,?,?,?)",
+                (record[0], record[1], record[2], record[3], json.dumps(record[4])))
+        self.writes += 1
+        if self.writes >= self.commitevery: self.commit()
+
+    def commit(self):
+        """
+        Writes stored entries to disk.
+        """
+        self.connection.commit()
+        self.writes = 0
+
+    def entries(self, path):
+        """
+        Returns a list of the paths of every entry under the directory or
+        file path.
+        """
+        path = indexkey(os.path.abspath(path))
+        rows = self.connection.execute(
+                "SELECT path FROM tags WHERE path=? OR substr(path,1,?)=?",
+                (path, len(path) + 1, os.path.join(path, u''))).fetchall()
+        return [row[0] for row in rows]
+
+    def remove(self, paths):
+        """
+        Removes the entries of paths.
+        """
+        self.connection.executemany("DELETE FROM tags WHERE path=?",
+                [(path,) for path in paths])
+        self.commit()
+
+    def prune(self, path):
+        """
+        Removes entries under path whose files no longer exist.  Returns the
+        list of removed paths.
+        """
+        missing = [entry for entry in self.entries(path)
+                if not os.path.isfile(entry)]
+        self.remove(missing)
+        return missing
+
+    def verify(self, pathlist):
+        """
+        Yields (path, status) for each file of pathlist whose entry is not
+        up to date, where status is "unindexed" or "stale".
+
+        Attributes:
+        pathlist - iterable of filenames, relative or absolute
+        """
+        for path in pathlist:
+            row = self.connection.execute(
+                    "SELECT size, mtime FROM tags WHERE path=?",
+                    (indexkey(os.path.abspath(path)),)).fetchone()
+            if row == None:
+                yield (path, "unindexed")
+                continue
+            try: stamp = filestamp(path)
+            except OSError: stamp = None
+            if tuple(row) != stamp:
+                yield (path, "stale")
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+        key = (os.path.abspath(self.indexpath), os.getpid())
+        if indexes.get(key) is self: del indexes[key]
+
+def makerecord(filetag, stamp):
+    """
+    Returns an entry for the index made from an ID3Tag, as a picklable
+    tuple of (path, size, mtime, info, fields).
+
+    Attributes:
+    filetag - ID3Tag with a tag
+    stamp - (size, mtime) taken before the tag was read
+    """
+    path = indexkey(os.path.abspath(filetag.filename))
+    return (path, stamp[0], stamp[1], filetag.taginfo(False),
+            filetag.getfields())
@@ -0,0 +1,246 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This module holds a Throttle class which limits a run to a number of files
+and/or bytes per second with token buckets.  The main process admits each
+file before it's handed to a worker, so one budget covers every worker.
+Bytes aren't known until a file is done, so they're charged afterwards
+from the bytes stats meters and the next file waits until the debt is paid;
+only as many files as there are workers are let through at a time, so the
+debt can't pile up unseen.
+
+The limits can be changed while running by writing them to a control file,
+which is read again whenever it changes...
+
+bytes_per_sec=20M
+files_per_sec=50
+
+A rate of 0 removes a limit, and a limit missing from the file keeps the
+value given on the command line.
+"""
+
+import os
+import sys
+import time
+import threading
+
+import stats
+
+#seconds between checks of the control file
+checkevery = 1.0
+
+suffixes = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def parserate(text):
+    """
+    Returns a rate given as a number with an optional K, M or G suffix,
+    ex. '20M', or None if it's 0.
+
+    Exceptions:
+    ValueError - text isn't a rate
+    """
+    text = text.strip().upper()
+    multiplier = 1
+    if text[-1:] in suffixes:
+        multiplier = suffixes[text[-1]]
+        text = text[:-1]
+    rate = float(text) * multiplier
+    if rate < 0: raise ValueError, "negative rate"
+    if rate == 0: return None
+    return rate
+
+def readcontrol(controlfile):
+    """
+    Returns a dict of 'bytes_per_sec' and/or 'files_per_sec' -> rate read
+    from a control file.
+
+    Exceptions:
+    ValueError - a line can't be read
+    """
+    rates = {}
+    f = open(controlfile)
+    try:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            name, value = line.split('=', 1)
+            name = name.strip().lower()
+            if name not in ('bytes_per_sec', 'files_per_sec'):
+                raise ValueError, "unknown limit: " + name
+            rates[name] = parserate(value)
+    finally:
+        f.close()
+    return rates
+
+class TokenBucket(object):
+    """
+    TokenBucket represents one limit.
+
+    Attributes:
+    rate - tokens added per second, None for no limit
+    capacity - most tokens held, a second's worth of rate
+    tokens - tokens held, negative while in debt
+    last - time tokens were last added
+    """
+    def __init__(self, rate=None):
+        self.lock = threading.Lock()
+        self.tokens = 0.0
+        self.last = time.time()
+        self.setrate(rate)
+
+    def setrate(self, rate):
+        self.lock.acquire()
+        try:
+            self.rate = rate
+            if rate == None: self.capacity = None
+            else: self.capacity = max(float(rate), 1.0)
+            self.tokens = min(self.tokens, self.capacity or 0.0)
+        finally:
+            self.lock.release()
+
+    def __refill(self, now):
+        if self.rate != None:
+            self.tokens = min(self.capacity,
+                    self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def take(self, amount):
+        """
+        Takes amount tokens if at least that many are held (or nothing is
+        owed when amount is 0).  Returns the seconds to wait before trying
+        again, or 0 if they were taken.
+        """
+        self.lock.acquire()
+        try:
+            self.__refill(time.time())
+            if self.rate == None: return 0
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0
+            return (amount - self.tokens) / self.rate
+        finally:
+            self.lock.release()
+
+    def charge(self, amount):
+        """
+        Takes amount tokens whether they're held or not.
+        """
+        self.lock.acquire()
+        try:
+            self.__refill(time.time())
+            if self.rate != None: self.tokens -= amount
+        finally:
+            self.lock.release()
+
+class Throttle(object):
+    """
+    Throttle limits files and bytes per second.
+
+    Attributes:
+    files - TokenBucket of files
+    bytes - TokenBucket of bytes read and written
+    given - dict of the rates given on the command line
+    controlfile - name of the control file, or None
+    controlstamp - modification time of the control file when last read
+    nextcheck - time the control file is next checked
+    charged - stats.transferred already charged to bytes
+    slots - most files let through and not yet accounted for
+    inflight - files let through and not yet accounted for
+    closed - True once close() is called, admit() then waits no more
+    """
+    def __init__(self, bytespersec=None, filespersec=None, controlfile=None,
+            slots=1):
+        self.given = {'bytes_per_sec': bytespersec, 'files_per_sec': filespersec}
+        self.files = TokenBucket(filespersec)
+        self.bytes = TokenBucket(bytespersec)
+        self.controlfile = controlfile
+        self.controlstamp = None
+        self.nextcheck = 0
+        self.charged = stats.transferred
+        self.slots = max(slots, 1)
+        self.inflight = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        #bytes are metered by stats, without recording anything else
+        stats.meter()
+        self.checkcontrol()
+
+    def checkcontrol(self):
+        """
+        Reads the control file again if it changed since it was last read.
+        """
+        if self.controlfile == None: return
+        now = time.time()
+        if now < self.nextcheck: return
+        self.nextcheck = now + checkevery
+        try: stamp = os.stat(self.controlfile).st_mtime
+        except OSError: stamp = None
+        if stamp == self.controlstamp: return
+        self.controlstamp = stamp
+        rates = dict(self.given)
+        if stamp != None:
+            try: rates.update(readcontrol(self.controlfile))
+            except (IOError, ValueError), err:
+                print >> sys.stderr, "shelltag: %s: %s" % (self.controlfile, err)
+                return
+        self.bytes.setrate(rates['bytes_per_sec'])
+        self.files.setrate(rates['files_per_sec'])
+
+    def admit(self):
+        """
+        Waits until another file may start.  It's run by the thread handing
+        files to the workers, account() by the one reading their results.
+        """
+        self.condition.acquire()
+        try:
+            while self.inflight >= self.slots and not self.closed:
+                self.condition.wait(checkevery)
+            self.inflight += 1
+        finally:
+            self.condition.release()
+        while not self.closed:
+            self.checkcontrol()
+            #a file is only taken once no bytes are owed
+            wait = self.bytes.take(0) or self.files.take(1)
+            if wait == 0: return
+            time.sleep(min(wait, checkevery))
+
+    def admitted(self, iterable):
+        """
+        Yields the items of iterable, each when admit() lets it through.
+        """
+        for item in iterable:
+            self.admit()
+            yield item
+
+    def account(self):
+        """
+        Charges the bytes stats metered since the last call, after a file
+        admitted is done.
+        """
+        self.bytes.charge(stats.transferred - self.charged)
+        self.charged = stats.transferred
+        self.condition.acquire()
+        try:
+            self.inflight -= 1
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def close(self):
+        """
+        Lets a waiting admit() return, so the workers can be stopped, and
+        stops metering bytes.
+        """
+        self.condition.acquire()
+        try:
+            self.closed = True
+            self.condition.notify()
+        finally:
+            self.condition.release()
+        stats.meter(False)
@@ -0,0 +1,50 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a client for shelltagd.py.  It takes the options of shelltag.py
+followed by any number of files and directories, and has the daemon run
+them.  Values are given as -a FIELDNAME=VALUE.  Only --socket PATH and
+--stop are its own options; everything else is sent to the daemon.
+
+$ python shelltagc.py -a COMMENT=Ripped a.mp3 b.mp3 "D:\\Music"
+$ python shelltagc.py --socket /tmp/tag.sock -i a.mp3
+$ python shelltagc.py --stop
+"""
+
+import sys
+import socket
+
+import shelltag_src.daemon as daemon
+
+def main():
+    socketpath = daemon.defaultsocket()
+    stop = False
+    argv = []
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument == '--': #the rest are paths
+            argv.append(argument)
+            argv.extend(arguments)
+        elif argument == '--socket':
+            socketpath = next(arguments, socketpath)
+        elif argument.startswith('--socket='):
+            socketpath = argument.split('=', 1)[1]
+        elif argument == '--stop':
+            stop = True
+        else:
+            argv.append(argument)
+
+    try:
+        if stop: return daemon.stop(socketpath)
+        return daemon.request(socketpath, argv, None, sys.stdout, sys.stderr)
+    except socket.error, err:
+        print >> sys.stderr, "shelltagc: %s: %s" % (socketpath, err)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is shelltagd, a daemon which keeps shelltag loaded and runs the
+command lines shelltagc.py sends it over a Unix domain socket.
+
+$ python shelltagd.py &
+$ python shelltagc.py -a COMMENT=Ripped a.mp3 b.mp3
+$ python shelltagc.py --stop
+"""
+
+from optparse import OptionParser
+import sys
+
+import shelltag
+import shelltag_src.daemon as daemon
+
+def main():
+    parser = OptionParser(usage="Usage: %prog [options]")
+    parser.add_option("--socket", dest="socket", default=daemon.defaultsocket(),
+            help="listens on the Unix domain socket PATH (default %default)",
+            metavar="PATH")
+    (options, args) = parser.parse_args()
+    print >> sys.stderr, "shelltagd: listening on " + options.socket
+    try: daemon.serve(options.socket, shelltag.runrequest)
+    except KeyboardInterrupt: pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
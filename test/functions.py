@@ -12,6 +12,7 @@ These are some helper functions for tests.
 import shutil
 import os
 import os.path
+import struct
 
 front = "../test/data/original/front.jpg"
 back = "../test/data/original/back.jpg"
@@ -50,3 +51,24 @@ def clear():
             if os.path.isdir(path): shutil.rmtree(path)
             else: os.remove(path)
 
+def framebytes(filename, frameid):
+    """
+    Returns the bytes the frames with frameid take in the ID3v2 tag of
+    filename, headers included, read from the frame headers as stored.
+    """
+    syncsafe = lambda data: reduce(lambda size, byte: (size << 7) | ord(byte),
+            data, 0)
+    f = open(filename, 'rb')
+    try:
+        header = f.read(10)
+        data = f.read(syncsafe(header[6:10]))
+    finally:
+        f.close()
+    total = 0
+    position = 0
+    while position + 10 <= len(data) and data[position] != '\x00':
+        if ord(header[3]) == 4: size = syncsafe(data[position + 4:position + 8])
+        else: size = struct.unpack('>I', data[position + 4:position + 8])[0]
+        if data[position:position + 4] == frameid: total += size + 10
+        position += size + 10
+    return total
@@ -0,0 +1,120 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/artwork.py.
+"""
+import sys
+import os
+import shutil
+import unittest
+
+import functions
+sys.path.append("../shelltag_src/")
+import artwork
+import id3tag
+from id3tag import ID3Tag
+
+test = "data/test.mp3"
+
+class Artwork(unittest.TestCase):
+
+    def setUp(self):
+        artwork.images.clear()
+        artwork.folders.clear()
+
+    def test_pictureshared(self):
+        a = artwork.picture(functions.front, artwork.FRONT)
+        b = artwork.picture(functions.front, artwork.FRONT)
+        self.assertFalse(a is b)
+        self.assertTrue(a.data is b.data)
+        self.assertEquals(u'image/jpeg',a.mime)
+        self.assertEquals(3,a.type)
+        self.assertTrue(a.data is artwork.picture(functions.front, artwork.BACK).data)
+        self.assertEquals(1,len(artwork.images))
+
+    def test_encodedonce(self):
+        a = artwork.picture(functions.back, artwork.BACK)
+        b = artwork.picture(functions.back, artwork.BACK)
+        self.assertTrue(a._writeData() is b._writeData())
+        b.desc = u'Other'
+        self.assertTrue(b._writeData().startswith('\x00image/jpeg\x00\x04Other\x00'))
+        self.assertEquals(u'Back Cover',a.desc)
+        self.assertTrue(a._writeData().startswith('\x00image/jpeg\x00\x04Back Cover\x00'))
+
+    def test_folderpicture(self):
+        shutil.copyfile(functions.front, "../test/data/front.jpg")
+        self.assertEquals(None,artwork.folderpicture("../test/data"))
+        shutil.copyfile(functions.front, "../test/data/folder.jpg")
+        self.assertEquals(None,artwork.folderpicture("../test/data"))  #looked in once
+        artwork.folders.clear()
+        self.assertEquals(artwork.picture(functions.front),
+                artwork.folderpicture("../test/data"))
+        os.remove("../test/data/folder.jpg")
+
+    def test_boundedcache(self):
+        top = "../test/data/albums"
+        try:
+            for number in range(3 * artwork.cachesize):
+                directory = os.path.join(top, str(number))
+                os.makedirs(directory)
+                shutil.copyfile(functions.front, os.path.join(directory, "folder.jpg"))
+                self.assertEquals(artwork.FRONT,artwork.folderpicture(directory).type)
+                self.assertTrue(len(artwork.images) <= artwork.cachesize)
+                self.assertTrue(len(artwork.folders) <= artwork.cachesize)
+        finally:
+            shutil.rmtree(top)
+        self.assertEquals(artwork.cachesize,len(artwork.images))
+
+    def test_recent(self):
+        a = artwork.Recent(2)
+        a['x'] = 1
+        a['y'] = 2
+        self.assertEquals(1,a['x'])    #y is now the least recently used
+        a['z'] = 3
+        self.assertEquals(['x','z'],sorted(a.entries.keys()))
+        self.assertRaises(KeyError,lambda: a['y'])
+
+    def test_addpicture(self):
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test)
+        front = artwork.picture(functions.back, artwork.FRONT)
+        a.addpicture(front)
+        b = ID3Tag(test)
+        pictures = [p for p in b.tag.getall('APIC') if p.type == artwork.FRONT]
+        self.assertEquals(1,len(pictures))
+        self.assertEquals(front.data,pictures[0].data)
+        b.begin()
+        b.addpicture(front)
+        b.commit()
+        self.assertEquals('unchanged',b.lastsave)
+
+    def test_samedescription(self):
+        functions.copymp3("id3v24noart.mp3")
+        a = ID3Tag(test)
+        back = artwork.picture(functions.back, artwork.BACK)
+        back.desc = u'Cover'
+        front = artwork.picture(functions.front, artwork.FRONT)
+        front.desc = u'Cover'
+        a.addpicture(back)
+        a.addpicture(front)
+        pictures = ID3Tag(test).tag.getall('APIC')
+        self.assertEquals([(artwork.FRONT,u'Cover (2)'),(artwork.BACK,u'Cover')],
+                sorted([(p.type,p.desc) for p in pictures]))
+        self.assertEquals(u'Cover',front.desc)
+
+    def test_v1addpicture(self):
+        functions.copymp3("id3v1.mp3")
+        a = ID3Tag(test)
+        self.assertRaises(id3tag.ID3TagInvalidFrame,a.addpicture,
+                artwork.picture(functions.front))
+
+    def tearDown(self):
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/compatid3.py.
+"""
+import sys
+import unittest
+import os
+
+import functions
+sys.path.append("../shelltag_src/")
+import compatid3
+from compatid3 import CompatID3
+from mutagen.id3 import TIT2, TXXX
+
+test = "data/test.mp3"
+
+class CompatID3Padding(unittest.TestCase):
+
+    def setUp(self):
+        functions.copymp3("id3v24noart.mp3")
+
+    def test_inplace(self):
+        size = os.path.getsize(test)
+        a = CompatID3(test)
+        a.add(TIT2(encoding=3, text=u'Prowler'))
+        a.save()
+        self.assertEquals('inplace',a.lastsave)
+        self.assertEquals(size,os.path.getsize(test))
+
+    def test_rewritereservespadding(self):
+        a = CompatID3(test)
+        a.add(TXXX(encoding=3, desc=u'BIG', text=u'x' * (a.size * 2)))
+        a.MINPADDING = 4096
+        a.save()
+        self.assertEquals('rewrite',a.lastsave)
+        b = CompatID3(test)
+        self.assertTrue(b.size - a.size * 2 >= 4096)
+
+    def test_paddingpercent(self):
+        a = CompatID3(test)
+        a.MINPADDING = 1024
+        a.PADDINGPERCENT = 1
+        #100000 bytes of frames + 1024 + 1000, rounded up to a kilobyte
+        self.assertEquals(102400,a._CompatID3__tagsize(-10, 100000))
+
+    def test_savecounts(self):
+        counts = dict(compatid3.savecounts)
+        a = CompatID3(test)
+        a.save()
+        self.assertEquals(counts['inplace'] + 1,compatid3.savecounts['inplace'])
+        self.assertEquals(counts['rewrite'],compatid3.savecounts['rewrite'])
+
+    def test_shrink(self):
+        a = CompatID3(test)
+        a.add(TXXX(encoding=3, desc=u'BIG', text=u'x' * 100000))
+        a.save()
+        size = os.path.getsize(test)
+        a.delall('TXXX:BIG')
+        a.MAXPADDING = 2048
+        a.save()
+        self.assertEquals('rewrite',a.lastsave)
+        self.assertTrue(os.path.getsize(test) < size - 90000)
+        self.assertEquals(u'Avantgarde',CompatID3(test)['TCON'])
+
+    def test_safesave(self):
+        a = CompatID3(test)
+        audio = open(test,'rb').read()[a.size:]
+        a.add(TXXX(encoding=3, desc=u'BIG', text=u'x' * 100000))
+        a.SAFESAVE = True
+        a.save()
+        self.assertEquals('rewrite',a.lastsave)
+        b = CompatID3(test)
+        self.assertEquals(audio,open(test,'rb').read()[b.size:])
+        self.assertEquals(u'x' * 100000,b['TXXX:BIG'])
+        self.assertEquals([],[name for name in os.listdir("data")
+                if name.endswith('.tmp')])
+
+    def test_safesavesymlink(self):
+        if not hasattr(os, 'symlink'): return
+        os.rename(test, "data/target.mp3")
+        os.symlink("target.mp3", test)
+        try:
+            a = CompatID3(test)
+            a.add(TXXX(encoding=3, desc=u'BIG', text=u'x' * 100000))
+            a.SAFESAVE = True
+            a.save()
+            self.assertEquals('rewrite',a.lastsave)
+            self.assertTrue(os.path.islink(test))
+            self.assertEquals(u'x' * 100000,CompatID3("data/target.mp3")['TXXX:BIG'])
+        finally:
+            os.remove(test)
+            os.rename("data/target.mp3", test)
+
+    def tearDown(self):
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
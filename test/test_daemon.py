@@ -0,0 +1,93 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/daemon.py.
+"""
+import sys
+import os
+import threading
+import unittest
+from StringIO import StringIO
+
+sys.path.append("../shelltag_src/")
+import daemon
+
+socketpath = os.path.abspath("data/test.sock")
+
+def echo(argv):
+    print "cwd " + os.getcwd()
+    for argument in argv: print argument
+    if argv and argv[0] == 'fail': raise ValueError("failed")
+    print >> sys.stderr, "done"
+    return len(argv)
+
+class Daemon(unittest.TestCase):
+
+    def setUp(self):
+        self.server = threading.Thread(target=daemon.serve,
+                args=(socketpath, echo))
+        self.server.start()
+        while not os.path.exists(socketpath): self.server.join(0.01)
+
+    def tearDown(self):
+        daemon.stop(socketpath)
+        self.server.join()
+        os.remove(socketpath + '.lock')
+
+    def test_request(self):
+        out, err = StringIO(), StringIO()
+        directory = os.path.abspath("data")
+        status = daemon.request(socketpath, ['-a', 'COMMENT=x', '\xe9.mp3'],
+                directory, out, err)
+        self.assertEquals(3,status)
+        self.assertEquals("cwd " + directory + "\n-a\nCOMMENT=x\n\xe9.mp3\n",
+                out.getvalue())
+        self.assertEquals("done\n",err.getvalue())
+        self.assertNotEquals(directory,os.getcwd())
+
+    def test_error(self):
+        out, err = StringIO(), StringIO()
+        self.assertEquals(1,daemon.request(socketpath, ['fail'], None, out, err))
+        self.assertEquals("shelltag: ValueError: failed\n",err.getvalue())
+
+    def test_badrequest(self):
+        for line in ['not json\n', '[]\n', '"stop"\n']:
+            connection = daemon.socket.socket(daemon.socket.AF_UNIX)
+            connection.connect(socketpath)
+            try:
+                connection.sendall(line)
+                reply = daemon.receive(connection.makefile('rb'))
+            finally:
+                connection.close()
+            self.assertEquals(2,reply['status'])
+            self.assertTrue(reply['error'].startswith("bad request: "))
+        out, err = StringIO(), StringIO()
+        self.assertEquals(1,daemon.request(socketpath, ['a.mp3'], None, out, err))
+        self.assertTrue(out.getvalue().endswith("\na.mp3\n"))
+
+    def test_alreadyrunning(self):
+        self.assertRaises(daemon.socket.error,daemon.serve,socketpath,echo)
+        self.assertEquals(0,daemon.request(socketpath, None))
+
+    def test_deadsocket(self):
+        daemon.stop(socketpath)
+        self.server.join()
+        dead = daemon.socket.socket(daemon.socket.AF_UNIX)
+        dead.bind(socketpath)
+        dead.close()
+        self.server = threading.Thread(target=daemon.serve,
+                args=(socketpath, echo))
+        self.server.start()
+        for attempt in range(500):  #the dead socket is there until it's replaced
+            try: status = daemon.request(socketpath, None)
+            except daemon.socket.error: self.server.join(0.01)
+            else: break
+        self.assertEquals(0,status)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/directory.py.
+"""
+import sys
+import unittest
+import shutil
+import os
+
+import functions
+sys.path.append("../shelltag_src/")
+import directory
+
+folder = "data/2010 - The Noise"
+
+class DirectoryWalk(unittest.TestCase):
+
+    def setUp(self):
+        functions.copyfolder()
+
+    def test_walkisgenerator(self):
+        pathlist = directory.walk(folder)
+        self.assertTrue(os.path.isabs(pathlist.next()))
+
+    def test_walknosubdirectory(self):
+        pathlist = list(directory.walk(folder))
+        self.assertEquals(7,len(pathlist))
+
+    def test_walksubdirectory(self):
+        pathlist = list(directory.walk(folder,True))
+        self.assertEquals(14,len(pathlist))
+
+    def test_walkreversal(self):
+        pathlist = list(directory.walk(folder,True))
+        pathlist.reverse()
+        self.assertEquals(pathlist,list(directory.walk(folder,True,True)))
+
+    def test_walkuppercase(self):
+        os.rename(folder + "/101 Sound 1.mp3", folder + "/101 Sound 1.MP3")
+        pathlist = list(directory.walk(folder))
+        self.assertEquals(7,len(pathlist))
+
+    def test_walkskipssymlinks(self):
+        os.symlink(os.path.abspath("data/original/2010 - The Noise/2010 - The Noise"),
+                folder + "/link")
+        self.assertEquals(14,len(list(directory.walk(folder,True))))
+        self.assertEquals(21,len(list(directory.walk(folder,True,False,True))))
+
+    def test_walksymlinkloop(self):
+        os.symlink(os.path.abspath(folder), folder + "/loop")
+        self.assertEquals(14,len(list(directory.walk(folder,True,False,True))))
+
+    def test_getlistnochdir(self):
+        cwd = os.getcwd()
+        directory.getlist(folder)
+        self.assertEquals(cwd,os.getcwd())
+
+    def tearDown(self):
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
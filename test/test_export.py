@@ -0,0 +1,81 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/export.py.
+"""
+import sys
+import unittest
+import csv
+import json
+from StringIO import StringIO
+
+import functions
+sys.path.append("../shelltag_src/")
+import export
+from id3tag import ID3Tag
+
+test = "data/test.mp3"
+
+class ExportRecord(unittest.TestCase):
+
+    def test_recordfields(self):
+        functions.copymp3("id3v24noart.mp3")
+        record = export.makerecord(ID3Tag(test,True))
+        self.assertEquals(sorted(export.columns),sorted(record.keys()))
+        self.assertEquals("Avantgarde",record['GENRE'])
+        self.assertEquals(None,record['COMPOSER'])
+        self.assertEquals("2.4.0",record['VERSION'])
+        self.assertEquals([],record['ARTWORK'])
+
+    def test_recordsizes(self):
+        functions.copymp3("id3v24art.mp3")
+        record = export.makerecord(ID3Tag(test,True))
+        self.assertEquals(58957,record['TAGSIZE'])
+        self.assertEquals(2048,record['PADDING'])
+        self.assertEquals([3,4],sorted([p['type'] for p in record['ARTWORK']]))
+
+    def test_recordnotag(self):
+        functions.copymp3("empty.mp3")
+        record = export.makerecord(ID3Tag(test,True))
+        self.assertEquals(None,record['VERSION'])
+        self.assertEquals(None,record['TITLE'])
+
+    def tearDown(self):
+        functions.clear()
+
+class ExportWriters(unittest.TestCase):
+
+    def setUp(self):
+        functions.copymp3("id3v24art.mp3")
+        self.record = export.makerecord(ID3Tag(test,True))
+
+    def test_ndjson(self):
+        out = StringIO()
+        writer = export.NDJSONWriter(out)
+        writer.write(self.record)
+        writer.write(self.record)
+        lines = out.getvalue().splitlines()
+        self.assertEquals(2,len(lines))
+        self.assertEquals(self.record['TITLE'],json.loads(lines[0])['TITLE'])
+
+    def test_csv(self):
+        out = StringIO()
+        writer = export.CSVWriter(out)
+        writer.write(self.record)
+        rows = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEquals(export.columns,rows[0])
+        row = dict(zip(rows[0],rows[1]))
+        self.assertEquals(self.record['TITLE'],row['TITLE'])
+        self.assertEquals('',row['COMPOSER'])
+        self.assertEquals(2,len(json.loads(row['ARTWORK'])))
+
+    def tearDown(self):
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -67,6 +67,23 @@ class ID3RemoveTag(unittest.TestCase):
         b = ID3Tag(test)
         self.assertEquals(b.tag.version,(1,1))
 
+    def test_dryrunversions(self):
+        from StringIO import StringIO
+        functions.copymp3("id3v1.mp3")
+        before = open(test,'rb').read()
+        a = ID3Tag(test,dryrun=True)
+        stdout = sys.stdout
+        sys.stdout = out = StringIO()
+        try:
+            a.removetag(2)
+            a.removetag(0)
+        finally:
+            sys.stdout = stdout
+        self.assertEquals("[DRYRUN]" + test + ": no ID3 tag would be removed.\n" +
+                "[DRYRUN]" + test + ": ID3v1 tag(s) would be removed.\n",
+                out.getvalue())
+        self.assertEquals(before,open(test,'rb').read())
+
     def tearDown(self):
         functions.clear()
 
@@ -121,6 +138,26 @@ class ID3CreateTag(unittest.TestCase):
         b = ID3Tag(test)
         self.assertEquals(b.tag.version,(2,4,0))
 
+    def test_createsinglesave(self):
+        import compatid3
+        functions.copymp3("id3v124.mp3")
+        a = ID3Tag(test)
+        saves = sum(compatid3.savecounts.values())
+        a.createtag(v1=True,v2=3)
+        self.assertEquals(saves + 1,sum(compatid3.savecounts.values()))
+        b = ID3Tag(test)
+        self.assertEquals((2,3,0),b.tag.version)
+        self.assertEquals([u' '],b.tag['TPE1'].text)
+        self.assertEquals(1051,b.tag.size)   #header, TPE1 and 1024 bytes of padding
+        self.assertEquals(b.tag.version,a.tag.version)
+
+    def test_createnotag(self):
+        functions.copymp3("id3v124.mp3")
+        a = ID3Tag(test)
+        a.createtag(v1=False,v2=0)
+        self.assertEquals(None,a.tag)
+        self.assertEquals(None,ID3Tag(test).tag)
+
     def tearDown(self):
         functions.clear()
 
@@ -148,6 +185,20 @@ class ID3SaveTag(unittest.TestCase):
         b = ID3Tag(test)
         self.assertEquals(b.tag.version,(2,3,0))
 
+    #the tag in memory matches the file without being reloaded
+    def test_savev23noreload(self):
+        functions.copymp3("id3v23.mp3")
+        a = ID3Tag(test)
+        tag = a.tag
+        a.addfield("TITLE","Prowler\\Yo")
+        a.addfield("YEAR","1992-05-06")
+        self.assertTrue(tag is a.tag)
+        b = ID3Tag(test)
+        self.assertEquals(sorted(b.tag.keys()),sorted(a.tag.keys()))
+        for key in b.tag.keys():
+            self.assertEquals(b.tag[key]._writeData(),a.tag[key]._writeData())
+        self.assertEquals((2,3,0),a.tag.version)
+
     def test_savev24tag(self):
         functions.copymp3("id3v24art.mp3")
         a = ID3Tag(test)
@@ -280,6 +331,21 @@ class ID3AddField(unittest.TestCase):
         a.addfield("DAVID","Hwang\\Hello")
         self.assertEquals(["Hwang","Hello"],a.tag[u'TXXX:DAVID'])
 
+    #frames must not be shared between tags
+    def test_addfreshframes(self):
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test)
+        b = ID3Tag(test)
+        a.addfield("TITLE","Prowler")
+        b.addfield("TITLE","Karma Police")
+        self.assertEquals("Prowler",a.tag['TIT2'])
+        self.assertEquals("Karma Police",b.tag['TIT2'])
+
+    def test_addpicture(self):
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test)
+        self.assertRaises(id3tag.ID3TagInvalidFrame,a.addfield,"PICTURE","blah")
+
     def tearDown(self):
         functions.clear()
 
@@ -365,6 +431,274 @@ class ID3GetField(unittest.TestCase):
 
 #No tests for clear field...all based on addfield and savetag
 
+class ID3Batch(unittest.TestCase):
+
+    def test_batchnotsaveduntilcommit(self):
+        functions.copymp3("id3v24noart.mp3")
+        a = ID3Tag(test)
+        a.begin()
+        a.addfield("TITLE","Prowler")
+        a.removefield("YEAR")
+        b = ID3Tag(test)
+        self.assertEquals("Sound 5\\The Interlude",b.getfield("TITLE"))
+        a.commit()
+        c = ID3Tag(test)
+        self.assertEquals("Prowler",c.getfield("TITLE"))
+        self.assertEquals([],c.tag.getall('TDRC'))
+
+    def test_batchsavesonce(self):
+        functions.copymp3("id3v23.mp3")
+        a = ID3Tag(test)
+        saves = []
+        a.savetag = lambda: saves.append(True)
+        a.begin()
+        a.addfield("TITLE","Prowler")
+        a.addfield("ARTIST","Radiohead")
+        a.clearfield("ALBUM")
+        a.commit()
+        self.assertEquals(1,len(saves))
+
+    def test_batchnothingtosave(self):
+        functions.copymp3("id3v23.mp3")
+        a = ID3Tag(test)
+        saves = []
+        a.savetag = lambda: saves.append(True)
+        a.begin()
+        a.commit()
+        self.assertEquals(0,len(saves))
+
+    def test_batchcontextmanager(self):
+        functions.copymp3("id3v23.mp3")
+        with ID3Tag(test) as a:
+            a.addfield("TITLE","Prowler")
+            a.addfield("ARTIST","Radiohead")
+        b = ID3Tag(test)
+        self.assertEquals((2,3,0),b.tag.version)
+        self.assertEquals("Prowler",b.getfield("TITLE"))
+        self.assertEquals("Radiohead",b.getfield("ARTIST"))
+
+    def test_batchunchanged(self):
+        functions.copymp3("id3v23.mp3")
+        before = open(test,'rb').read()
+        a = ID3Tag(test)
+        a.begin()
+        a.addfield("TITLE",a.getfield("TITLE"))
+        a.commit()
+        self.assertEquals('unchanged',a.lastsave)
+        self.assertEquals(before,open(test,'rb').read())
+
+    def test_unchangedforced(self):
+        functions.copymp3("id3v24noart.mp3")
+        a = ID3Tag(test)
+        a.begin()
+        a.addfield("ARTIST","Unknown")
+        a.commit(True)
+        self.assertEquals('inplace',a.lastsave)
+
+    def test_dryrun(self):
+        functions.copymp3("id3v24noart.mp3")
+        before = open(test,'rb').read()
+        a = ID3Tag(test,dryrun=True)
+        a.begin()
+        a.addfield("TITLE","Prowler")
+        self.assertEquals([u"- TIT2=Sound 5 / The Interlude",u"+ TIT2=Prowler"],a.changes())
+        a.commit()
+        a.removetag()
+        self.assertEquals(before,open(test,'rb').read())
+
+    def tearDown(self):
+        functions.clear()
+
+class ID3Convert(unittest.TestCase):
+
+    def trailer(self):
+        import id3v1
+        return id3v1.trailer(test)
+
+    def test_converttov23(self):
+        import compatid3
+        functions.copymp3("id3v124.mp3")
+        before = self.trailer()
+        a = ID3Tag(test)
+        saves = sum(compatid3.savecounts.values())
+        self.assertTrue(a.convert(3))
+        self.assertEquals(saves + 1,sum(compatid3.savecounts.values()))
+        b = ID3Tag(test)
+        self.assertEquals((2,3,0),b.tag.version)
+        self.assertEquals(sorted(b.tag.keys()),sorted(a.tag.keys()))
+        self.assertEquals(before,self.trailer())
+
+    def test_convertunchanged(self):
+        functions.copymp3("id3v23.mp3")
+        a = ID3Tag(test)
+        self.assertFalse(a.convert(3))
+        self.assertEquals('unchanged',a.lastsave)
+
+    def test_convertstrip(self):
+        functions.copymp3("id3v124.mp3")
+        a = ID3Tag(test)
+        a.convert(4,'strip')
+        self.assertEquals(None,self.trailer())
+        self.assertFalse(ID3Tag(test).convert(4,'strip'))
+
+    def test_convertsync(self):
+        import id3v1
+        functions.copymp3("id3v24noart.mp3")
+        a = ID3Tag(test)
+        a.convert(3,'sync')
+        self.assertEquals(id3v1.render(ID3Tag(test).tag),self.trailer())
+        self.assertFalse(ID3Tag(test).convert(3,'sync'))
+
+    def test_convertwithedits(self):
+        import compatid3
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test)
+        saves = sum(compatid3.savecounts.values())
+        a.begin()
+        a.addfield("TITLE","Lucky")
+        a.convert(3)
+        self.assertEquals(saves + 1,sum(compatid3.savecounts.values()))
+        self.assertFalse(a.batch)
+        b = ID3Tag(test)
+        self.assertEquals((2,3,0),b.tag.version)
+        self.assertEquals("Lucky",b.getfield("TITLE"))
+
+    def test_convertv1only(self):
+        functions.copymp3("id3v1.mp3")
+        before = self.trailer()
+        a = ID3Tag(test)
+        a.convert(3)
+        b = ID3Tag(test)
+        self.assertEquals((2,3,0),b.tag.version)
+        self.assertEquals("Unknown",b.getfield("ARTIST"))
+        self.assertEquals(before,self.trailer())
+
+    def test_convertdryrun(self):
+        functions.copymp3("id3v124.mp3")
+        before = open(test, 'rb').read()
+        a = ID3Tag(test,dryrun=True)
+        self.assertTrue(a.convert(3,'strip'))
+        self.assertEquals(before,open(test, 'rb').read())
+
+    def tearDown(self):
+        functions.clear()
+
+class ID3LazyLoading(unittest.TestCase):
+
+    def test_lazyemptytag(self):
+        functions.copymp3("empty.mp3")
+        a = ID3Tag(test,lazy=True)
+        self.assertEquals(a.tag,None)
+
+    def test_lazyv1tag(self):
+        functions.copymp3("id3v1.mp3")
+        a = ID3Tag(test,lazy=True)
+        self.assertEquals(a.tag.version,(1,1))
+        self.assertEquals("Unknown",a.getfield('ARTIST'))
+
+    def test_lazysameframes(self):
+        for filename in ["id3v23.mp3","id3v24art.mp3","id3v24noart.mp3","id3v124.mp3"]:
+            functions.copymp3(filename)
+            a = ID3Tag(test)
+            b = ID3Tag(test,lazy=True)
+            self.assertEquals(a.tag.version,b.tag.version)
+            self.assertEquals(sorted(a.tag.keys()),sorted(b.tag.keys()))
+            for key in a.tag.keys():
+                self.assertEquals(a.tag[key].pprint(),b.tag[key].pprint())
+
+    def test_lazyv23date(self):
+        functions.copymp3("id3v23.mp3")
+        a = ID3Tag(test,lazy=True)
+        self.assertEquals("2010",a.getfield('YEAR'))
+
+    def test_lazyonlyreadsasked(self):
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test,lazy=True)
+        self.assertEquals("Avantgarde",a.getfield("GENRE"))
+        self.assertTrue('APIC' in a.tag.index)
+
+    def test_lazypicturedata(self):
+        functions.copymp3("id3v23.mp3")
+        a = ID3Tag(test,lazy=True)
+        pictures = a.tag.getall('APIC')
+        self.assertEquals(None,pictures[0]._data)
+        b = ID3Tag(test)
+        self.assertEquals(sorted([p.data for p in b.tag.getall('APIC')]),
+                sorted([p.data for p in pictures]))
+
+    def test_lazymapped(self):
+        functions.copymp3("id3v23.mp3")
+        a = ID3Tag(test,lazy=True)
+        self.assertNotEquals(None,a.tag.source)
+        a.tag.close()
+        self.assertEquals("Sound 3",a.getfield("TITLE"))
+
+    def test_lazytaginfo(self):
+        for filename in ["id3v1.mp3","id3v23.mp3","id3v24art.mp3","id3v124.mp3"]:
+            functions.copymp3(filename)
+            self.assertEquals(ID3Tag(test).taginfo(),ID3Tag(test,lazy=True).taginfo())
+
+    def test_printtag(self):
+        from StringIO import StringIO
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test,lazy=True)
+        out = StringIO()
+        a.printtag(out)
+        self.assertEquals(a.taginfo().encode('UTF-8') + '\n',out.getvalue())
+        self.assertTrue("TITLE=" in out.getvalue())
+
+    def test_lazyaddfield(self):
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test,lazy=True)
+        a.addfield("TITLE","Prowler")
+        b = ID3Tag(test)
+        self.assertEquals("Prowler",b.getfield("TITLE"))
+        self.assertEquals(2,len(b.tag.getall('APIC')))
+
+    def test_lazyremoveart(self):
+        for filename in ["id3v123.mp3","id3v24art.mp3"]:
+            functions.copymp3(filename)
+            size = os.path.getsize(test)
+            pictures = functions.framebytes(test, 'APIC')
+            before = ID3Tag(test)
+            a = ID3Tag(test,lazy=True)
+            self.assertEquals(pictures,a.removeart())
+            self.assertEquals(size,os.path.getsize(test))
+            b = ID3Tag(test)
+            self.assertEquals([],b.tag.getall('APIC'))
+            self.assertEquals(before.tag.version,b.tag.version)
+            self.assertEquals(before.tag.size,b.tag.size)
+            before.tag.delall('APIC')
+            self.assertEquals(before.taginfo(),b.taginfo())
+
+    def test_removeartcompact(self):
+        functions.copymp3("id3v24art.mp3")
+        size = os.path.getsize(test)
+        a = ID3Tag(test,lazy=True)
+        reclaimed = a.removeart(compact=True)
+        self.assertTrue(os.path.getsize(test) <= size - reclaimed + 1024)
+        self.assertEquals("Sound 4",ID3Tag(test).getfield("TITLE"))
+        self.assertFalse('MAXPADDING' in vars(a.tag))
+
+    def test_removeartcompactfullload(self):
+        functions.copymp3("id3v24art.mp3")
+        size = os.path.getsize(test)
+        a = ID3Tag(test)
+        reclaimed = a.removeart(compact=True)
+        self.assertTrue(os.path.getsize(test) <= size - reclaimed + 1024)
+        self.assertFalse('MAXPADDING' in vars(a.tag))
+        self.assertFalse(a.compact)
+
+    def test_removeartfullload(self):
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test)
+        self.assertTrue(a.removeart() > 0)
+        self.assertEquals(0,a.removeart())
+        self.assertEquals([],ID3Tag(test).tag.getall('APIC'))
+
+    def tearDown(self):
+        functions.clear()
+
 class ID3TagRemoveField(unittest.TestCase):
 
     def test_emptyremovefield(self):
@@ -475,6 +809,20 @@ class ID3SaveTag(unittest.TestCase):
         b = ID3Tag(test)
         self.assertEquals(b.tag.version,(2,3,0))
 
+    #the tag in memory matches the file without being reloaded
+    def test_savev23noreload(self):
+        functions.copymp3("id3v23.mp3")
+        a = ID3Tag(test)
+        tag = a.tag
+        a.addfield("TITLE","Prowler\\Yo")
+        a.addfield("YEAR","1992-05-06")
+        self.assertTrue(tag is a.tag)
+        b = ID3Tag(test)
+        self.assertEquals(sorted(b.tag.keys()),sorted(a.tag.keys()))
+        for key in b.tag.keys():
+            self.assertEquals(b.tag[key]._writeData(),a.tag[key]._writeData())
+        self.assertEquals((2,3,0),a.tag.version)
+
     def test_savev24tag(self):
         functions.copymp3("id3v24art.mp3")
         a = ID3Tag(test)
@@ -607,6 +955,21 @@ class ID3AddField(unittest.TestCase):
         a.addfield("DAVID","Hwang\\Hello")
         self.assertEquals(["Hwang","Hello"],a.tag[u'TXXX:DAVID'])
 
+    #frames must not be shared between tags
+    def test_addfreshframes(self):
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test)
+        b = ID3Tag(test)
+        a.addfield("TITLE","Prowler")
+        b.addfield("TITLE","Karma Police")
+        self.assertEquals("Prowler",a.tag['TIT2'])
+        self.assertEquals("Karma Police",b.tag['TIT2'])
+
+    def test_addpicture(self):
+        functions.copymp3("id3v24art.mp3")
+        a = ID3Tag(test)
+        self.assertRaises(id3tag.ID3TagInvalidFrame,a.addfield,"PICTURE","blah")
+
     def tearDown(self):
         functions.clear()
 
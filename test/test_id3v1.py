@@ -0,0 +1,108 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/id3v1.py.
+"""
+import sys
+import os
+import unittest
+
+import functions
+sys.path.append("../shelltag_src/")
+import id3v1
+import stats
+from id3tag import ID3Tag
+
+test = "data/test.mp3"
+
+class ID3v1(unittest.TestCase):
+
+    def setUp(self):
+        functions.copymp3("id3v1.mp3")
+
+    def test_loadv1only(self):
+        a = id3v1.load(test)
+        self.assertEquals((1,1),a.version)
+        self.assertEquals([u'Unknown'],a['TPE1'].text)
+        self.assertEquals("Avantgarde",ID3Tag(test).getfield("GENRE"))
+        self.assertTrue(isinstance(ID3Tag(test).tag, id3v1.ID3v1))
+
+    def test_loadv2(self):
+        functions.copymp3("id3v124.mp3")
+        self.assertEquals(None,id3v1.load(test))
+
+    def test_roundtrip(self):
+        id3v1.ID3v1(test).save()
+        f = open(test, 'rb')
+        f.seek(-128, 2)
+        data = f.read()
+        f.close()
+        self.assertEquals(data,id3v1.render(id3v1.ID3v1(test)))
+
+    def test_render(self):
+        a = id3v1.ID3v1(test)
+        a.clear()
+        data = id3v1.render(a)
+        self.assertEquals(128,len(data))
+        self.assertEquals('TAG' + '\x00' * 124 + '\xff',data)
+        self.assertEquals([],id3v1.parse(data))
+
+    def test_onlytrailerwritten(self):
+        before = open(test, 'rb').read()
+        stats.reset()
+        stats.enable()
+        try:
+            a = ID3Tag(test)
+            a.begin()
+            a.addfield("TITLE","Lucky")
+            a.addfield("COMMENT","Ripped")
+            a.addfield("TRACK","3/12")
+            a.commit()
+            self.assertEquals(128,stats.counts['written'])
+        finally:
+            stats.enable(False)
+            stats.reset()
+        after = open(test, 'rb').read()
+        self.assertEquals(before[:-128],after[:-128])
+        self.assertEquals('inplace',a.lastsave)
+        b = ID3Tag(test)
+        self.assertEquals("Lucky",b.getfield("TITLE"))
+        self.assertEquals([u"Ripped"],b.tag.getall("COMM")[0].text)
+        self.assertEquals("3",b.getfield("TRACK"))
+
+    def test_genrebyname(self):
+        a = ID3Tag(test)
+        a.addfield("GENRE","Rock")
+        self.assertEquals("Rock",ID3Tag(test).getfield("GENRE"))
+        self.assertEquals("Rock",ID3Tag(test,lazy=True).getfield("GENRE"))
+
+    def test_lazyaddfield(self):
+        a = ID3Tag(test,lazy=True)
+        a.addfield("ARTIST","Radiohead")
+        self.assertTrue(isinstance(a.tag, id3v1.ID3v1))
+        self.assertEquals("Radiohead",ID3Tag(test).getfield("ARTIST"))
+
+    def test_longtextcut(self):
+        a = ID3Tag(test)
+        a.addfield("ALBUM","x" * 40)
+        self.assertEquals("x" * 30,ID3Tag(test).getfield("ALBUM"))
+
+    def test_trailergone(self):
+        a = id3v1.ID3v1(test)
+        size = os.path.getsize(test)
+        f = open(test, 'rb+')
+        f.truncate(size - 128)
+        f.close()
+        self.assertRaises(id3v1.ID3NoHeaderError,a.save)
+        self.assertEquals(size - 128,os.path.getsize(test))
+
+    def tearDown(self):
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
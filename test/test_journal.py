@@ -0,0 +1,87 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/journal.py, and for shelltag.py
+run with --journal and --resume.
+"""
+import sys
+import os
+import subprocess
+import unittest
+
+import functions
+sys.path.append("../shelltag_src/")
+import journal
+
+test = "data/test.mp3"
+journalpath = "data/test.journal"
+root = os.path.abspath("..")
+
+class Journal(unittest.TestCase):
+
+    def setUp(self):
+        functions.copymp3("id3v23.mp3")
+
+    def test_resume(self):
+        a = journal.Journal(journalpath)
+        a.record(test)
+        a.close()
+        b = journal.Journal(journalpath, True)
+        self.assertEquals([],list(b.pending([test])))
+        self.assertEquals(1,b.skipped)
+        b.close()
+
+    def test_notresumed(self):
+        a = journal.Journal(journalpath)
+        a.record(test)
+        a.close()
+        b = journal.Journal(journalpath)
+        self.assertEquals([test],list(b.pending([test])))
+        b.close()
+
+    def test_changedsince(self):
+        a = journal.Journal(journalpath)
+        a.record(test)
+        a.close()
+        f = open(test, 'ab')
+        f.write('\x00')
+        f.close()
+        b = journal.Journal(journalpath, True)
+        self.assertEquals([test],list(b.pending([test])))
+        b.close()
+
+    def test_tornline(self):
+        f = open(journalpath, 'wb')
+        f.write('{"path": "/music/a.mp3", "si')
+        f.close()
+        a = journal.Journal(journalpath, True)
+        a.record(test)
+        a.close()
+        b = journal.Journal(journalpath, True)
+        self.assertEquals([journal.journalkey(test)],b.done.keys())
+        b.close()
+
+    def test_resumewithjournal(self):
+        other = "data/other.journal"
+        process = subprocess.Popen([sys.executable,
+                os.path.join(root, 'shelltag.py'), '--resume', journalpath,
+                '--journal', other, '-a', 'COMMENT=Ripped', test],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = process.communicate()
+        self.assertEquals(2,process.returncode)
+        self.assertTrue("--journal can't be given with it" in errors)
+        self.assertEquals("",output)
+        self.assertFalse(os.path.exists(journalpath))
+        self.assertFalse(os.path.exists(other))
+
+    def tearDown(self):
+        if os.path.exists(journalpath): os.remove(journalpath)
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/manifest.py.
+"""
+import sys
+import threading
+import unittest
+from StringIO import StringIO
+
+sys.path.append("../shelltag_src/")
+import manifest
+
+def readrows(text, filename):
+    return list(manifest.rows(StringIO(text), filename))
+
+class ManifestRows(unittest.TestCase):
+
+    def test_longcsv(self):
+        rows = readrows("path,field,value\na.mp3,title,Prowler\n", "m.csv")
+        self.assertEquals([(2,'a.mp3',[('TITLE','Prowler')])],rows)
+
+    def test_widecsv(self):
+        rows = readrows("PATH,TITLE,ALBUM,VERSION\na.mp3,Prowler,,2.4.0\n", "m.csv")
+        self.assertEquals([(2,'a.mp3',[('TITLE','Prowler')])],rows)
+
+    def test_longndjson(self):
+        text = '{"path":"a.mp3","field":"TITLE","value":"\\u00e9"}\n' \
+                '{"path":"a.mp3","field":"GENRE","value":null}\n'
+        rows = readrows(text, "m.ndjson")
+        self.assertEquals((1,'a.mp3',[('TITLE','\xc3\xa9')]),rows[0])
+        self.assertEquals((2,'a.mp3',[('GENRE',None)]),rows[1])
+
+    def test_widendjson(self):
+        text = '{"path":"a.mp3","TITLE":"Prowler","ALBUM":null,"CUSTOM":{"mood":"x"}}\n'
+        rows = readrows(text, "m.txt")
+        self.assertEquals([(1,'a.mp3',[('MOOD','x'),('TITLE','Prowler')])],rows)
+
+    def test_badrows(self):
+        rows = readrows("path,field,value\n,TITLE,x\na.mp3,TITLE\n", "m.csv")
+        self.assertEquals([2,3],[row[0] for row in rows])
+        self.assertEquals([None,None],[row[1] for row in rows])
+        self.assertTrue(isinstance(rows[0][2],manifest.ManifestError))
+
+class ManifestGroups(unittest.TestCase):
+
+    def test_groups(self):
+        rows = [(2,'a.mp3',[('TITLE','x')]), (3,'a.mp3',[('ALBUM','y')]),
+                (4,None,manifest.ManifestError()), (5,'b.mp3',[('TITLE','z')])]
+        groups = list(manifest.groups(rows))
+        self.assertEquals(['a.mp3',None,'b.mp3'],[group[0] for group in groups])
+        self.assertEquals([(2,'TITLE','x'),(3,'ALBUM','y')],groups[0][1])
+
+    def test_groupsapart(self):
+        rows = [(2,'a.mp3',[('TITLE','x')]), (3,'./a.mp3',[('ALBUM','y')]),
+                (4,'b.mp3',[('TITLE','z')]), (5,'a.mp3',[('GENRE','w')])]
+        groups = list(manifest.groups(rows))
+        self.assertEquals(['a.mp3','b.mp3','a.mp3'],[group[0] for group in groups])
+        self.assertEquals([(2,'TITLE','x'),(3,'ALBUM','y')],groups[0][1])
+
+    def test_groupsstreamed(self):
+        read = []
+        def manifestrows():
+            for number in range(2, 1000):
+                read.append(number)
+                yield (number, 'track%d.mp3' % (number // 2), [('TITLE','x')])
+        groups = manifest.groups(manifestrows())
+        self.assertEquals('track1.mp3',groups.next()[0])
+        self.assertEquals([2,3,4],read)  #the run ended at row 4
+
+class ManifestInFlight(unittest.TestCase):
+
+    def test_heldback(self):
+        groups = [('a.mp3',[]), ('b.mp3',[]), ('./a.mp3',[])]
+        inflight = manifest.InFlight(limit=3)
+        admitted = inflight.admitted(groups)
+        self.assertEquals('a.mp3',admitted.next()[0])
+        self.assertEquals('b.mp3',admitted.next()[0])
+        let = threading.Event()
+        def third():
+            admitted.next()
+            let.set()
+        waiter = threading.Thread(target=third)
+        waiter.start()
+        let.wait(0.2)
+        self.failIf(let.isSet())    #a.mp3 is still being changed
+        inflight.done('b.mp3')
+        let.wait(0.2)
+        self.failIf(let.isSet())
+        inflight.done('a.mp3')
+        let.wait(2)
+        self.assert_(let.isSet())
+        waiter.join()
+
+    def test_limit(self):
+        inflight = manifest.InFlight(limit=1)
+        admitted = inflight.admitted([('a.mp3',[]), ('b.mp3',[])])
+        admitted.next()
+        rest = []
+        waiter = threading.Thread(target=lambda: rest.extend(admitted))
+        waiter.start()
+        waiter.join(0.2)
+        self.assert_(waiter.isAlive())  #one group is out already
+        inflight.close()
+        waiter.join(2)
+        self.failIf(waiter.isAlive())
+        self.assertEquals([],rest)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/parallel.py, and for shelltag.py
+run with --jobs.
+"""
+import sys
+import os
+import time
+import subprocess
+import unittest
+
+import functions
+sys.path.append("../shelltag_src/")
+import parallel
+import stats
+
+root = os.path.abspath("..")
+folder = "../test/data/2010 - The Noise"
+
+def work(number):
+    """
+    Task run by the workers; later numbers finish first.
+    """
+    time.sleep((10 - number) * 0.01)
+    print "out %d" % number
+    print >> sys.stderr, "err %d" % number
+    if number == 3: raise ValueError("bad %d" % number)
+    return number * number
+
+def transfer(size):
+    """
+    Task counting size bytes read.
+    """
+    stats.add('read', size)
+
+def shelltag(*arguments):
+    """
+    Returns (exit status, stdout, stderr) of shelltag.py run with arguments.
+    """
+    process = subprocess.Popen([sys.executable, os.path.join(root, 'shelltag.py')]
+            + list(arguments), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+    return (process.returncode, output, errors)
+
+class ParallelRun(unittest.TestCase):
+
+    def test_ordered(self):
+        tasks = [(number,) for number in range(10)]
+        results = list(parallel.run(work, tasks, 2, True, 1))
+        self.assertEquals(tasks,[result[0] for result in results])
+        self.assertEquals([0, 1, 4, None, 16],[result[1] for result in results][:5])
+
+    def test_unordered(self):
+        tasks = [(number,) for number in range(10)]
+        results = list(parallel.run(work, tasks, 2, False, 1))
+        self.assertEquals(tasks,sorted([result[0] for result in results]))
+
+    def test_captured(self):
+        results = list(parallel.run(work, [(1,), (3,)], 2, True, 1))
+        self.assertEquals(("out 1\n","err 1\n",None),results[0][2:])
+        self.assertEquals(("out 3\n","err 3\n"),results[1][2:4])
+
+    def test_error(self):
+        results = list(parallel.run(work, [(3,)], 2))
+        self.assertEquals(None,results[0][1])
+        self.assertEquals(parallel.describe(ValueError("bad 3")),results[0][4])
+        self.assertEquals("ValueError: bad 3",results[0][4])
+
+    def test_transferred(self):
+        stats.reset()
+        stats.meter()
+        try: results = list(parallel.run(transfer, [(100,), (20,)], 2))
+        finally: stats.meter(False)
+        self.assertEquals(120,stats.transferred)
+        self.assertEquals({},stats.counts)
+        stats.reset()
+
+    def test_onejob(self):
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try: results = list(parallel.run(work, [(2,), (3,)], 1))
+        finally:
+            sys.stdout.close()
+            sys.stderr.close()
+            sys.stdout, sys.stderr = stdout, stderr
+        self.assertEquals([((2,), 4, '', '', None),
+                ((3,), None, '', '', "ValueError: bad 3")],results)
+
+class ShelltagJobs(unittest.TestCase):
+
+    def setUp(self):
+        functions.copyfolder()
+        broken = open(os.path.join(folder, "100 Broken.mp3"), 'wb')
+        broken.write('ID3\x04\x00\x00\x00\x00\x7f\x7fbroken')
+        broken.close()
+
+    def test_orderedinfo(self):
+        status, serial, errors = shelltag('-i', folder)
+        self.assertEquals(1,status)
+        status, output, errors = shelltag('--jobs', '2', '--ordered', '-i', folder)
+        self.assertEquals(1,status)
+        self.assertEquals(serial,output)   #in the order the files were given
+        self.assertEquals(7,output.count("[INFO]"))
+        lines = errors.splitlines()
+        self.assertTrue(lines[0].startswith("shelltag: ")
+                and "100 Broken.mp3: EOFError: " in lines[0])
+        self.assertEquals("shelltag: 1 file(s) failed.",lines[-1])
+
+    def test_jobsadd(self):
+        status, output, errors = shelltag('--jobs', '2', '-a', 'COMMENT=Ripped',
+                folder)
+        self.assertEquals(1,status)
+        self.assertEquals(7,output.count("[ADD]"))
+        self.assertEquals("shelltag: 1 file(s) failed.",errors.splitlines()[-1])
+
+    def tearDown(self):
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
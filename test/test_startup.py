@@ -0,0 +1,60 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for the imports shelltag.py makes when it starts,
+see benchmark/startup.py for its timings.
+"""
+import sys
+import os
+import subprocess
+import unittest
+
+import functions
+sys.path.append("../shelltag_src/")
+import export
+
+root = os.path.abspath("..")
+test = os.path.abspath("data/test.mp3")
+
+#modules only some options need
+deferred = ['mutagen', 'multiprocessing', 'sqlite3', 'csv', 'json', 'tempfile']
+
+def loaded(code):
+    """
+    Returns the modules of deferred loaded after running code in a new
+    python process.
+    """
+    script = ("import sys; sys.path.insert(0, %r); sys.stdout = open(%r, 'w')\n"
+            "%s\nsys.stderr.write(' '.join(sys.modules.keys()))"
+            % (root, os.devnull, code))
+    process = subprocess.Popen([sys.executable, '-c', script],
+            stderr=subprocess.PIPE)
+    modules = process.communicate()[1].split()
+    return [name for name in deferred if name in modules]
+
+class Startup(unittest.TestCase):
+
+    def test_parser(self):
+        self.assertEquals([],loaded("import shelltag; shelltag.makeparser()"))
+
+    def test_info(self):
+        functions.copymp3("id3v23.mp3")
+        code = "import shelltag; sys.argv = ['shelltag.py', '-i', %r]; " \
+                "shelltag.main()" % test
+        self.assertEquals(['mutagen'],loaded(code))
+
+    def test_exportformats(self):
+        sys.path.insert(0, root)
+        import shelltag
+        self.assertEquals(sorted(export.writers.keys()),shelltag.exportformats)
+
+    def tearDown(self):
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/stats.py.
+"""
+import sys
+import unittest
+
+sys.path.append("../shelltag_src/")
+import stats
+import id3tag
+import functions
+
+class Stats(unittest.TestCase):
+
+    def setUp(self):
+        stats.reset()
+
+    def tearDown(self):
+        stats.enable(False)
+        stats.reset()
+
+    def test_disabled(self):
+        with stats.phase('parse'):
+            stats.add('read', 10)
+        self.assertEquals({},stats.times)
+        self.assertEquals({},stats.counts)
+        self.assertEquals(None,stats.snapshot())
+
+    def test_record(self):
+        stats.enable()
+        with stats.phase('parse'):
+            stats.add('read', 10)
+        stats.add('read', 5)
+        self.assertEquals(15,stats.counts['read'])
+        self.assertTrue('parse' in stats.times)
+        self.assertEquals([1,2],list(stats.timed('walk', [1,2])))
+        self.assertTrue('walk' in stats.times)
+
+    def test_merge(self):
+        stats.enable()
+        stats.add('files')
+        stats.merge(({'parse': 1.0}, {'files': 2, 'inplace': 1}))
+        stats.merge(None)
+        self.assertEquals({'files': 3, 'inplace': 1},stats.counts)
+        lines = stats.summary(2.0)
+        self.assertEquals("[STATS]files: 3 processed, 0 unchanged, 0 failed",lines[0])
+        self.assertEquals("[STATS]saves: 1 in place, 0 rewritten",lines[1])
+        self.assertEquals("[STATS]time: 2.000s total; parse 1.000s",lines[3])
+
+class StatsHooks(unittest.TestCase):
+
+    def setUp(self):
+        functions.copymp3("id3v24noart.mp3")
+        stats.reset()
+        stats.enable()
+
+    def tearDown(self):
+        stats.enable(False)
+        stats.reset()
+        functions.clear()
+
+    def test_save(self):
+        tag = id3tag.ID3Tag("../test/data/test.mp3")
+        tag.savetag()
+        self.assertTrue(stats.counts['read'] > 0)
+        self.assertEquals(1,stats.counts.get('inplace',0) + stats.counts.get('rewrite',0))
+        self.assertTrue(stats.counts['written'] > 0)
+        for name in ('parse','encode','write'):
+            self.assertTrue(name in stats.times)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/tagindex.py.
+"""
+import sys
+import unittest
+import os
+
+import functions
+sys.path.append("../shelltag_src/")
+import tagindex
+from tagindex import TagIndex
+import id3tag
+from id3tag import ID3Tag
+
+test = "data/test.mp3"
+indexfile = "data/test.db"
+
+def store(index):
+    stamp = tagindex.filestamp(test)
+    index.store(tagindex.makerecord(ID3Tag(test), stamp))
+
+class TagIndexLookup(unittest.TestCase):
+
+    def setUp(self):
+        functions.copymp3("id3v24noart.mp3")
+        self.index = TagIndex(indexfile)
+
+    def test_lookupmissing(self):
+        self.assertEquals(None,self.index.lookup(os.path.abspath(test)))
+
+    def test_lookupstored(self):
+        store(self.index)
+        info, fields = self.index.lookup(os.path.abspath(test))
+        self.assertEquals(ID3Tag(test).taginfo(False),info)
+        self.assertEquals("Avantgarde",fields['GENRE'])
+
+    def test_secondpath(self):
+        store(self.index)
+        other = "../test/" + test
+        info, fields = self.index.lookup(other)
+        self.assertEquals(-1,info.find(test))
+        self.assertEquals(ID3Tag(other).taginfo(),id3tag.namedinfo(other, info))
+
+    def test_lookupchanged(self):
+        store(self.index)
+        ID3Tag(test).addfield("GENRE","Rock")
+        self.assertEquals(None,self.index.lookup(os.path.abspath(test)))
+        self.assertEquals([(os.path.abspath(test),"stale")],
+                list(self.index.verify([os.path.abspath(test)])))
+
+    def test_relativepath(self):
+        store(self.index)
+        self.assertNotEquals(None,self.index.lookup(test))
+        self.assertEquals([],list(self.index.verify([test])))
+
+    def test_prune(self):
+        store(self.index)
+        os.remove(test)
+        self.assertEquals([os.path.abspath(test)],self.index.prune("data"))
+        self.assertEquals([],self.index.entries("data"))
+
+    def tearDown(self):
+        self.index.close()
+        os.remove(indexfile)
+        functions.clear()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# Copyright 2010 David Hwang
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+
+"""
+This is a unit test module for shelltag_src/throttle.py.
+"""
+import sys
+import os
+import time
+import threading
+import unittest
+
+sys.path.append("../shelltag_src/")
+import throttle
+import stats
+
+controlfile = "data/test.throttle"
+
+class Throttle(unittest.TestCase):
+
+    def setUp(self):
+        stats.reset()
+
+    def tearDown(self):
+        stats.enable(False)
+        stats.meter(False)
+        stats.reset()
+        if os.path.exists(controlfile): os.remove(controlfile)
+
+    def test_parserate(self):
+        self.assertEquals(20 * 1024 * 1024, throttle.parserate("20M"))
+        self.assertEquals(1536, throttle.parserate("1.5k"))
+        self.assertEquals(50, throttle.parserate("50"))
+        self.assertEquals(None, throttle.parserate("0"))
+        self.assertRaises(ValueError, throttle.parserate, "fast")
+        self.assertRaises(ValueError, throttle.parserate, "-1")
+
+    def test_unlimited(self):
+        a = throttle.Throttle()
+        start = time.time()
+        for i in range(100):
+            a.admit()
+            a.account()
+        self.assert_(time.time() - start < 0.5)
+
+    def test_filespersec(self):
+        a = throttle.Throttle(filespersec=20)
+        start = time.time()
+        for item in a.admitted(range(5)):
+            a.account()
+        elapsed = time.time() - start
+        self.assert_(0.2 <= elapsed < 1.0, elapsed)
+
+    def test_bytesowed(self):
+        a = throttle.Throttle(bytespersec=1000)
+        a.admit()
+        stats.add('written', 300)   #the file cost 0.3 seconds of budget
+        a.account()
+        self.assertEquals(300, a.charged)
+        start = time.time()
+        a.admit()
+        elapsed = time.time() - start
+        self.assert_(0.25 <= elapsed < 1.0, elapsed)
+
+    def test_statsleftoff(self):
+        a = throttle.Throttle(bytespersec=1000)
+        a.admit()
+        stats.add('read', 200)
+        a.account()
+        self.assertEquals(200, a.charged)
+        self.failIf(stats.enabled)
+        self.assertEquals({}, stats.counts)
+        a.close()
+        self.failIf(stats.metered)
+
+    def test_slots(self):
+        a = throttle.Throttle(slots=2)
+        a.admit()
+        a.admit()
+        admitted = threading.Event()
+        def third():
+            a.admit()
+            admitted.set()
+        waiter = threading.Thread(target=third)
+        waiter.start()
+        admitted.wait(0.2)
+        self.failIf(admitted.isSet())
+        a.account()
+        admitted.wait(2)
+        self.assert_(admitted.isSet())
+        waiter.join()
+
+    def test_close(self):
+        a = throttle.Throttle(slots=1)
+        a.admit()
+        waiter = threading.Thread(target=a.admit)
+        waiter.start()
+        a.close()
+        waiter.join(2)
+        self.failIf(waiter.isAlive())
+
+    def test_controlfile(self):
+        f = open(controlfile, 'w')
+        f.write("# retagging at night\nfiles_per_sec=5\nbytes_per_sec=2K\n")
+        f.close()
+        a = throttle.Throttle(bytespersec=100, controlfile=controlfile)
+        self.assertEquals(5, a.files.rate)
+        self.assertEquals(2048, a.bytes.rate)
+        #0 removes a limit, a missing one goes back to the command line's
+        f = open(controlfile, 'w')
+        f.write("files_per_sec=0\n")
+        f.close()
+        os.utime(controlfile, (0, 0))
+        a.nextcheck = 0
+        a.checkcontrol()
+        self.assertEquals(None, a.files.rate)
+        self.assertEquals(100, a.bytes.rate)
+
+    def test_badcontrolfile(self):
+        f = open(controlfile, 'w')
+        f.write("files_per_sec=5\n")
+        f.close()
+        a = throttle.Throttle(controlfile=controlfile)
+        f = open(controlfile, 'w')
+        f.write("files_per_sec=lots\n")
+        f.close()
+        os.utime(controlfile, (0, 0))
+        a.nextcheck = 0
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try: a.checkcontrol()
+        finally: sys.stderr = stderr
+        self.assertEquals(5, a.files.rate)  #kept
+
+if __name__ == '__main__':
+    unittest.main()